@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compares the throughput of reading GDB output line by line from an
+unbuffered pipe with the chunked LineReader used by the Communicator.
+
+Usage: python benchmarks/bench_line_reader.py [record size in MiB]
+"""
+
+import os
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from debugger.mi.communicator import LineReader  # noqa
+
+
+def create_record(size):
+    """
+    Creates a -data-read-memory-bytes like record of roughly the given size.
+    @type size: int
+    @rtype: str
+    """
+    contents = "ab" * (size / 2)
+    return ("1^done,memory=[{{begin=\"0x1000\",offset=\"0x0\","
+            "end=\"0x2000\",contents=\"{}\"}}]\n(gdb)\n".format(contents))
+
+
+def write_records(fd, record, count):
+    with os.fdopen(fd, "wb") as output:
+        for i in xrange(count):
+            output.write(record)
+
+
+def measure(record, count, read_lines):
+    """
+    Pipes count records to the given reading function and returns the
+    throughput in bytes per second.
+    @type record: str
+    @type count: int
+    @type read_lines: callable
+    @rtype: float
+    """
+    read_fd, write_fd = os.pipe()
+    writer = threading.Thread(target=write_records,
+                              args=(write_fd, record, count))
+    writer.daemon = True
+
+    start = time.time()
+    writer.start()
+    read_lines(read_fd)
+    elapsed = time.time() - start
+
+    writer.join()
+    os.close(read_fd)
+
+    return (len(record) * count) / elapsed
+
+
+def read_unbuffered(fd):
+    stream = os.fdopen(os.dup(fd), "rb", 0)
+    while stream.readline():
+        pass
+    stream.close()
+
+
+def read_chunked(fd):
+    reader = LineReader(fd)
+    while reader.readline() is not None:
+        pass
+
+
+def main():
+    size = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1\
+        else 4 * 1024 * 1024
+    record = create_record(size)
+    count = 3
+
+    for name, fn in (("unbuffered readline", read_unbuffered),
+                     ("LineReader", read_chunked)):
+        throughput = measure(record, count, fn)
+        print("{:<20} {:>10.2f} MiB/s".format(
+            name, throughput / (1024.0 * 1024.0)))
+
+
+if __name__ == "__main__":
+    main()
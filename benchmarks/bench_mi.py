@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+Microbenchmarks of the GDB/MI layer on synthetic records of growing size.
+Runs without GDB.
+
+For every benchmark it prints the time per record, the throughput and the
+scaling exponent between two consecutive sizes (1.0 means linear scaling,
+2.0 quadratic).
+
+Usage: python benchmarks/bench_mi.py [max record size]
+"""
+
+import math
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+import mi_corpus  # noqa
+from debugger.mi.communicator import Communicator  # noqa
+from debugger.mi.parser import Parser  # noqa
+
+
+def measure(fn, data, min_time=0.2):
+    """
+    Returns the best time of a single call of fn(data).
+    The call is repeated until min_time seconds pass (at least 3 times).
+    @type fn: callable
+    @type data: str
+    @type min_time: float
+    @rtype: float
+    """
+    best = None
+    total = 0.0
+    runs = 0
+
+    while runs < 3 or total < min_time:
+        start = time.time()
+        fn(data)
+        elapsed = time.time() - start
+
+        total += elapsed
+        runs += 1
+        best = elapsed if best is None else min(best, elapsed)
+
+    return max(best, 1e-9)
+
+
+def run_benchmark(name, fn, generator, sizes):
+    """
+    @type name: str
+    @type fn: callable
+    @type generator: callable
+    @type sizes: list of int
+    """
+    print("{}".format(name))
+    print("{:>10} {:>10} {:>14} {:>12} {:>8}".format(
+        "items", "bytes", "time [ms]", "MiB/s", "scaling"))
+
+    previous = None
+
+    for size in sizes:
+        data = generator(size)
+        elapsed = measure(fn, data)
+
+        scaling = ""
+        if previous:
+            scaling = "{:.2f}".format(
+                math.log(elapsed / previous[1]) /
+                math.log(float(size) / previous[0]))
+        previous = (size, elapsed)
+
+        print("{:>10} {:>10} {:>14.3f} {:>12.2f} {:>8}".format(
+            size, len(data), elapsed * 1000.0,
+            len(data) / elapsed / (1024.0 * 1024.0), scaling))
+
+    print("")
+
+
+def main():
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sizes = []
+    size = 10
+    while size <= max_size:
+        sizes.append(size)
+        size *= 10
+
+    parser = Parser()
+    communicator = Communicator()
+
+    benchmarks = [
+        ("Parser.parse (frames)", parser.parse, mi_corpus.frames),
+        ("Parser.parse (variables)", parser.parse, mi_corpus.variables),
+        ("Parser.parse_stack_frames", parser.parse_stack_frames,
+         mi_corpus.frames),
+        ("Parser.parse_breakpoints", parser.parse_breakpoints,
+         mi_corpus.breakpoints),
+        ("Parser.parse_disassembly", parser.parse_disassembly,
+         mi_corpus.disassembly),
+        ("Communicator._parse_output + Parser.parse (frames)",
+         lambda response: parser.parse(
+             communicator._parse_output(response).data.data),
+         lambda count: mi_corpus.record(mi_corpus.frames(count)))
+    ]
+
+    for name, fn, generator in benchmarks:
+        run_benchmark(name, fn, generator, sizes)
+
+
+if __name__ == "__main__":
+    main()
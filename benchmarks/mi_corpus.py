@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+Generators of synthetic GDB/MI result records of arbitrary size.
+Every generator returns the payload of the record (the part after
+"^done,"), record() turns it into a full output line.
+"""
+
+
+def record(payload, token=1):
+    """
+    @type payload: str
+    @type token: int
+    @rtype: str
+    """
+    return "{}^done,{}".format(token, payload)
+
+
+def frames(count):
+    """
+    Payload of -stack-list-frames with the given number of frames.
+    @type count: int
+    @rtype: str
+    """
+    return "stack=[{}]".format(",".join(
+        "frame={{level=\"{0}\",addr=\"0x{1:08x}\",func=\"recurse\","
+        "file=\"recursion.cpp\",fullname=\"/home/user/recursion.cpp\","
+        "line=\"{2}\"}}".format(i, 0x8048400 + i * 16, 10 + i % 20)
+        for i in xrange(count)))
+
+
+def variables(count):
+    """
+    Payload of -stack-list-variables with the given number of variables.
+    @type count: int
+    @rtype: str
+    """
+    return "variables=[{}]".format(",".join(
+        "{{name=\"var{0}\",arg=\"1\",value=\"{{x = {0}, "
+        "name = \\\"item {0}\\\"}}\"}}".format(i)
+        for i in xrange(count)))
+
+
+def breakpoints(count):
+    """
+    Payload of -break-list with the given number of breakpoints.
+    @type count: int
+    @rtype: str
+    """
+    body = ",".join(
+        "bkpt={{number=\"{0}\",type=\"breakpoint\",disp=\"keep\","
+        "enabled=\"y\",addr=\"0x{1:08x}\",func=\"main\",file=\"main.cpp\","
+        "fullname=\"/home/user/main.cpp\",line=\"{2}\","
+        "thread-groups=[\"i1\"],times=\"0\"}}".format(
+            i + 1, 0x8048400 + i * 4, i + 1)
+        for i in xrange(count))
+
+    return ("BreakpointTable={{nr_rows=\"{0}\",nr_cols=\"6\",hdr=["
+            "{{width=\"3\",alignment=\"-1\",col_name=\"number\","
+            "colhdr=\"Num\"}},{{width=\"14\",alignment=\"-1\","
+            "col_name=\"type\",colhdr=\"Type\"}}],body=[{1}]}}".format(
+                count, body))
+
+
+def disassembly(count):
+    """
+    Payload of -data-disassemble in source mode with the given number of
+    instructions (four instructions per source line).
+    @type count: int
+    @rtype: str
+    """
+    lines = []
+
+    for line in xrange(0, count, 4):
+        instructions = ",".join(
+            "{{address=\"0x{0:08x}\",func-name=\"main\",offset=\"{1}\","
+            "inst=\"mov    0x{1:x}(%ebp),%eax\"}}".format(
+                0x8048400 + i * 3, i * 3)
+            for i in xrange(line, min(line + 4, count)))
+        lines.append(
+            "src_and_asm_line={{line=\"{0}\",file=\"main.cpp\","
+            "fullname=\"/home/user/main.cpp\",line_asm_insn=[{1}]}}".format(
+                line / 4 + 1, instructions))
+
+    return "asm_insns=[{}]".format(",".join(lines))
@@ -22,15 +22,126 @@
 #endif
 
 #include <dlfcn.h>
+#include <execinfo.h>
+#include <fcntl.h>
+#include <malloc.h>
+#include <pthread.h>
 #include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <sys/syscall.h>
 
 #include <cassert>
+#include <cmath>
+#include <cstdint>
 #include <cstdlib>
-#include <cstdio>
+#include <ctime>
 
 #include <mutex>
+#include <new>
 
-#define ALLOC_FILE_TMP_VALUE ((FILE*) 1)
+/*
+    Allocation events are appended to ring buffers in a file shared with
+    the debugger (debugger/alloc_ring.py describes the same layout).
+
+    The first ring is shared by all threads, the others are channels that
+    threads claim for themselves on their first event and release when they
+    exit. A thread with a channel is its only producer, so threads do not
+    contend with each other and the debugger still sees every event as soon
+    as it is written. Threads that do not get a channel reserve slots in
+    the shared ring with a CAS on its write index.
+    A record is published by storing its sequence number last. When a ring
+    is full the event is dropped and the overrun counter of the ring is
+    incremented, the program is never blocked by the debugger.
+
+    If DEVI_ALLOC_CALL_SITES is set to a stack depth, every allocation
+    carries a hash of its return address backtrace (its call site).
+    The frames of a call site are sent only the first time it is seen.
+
+    If DEVI_ALLOC_SAMPLE_EVERY is set to N, only every Nth allocation of a
+    thread is recorded. If DEVI_ALLOC_SAMPLE_BYTES is set to B instead,
+    allocations are sampled at points of a Poisson process over the
+    allocated bytes with the mean interval of B bytes (a block of size s is
+    recorded with the probability 1 - exp(-s / B)). Addresses of recorded
+    blocks are kept in a table, so that exactly their frees are recorded.
+*/
+#define RING_MAGIC (0x49564544) // "DEVI"
+#define RING_VERSION (3)
+#define MAX_RINGS (257)
+
+#define MAX_CALL_SITE_DEPTH (32)
+#define SITE_TABLE_SIZE (1 << 16)
+#define SITE_TABLE_PROBES (64)
+
+#define SAMPLE_TABLE_BUCKETS (1 << 17)
+#define SAMPLE_BUCKET_SIZE (8)
+
+#if __cplusplus < 201703L
+namespace std
+{
+    enum class align_val_t : size_t {};
+}
+#endif
+
+enum AllocOp : uint32_t
+{
+    OP_MALLOC = 1,
+    OP_CALLOC = 2,
+    OP_REALLOC = 3,
+    OP_FREE = 4,
+    OP_SITE = 5,        // one frame of a call site, size is the frame index
+    OP_MEMALIGN = 6,    // posix_memalign, aligned_alloc, memalign, valloc
+    OP_NEW = 7,
+    OP_NEW_ARRAY = 8,
+    OP_DELETE = 9,
+    OP_DELETE_ARRAY = 10
+};
+
+struct FileHeader
+{
+    uint32_t magic;
+    uint32_t version;
+    uint32_t ring_count;
+    uint8_t padding[52];
+};
+
+struct RingHeader
+{
+    uint32_t owner;     // thread id of the channel's owner, 0 if it is free
+    uint32_t padding0;
+    uint64_t capacity;
+    uint8_t padding1[48];
+
+    uint64_t write_index;
+    uint64_t overruns;
+    uint8_t padding2[48];
+
+    uint64_t read_index;
+    uint8_t padding3[56];
+};
+
+struct RingRecord
+{
+    uint64_t sequence;  // index of the record + 1, written last
+    uint32_t op;
+    uint32_t thread;
+    uint64_t timestamp;
+    uint64_t address;
+    uint64_t size;
+    uint64_t argument;  // unused, realloc records the free of the old
+                        // block separately
+    uint64_t site;      // call site hash, 0 if unknown
+    uint64_t alignment; // requested alignment, 0 for the default one
+};
+
+static_assert(sizeof(FileHeader) == 64, "Invalid file header size");
+static_assert(sizeof(RingHeader) == 192, "Invalid ring header size");
+static_assert(sizeof(RingRecord) == 64, "Invalid ring record size");
+
+struct alignas(64) SampleBucket
+{
+    uint64_t addresses[SAMPLE_BUCKET_SIZE];  // 0 marks an empty entry
+};
 
 typedef void* (*malloc_orig_t)(size_t size);
 static malloc_orig_t malloc_orig = NULL;
@@ -44,8 +155,46 @@ static realloc_orig_t realloc_orig = NULL;
 typedef void (*free_orig_t)(void* addr);
 static free_orig_t free_orig = NULL;
 
-static FILE* alloc_file = NULL;
-static bool load_in_progress = false;
+typedef int (*posix_memalign_orig_t)(void** addr, size_t alignment,
+                                     size_t size);
+static posix_memalign_orig_t posix_memalign_orig = NULL;
+
+typedef void* (*aligned_alloc_orig_t)(size_t alignment, size_t size);
+static aligned_alloc_orig_t aligned_alloc_orig = NULL;
+
+typedef void* (*memalign_orig_t)(size_t alignment, size_t size);
+static memalign_orig_t memalign_orig = NULL;
+
+typedef void* (*valloc_orig_t)(size_t size);
+static valloc_orig_t valloc_orig = NULL;
+
+typedef void* (*pvalloc_orig_t)(size_t size);
+static pvalloc_orig_t pvalloc_orig = NULL;
+
+static RingHeader* rings[MAX_RINGS] = { NULL };
+static int ring_count = 0;
+static pthread_key_t channel_key;
+
+// set only in the thread that loads the symbols, other threads wait for
+// the symbols on alloc_mutex
+static __thread bool load_in_progress = false;
+static bool symbols_loaded = false;
+
+static __thread uint32_t thread_id = 0;
+static __thread RingHeader* thread_channel = NULL;
+static __thread bool channel_claimed = false;
+
+static int call_site_depth = 0;
+static uint64_t site_table[SITE_TABLE_SIZE] = { 0 };
+static __thread bool capturing_site = false;
+
+static bool sampling = false;
+static int64_t sample_every = 0;
+static int64_t sample_bytes = 0;
+static SampleBucket sample_table[SAMPLE_TABLE_BUCKETS];
+static __thread bool sample_initialized = false;
+static __thread int64_t sample_countdown = 0;
+static __thread uint64_t random_state = 0;
 
 static std::mutex alloc_mutex;
 typedef std::mutex devi_mutex;
@@ -64,27 +213,81 @@ void load_symbol(T& target, const char* name)
     }
 }
 
-void close_file(void)
+void release_channel(void* channel)
 {
-    if (alloc_file)
-    {
-        fclose(alloc_file);
-    }
+    thread_channel = NULL;
+    __atomic_store_n(&((RingHeader*) channel)->owner, 0, __ATOMIC_RELEASE);
 }
 
-void open_alloc_file()
+void reset_thread_state()
 {
-    if (!alloc_file)
-    {
-        alloc_file = ALLOC_FILE_TMP_VALUE; // to prevent stack overflow for malloc in fopen
+    // the child process has only the forking thread, which must not write
+    // to the channel of its parent
+    thread_id = 0;
+    thread_channel = NULL;
+    channel_claimed = false;
+    sample_initialized = false;
+}
 
+void open_rings()
+{
+    if (!ring_count)
+    {
         char* path = getenv("DEVI_ALLOC_FILE_PATH");
         assert(path);
 
-        alloc_file = fopen(path, "w");
-
-        assert(alloc_file);
-        atexit(close_file);
+        int fd = open(path, O_RDWR);
+        assert(fd != -1);
+
+        struct stat info;
+        int result = fstat(fd, &info);
+        assert(result == 0);
+        (void) result;
+
+        void* memory = mmap(NULL, info.st_size, PROT_READ | PROT_WRITE,
+                            MAP_SHARED, fd, 0);
+        assert(memory != MAP_FAILED);
+        close(fd);
+
+        FileHeader* header = (FileHeader*) memory;
+        assert(header->magic == RING_MAGIC);
+        assert(header->version == RING_VERSION);
+        assert(header->ring_count > 0 && header->ring_count <= MAX_RINGS);
+
+        char* position = (char*) (header + 1);
+        for (uint32_t i = 0; i < header->ring_count; i++)
+        {
+            RingHeader* ring = (RingHeader*) position;
+            rings[i] = ring;
+            position += sizeof(RingHeader) + ring->capacity * sizeof(RingRecord);
+        }
+
+        char* depth = getenv("DEVI_ALLOC_CALL_SITES");
+        if (depth)
+        {
+            call_site_depth = atoi(depth);
+            if (call_site_depth > MAX_CALL_SITE_DEPTH)
+            {
+                call_site_depth = MAX_CALL_SITE_DEPTH;
+            }
+        }
+
+        char* every = getenv("DEVI_ALLOC_SAMPLE_EVERY");
+        char* bytes = getenv("DEVI_ALLOC_SAMPLE_BYTES");
+        if (every)
+        {
+            sample_every = atoll(every);
+        }
+        else if (bytes)
+        {
+            sample_bytes = atoll(bytes);
+        }
+        sampling = sample_every > 1 || sample_bytes > 0;
+
+        pthread_key_create(&channel_key, release_channel);
+        pthread_atfork(NULL, NULL, reset_thread_state);
+
+        ring_count = (int) header->ring_count;
     }
 }
 
@@ -92,7 +295,7 @@ void load_symbols()
 {
     std::lock_guard<devi_mutex> lock(alloc_mutex);
 
-    if (load_in_progress)
+    if (load_in_progress || symbols_loaded)
     {
         return;
     }
@@ -103,82 +306,712 @@ void load_symbols()
     if (!calloc_orig) load_symbol(calloc_orig, "calloc");
     if (!realloc_orig) load_symbol(realloc_orig, "realloc");
     if (!free_orig) load_symbol(free_orig, "free");
-    if (!alloc_file) open_alloc_file();
+    if (!posix_memalign_orig) load_symbol(posix_memalign_orig,
+                                          "posix_memalign");
+    if (!aligned_alloc_orig) load_symbol(aligned_alloc_orig, "aligned_alloc");
+    if (!memalign_orig) load_symbol(memalign_orig, "memalign");
+    if (!valloc_orig) load_symbol(valloc_orig, "valloc");
+    if (!pvalloc_orig) load_symbol(pvalloc_orig, "pvalloc");
+    if (!ring_count) open_rings();
 
     load_in_progress = false;
+    __atomic_store_n(&symbols_loaded, true, __ATOMIC_RELEASE);
+}
+
+bool are_symbols_loaded()
+{
+    return __atomic_load_n(&symbols_loaded, __ATOMIC_ACQUIRE);
+}
+
+uint32_t get_thread_id()
+{
+    if (!thread_id)
+    {
+        thread_id = (uint32_t) syscall(SYS_gettid);
+    }
+
+    return thread_id;
+}
+
+/*
+    Returns the channel of the current thread, it is claimed on the first
+    call. Returns NULL if all channels are taken.
+*/
+RingHeader* get_thread_channel()
+{
+    if (!channel_claimed)
+    {
+        channel_claimed = true;
+
+        for (int i = 1; i < ring_count; i++)
+        {
+            uint32_t expected = 0;
+            if (__atomic_compare_exchange_n(&rings[i]->owner, &expected,
+                                            get_thread_id(), false,
+                                            __ATOMIC_ACQ_REL,
+                                            __ATOMIC_RELAXED))
+            {
+                thread_channel = rings[i];
+                pthread_setspecific(channel_key, thread_channel);
+                break;
+            }
+        }
+    }
+
+    return thread_channel;
+}
+
+void write_record(AllocOp op, void* address, size_t size,
+                  void* argument = NULL, uint64_t site = 0,
+                  size_t alignment = 0)
+{
+    if (!ring_count)
+    {
+        return;
+    }
+
+    RingHeader* ring = get_thread_channel();
+    bool shared = ring == NULL;
+    if (shared)
+    {
+        ring = rings[0];
+    }
+
+    uint64_t capacity = ring->capacity;
+    uint64_t index = __atomic_load_n(&ring->write_index, __ATOMIC_RELAXED);
+
+    do
+    {
+        uint64_t read_index = __atomic_load_n(&ring->read_index,
+                                              __ATOMIC_ACQUIRE);
+        if (index - read_index >= capacity)
+        {
+            __atomic_fetch_add(&ring->overruns, 1, __ATOMIC_RELAXED);
+            return;
+        }
+
+        if (!shared)
+        {
+            __atomic_store_n(&ring->write_index, index + 1, __ATOMIC_RELAXED);
+            break;
+        }
+    }
+    while (!__atomic_compare_exchange_n(&ring->write_index, &index, index + 1,
+                                        true, __ATOMIC_ACQ_REL,
+                                        __ATOMIC_RELAXED));
+
+    struct timespec time;
+    clock_gettime(CLOCK_MONOTONIC, &time);
+
+    RingRecord* record = (RingRecord*) (ring + 1) + (index % capacity);
+    record->op = op;
+    record->thread = get_thread_id();
+    record->timestamp = (uint64_t) time.tv_sec * 1000000000ULL + time.tv_nsec;
+    record->address = (uint64_t) (uintptr_t) address;
+    record->size = size;
+    record->argument = (uint64_t) (uintptr_t) argument;
+    record->site = site;
+    record->alignment = alignment;
+
+    __atomic_store_n(&record->sequence, index + 1, __ATOMIC_RELEASE);
+}
+
+/*
+    Returns true if the call site was not seen before.
+    The sites are stored in a lock-free open-addressing table, if the table
+    is full the site is reported as new again (the frames are resent).
+*/
+bool mark_site_seen(uint64_t site)
+{
+    size_t index = (size_t) site;
+
+    for (size_t probe = 0; probe < SITE_TABLE_PROBES; probe++)
+    {
+        uint64_t* slot = &site_table[(index + probe) & (SITE_TABLE_SIZE - 1)];
+        uint64_t current = __atomic_load_n(slot, __ATOMIC_ACQUIRE);
+
+        if (current == site)
+        {
+            return false;
+        }
+        if (current == 0)
+        {
+            if (__atomic_compare_exchange_n(slot, &current, site, false,
+                                            __ATOMIC_ACQ_REL,
+                                            __ATOMIC_ACQUIRE))
+            {
+                return true;
+            }
+            if (current == site)
+            {
+                return false;
+            }
+        }
+    }
+
+    return true;
+}
+
+/*
+    Returns the hash of the backtrace of the hooked function's caller.
+    Allocations made by backtrace itself (it loads libgcc on the first call)
+    are recorded without a call site.
+    Hooked functions call it directly (helpers they use are always inlined),
+    so the first two frames are capture_site and the hooked function.
+*/
+__attribute__((noinline)) uint64_t capture_site()
+{
+    if (!call_site_depth || capturing_site)
+    {
+        return 0;
+    }
+
+    capturing_site = true;
+
+    void* frames[MAX_CALL_SITE_DEPTH + 2];
+    int count = backtrace(frames, call_site_depth + 2);
+
+    capturing_site = false;
+
+    if (count <= 2)
+    {
+        return 0;
+    }
+
+    uint64_t site = 14695981039346656037ULL; // FNV-1a
+    for (int i = 2; i < count; i++)
+    {
+        uint64_t address = (uint64_t) (uintptr_t) frames[i];
+        for (int byte = 0; byte < 8; byte++)
+        {
+            site ^= (address >> (byte * 8)) & 0xFF;
+            site *= 1099511628211ULL;
+        }
+    }
+
+    if (site == 0)
+    {
+        site = 1;
+    }
+
+    if (mark_site_seen(site))
+    {
+        for (int i = 2; i < count; i++)
+        {
+            write_record(OP_SITE, frames[i], i - 2, NULL, site);
+        }
+    }
+
+    return site;
+}
+
+uint64_t next_random()
+{
+    if (!random_state)
+    {
+        struct timespec time;
+        clock_gettime(CLOCK_MONOTONIC, &time);
+        random_state = ((uint64_t) get_thread_id() << 32) ^
+                       (uint64_t) time.tv_nsec ^ 1;
+    }
+
+    random_state ^= random_state >> 12; // xorshift64*
+    random_state ^= random_state << 25;
+    random_state ^= random_state >> 27;
+    return random_state * 2685821657736338717ULL;
+}
+
+/*
+    Returns the number of allocations or bytes until the next sample.
+*/
+int64_t next_sample_interval()
+{
+    if (sample_every)
+    {
+        return sample_every;
+    }
+
+    // exponential distribution, u is uniform in (0, 1]
+    double u = ((next_random() >> 11) + 1) * (1.0 / 9007199254740992.0);
+    return (int64_t) (-log(u) * sample_bytes) + 1;
+}
+
+bool should_sample(size_t size)
+{
+    if (!sample_initialized)
+    {
+        sample_initialized = true;
+        if (sample_every)
+        {
+            // threads start at random phases, so they do not sample
+            // allocations made in lockstep
+            sample_countdown = 1 + (int64_t) (next_random() % sample_every);
+        }
+        else sample_countdown = next_sample_interval();
+    }
+
+    sample_countdown -= sample_every ? 1 : (int64_t) size;
+    if (sample_countdown > 0)
+    {
+        return false;
+    }
+
+    sample_countdown = next_sample_interval();
+    return true;
+}
+
+SampleBucket* get_sample_bucket(void* addr)
+{
+    uint64_t hash = ((uint64_t) (uintptr_t) addr >> 4) *
+                    11400714819323198485ULL;
+    return &sample_table[hash >> 47];
+}
+
+/*
+    Adds the address to the sampled blocks, returns false if its bucket is
+    full.
+*/
+bool add_sampled(void* addr)
+{
+    SampleBucket* bucket = get_sample_bucket(addr);
+
+    for (int i = 0; i < SAMPLE_BUCKET_SIZE; i++)
+    {
+        uint64_t expected = 0;
+        if (__atomic_compare_exchange_n(&bucket->addresses[i], &expected,
+                                        (uint64_t) (uintptr_t) addr, false,
+                                        __ATOMIC_ACQ_REL, __ATOMIC_RELAXED))
+        {
+            return true;
+        }
+    }
+
+    return false;
 }
 
-void* static_alloc(size_t size)
+/*
+    Removes the address from the sampled blocks, returns false if it was
+    not sampled.
+*/
+bool remove_sampled(void* addr)
 {
-    assert(static_buffer_index + size <= STATIC_BUFFER_SIZE);
-    size_t index = static_buffer_index;
-    static_buffer_index += size;
+    SampleBucket* bucket = get_sample_bucket(addr);
+    uint64_t address = (uint64_t) (uintptr_t) addr;
+
+    for (int i = 0; i < SAMPLE_BUCKET_SIZE; i++)
+    {
+        uint64_t expected = address;
+        if (__atomic_load_n(&bucket->addresses[i], __ATOMIC_RELAXED) ==
+                address &&
+            __atomic_compare_exchange_n(&bucket->addresses[i], &expected, 0,
+                                        false, __ATOMIC_ACQ_REL,
+                                        __ATOMIC_RELAXED))
+        {
+            return true;
+        }
+    }
+
+    return false;
+}
+
+/*
+    Returns true if the allocation of the block should be recorded.
+    A sampled block that does not fit into the table is not recorded,
+    so that its free is not recorded either.
+*/
+__attribute__((always_inline)) inline bool record_allocation(void* addr,
+                                                             size_t size)
+{
+    if (!sampling)
+    {
+        return true;
+    }
+
+    return addr && should_sample(size) && add_sampled(addr);
+}
+
+/*
+    Returns true if the free of the block should be recorded.
+*/
+__attribute__((always_inline)) inline bool record_free(void* addr)
+{
+    return !sampling || remove_sampled(addr);
+}
+
+void* static_alloc(size_t size, size_t alignment = 1)
+{
+    size_t index = (static_buffer_index + alignment - 1) & ~(alignment - 1);
+    assert(index + size <= STATIC_BUFFER_SIZE);
+    static_buffer_index = index + size;
     return static_buffer + index;
 }
 
+bool is_static(void* addr)
+{
+    return addr >= static_buffer && addr <= static_buffer + STATIC_BUFFER_SIZE;
+}
+
+/*
+    Returns true if the symbols are loaded and the original functions can be
+    called, false if the allocation has to be served from the static buffer
+    (dlsym allocates memory while the symbols are being loaded). Only the
+    thread that loads the symbols uses the static buffer, other threads
+    block in load_symbols until the symbols are loaded.
+*/
+__attribute__((always_inline)) inline bool prepare_hook()
+{
+    if (!are_symbols_loaded())
+    {
+        if (load_in_progress)
+        {
+            return false;
+        }
+        else load_symbols();
+    }
+
+    return true;
+}
+
+__attribute__((always_inline)) inline void* hooked_new(
+        size_t size, size_t alignment, AllocOp op, bool nothrow)
+{
+    if (!prepare_hook())
+    {
+        return static_alloc(size, alignment ? alignment : sizeof(void*));
+    }
+
+    if (size == 0)
+    {
+        size = 1;
+    }
+
+    while (true)
+    {
+        void* addr = NULL;
+        if (alignment)
+        {
+            if (posix_memalign_orig(&addr, alignment, size) != 0)
+            {
+                addr = NULL;
+            }
+        }
+        else addr = malloc_orig(size);
+
+        if (addr)
+        {
+            if (record_allocation(addr, size))
+            {
+                write_record(op, addr, size, NULL, capture_site(),
+                             alignment);
+            }
+            return addr;
+        }
+
+        std::new_handler handler = std::get_new_handler();
+        if (!handler)
+        {
+            if (nothrow)
+            {
+                return NULL;
+            }
+            throw std::bad_alloc();
+        }
+        handler();
+    }
+}
+
+__attribute__((always_inline)) inline void hooked_delete(void* addr,
+                                                         AllocOp op)
+{
+    if (is_static(addr))
+    {
+        return;
+    }
+
+    if (!are_symbols_loaded() && !load_in_progress)
+    {
+        load_symbols();
+    }
+
+    if (addr && record_free(addr))
+    {
+        write_record(op, addr, 0);
+    }
+
+    free_orig(addr);
+}
+
 void* malloc(size_t size)
 {
-    if (load_in_progress)
+    if (!prepare_hook())
     {
         return static_alloc(size);
     }
-    else load_symbols();
 
     void* addr = malloc_orig(size);
-    fprintf(alloc_file, "malloc %p %zu\n", addr, size);
-    fflush(alloc_file);
+    if (record_allocation(addr, size))
+    {
+        write_record(OP_MALLOC, addr, size, NULL, capture_site());
+    }
 
     return addr;
 }
 
 void* calloc(size_t num, size_t size)
 {
-    if (load_in_progress)
+    if (!prepare_hook())
     {
-        return static_alloc(size);
+        return static_alloc(num * size);
     }
-    else load_symbols();
 
     void* addr = calloc_orig(num, size);
-    fprintf(alloc_file, "calloc %p %zu\n", addr, num * size);
-    fflush(alloc_file);
+    if (record_allocation(addr, num * size))
+    {
+        write_record(OP_CALLOC, addr, num * size, NULL, capture_site());
+    }
 
     return addr;
 }
 
 void* realloc(void* addr, size_t size)
 {
-    if (load_in_progress)
+    if (!prepare_hook())
     {
         return static_alloc(size);
     }
-    else load_symbols();
+
+    // the free is recorded before the old block is released, so that it
+    // precedes any allocation of another thread that reuses its address
+    bool old_recorded = addr && record_free(addr);
+    if (old_recorded)
+    {
+        write_record(OP_FREE, addr, 0);
+    }
 
     void* addr_new = realloc_orig(addr, size);
-    fprintf(alloc_file, "realloc %p %p %zu\n", addr, addr_new, size);
-    fflush(alloc_file);
+    if (!addr_new && size && old_recorded && !sampling)
+    {
+        // the realloc failed and the old block is left untouched (a sampled
+        // block is not sampled any more)
+        write_record(OP_MALLOC, addr, malloc_usable_size(addr), NULL,
+                     capture_site());
+    }
+    else if (addr_new && record_allocation(addr_new, size))
+    {
+        write_record(OP_REALLOC, addr_new, size, NULL, capture_site());
+    }
 
     return addr_new;
 }
 
 void free(void* addr)
 {
-    if (addr >= static_buffer && addr <= static_buffer + STATIC_BUFFER_SIZE)
+    if (is_static(addr))
     {
         return;
     }
 
-    if (!load_in_progress)
+    if (!are_symbols_loaded() && !load_in_progress)
     {
         load_symbols();
     }
 
-    if (addr == NULL)
+    if (record_free(addr))
     {
-        fprintf(alloc_file, "free NULL\n");
+        write_record(OP_FREE, addr, 0);
     }
-    else fprintf(alloc_file, "free %p\n", addr);
-    fflush(alloc_file);
 
     free_orig(addr);
-}
\ No newline at end of file
+}
+
+int posix_memalign(void** addr, size_t alignment, size_t size)
+{
+    if (!prepare_hook())
+    {
+        *addr = static_alloc(size, alignment);
+        return 0;
+    }
+
+    int result = posix_memalign_orig(addr, alignment, size);
+    if (result == 0 && record_allocation(*addr, size))
+    {
+        write_record(OP_MEMALIGN, *addr, size, NULL, capture_site(),
+                     alignment);
+    }
+
+    return result;
+}
+
+void* aligned_alloc(size_t alignment, size_t size)
+{
+    if (!prepare_hook())
+    {
+        return static_alloc(size, alignment);
+    }
+
+    void* addr = aligned_alloc_orig(alignment, size);
+    if (addr && record_allocation(addr, size))
+    {
+        write_record(OP_MEMALIGN, addr, size, NULL, capture_site(),
+                     alignment);
+    }
+
+    return addr;
+}
+
+void* memalign(size_t alignment, size_t size)
+{
+    if (!prepare_hook())
+    {
+        return static_alloc(size, alignment);
+    }
+
+    void* addr = memalign_orig(alignment, size);
+    if (addr && record_allocation(addr, size))
+    {
+        write_record(OP_MEMALIGN, addr, size, NULL, capture_site(),
+                     alignment);
+    }
+
+    return addr;
+}
+
+void* valloc(size_t size)
+{
+    if (!prepare_hook())
+    {
+        return NULL;
+    }
+
+    void* addr = valloc_orig(size);
+    if (addr && record_allocation(addr, size))
+    {
+        write_record(OP_MEMALIGN, addr, size, NULL, capture_site(),
+                     sysconf(_SC_PAGESIZE));
+    }
+
+    return addr;
+}
+
+void* pvalloc(size_t size)
+{
+    if (!prepare_hook())
+    {
+        return NULL;
+    }
+
+    size_t page_size = sysconf(_SC_PAGESIZE);
+    void* addr = pvalloc_orig(size);
+    if (addr && record_allocation(addr, size))
+    {
+        write_record(OP_MEMALIGN, addr,
+                     (size + page_size - 1) & ~(page_size - 1), NULL,
+                     capture_site(), page_size);
+    }
+
+    return addr;
+}
+
+void* operator new(size_t size)
+{
+    return hooked_new(size, 0, OP_NEW, false);
+}
+
+void* operator new[](size_t size)
+{
+    return hooked_new(size, 0, OP_NEW_ARRAY, false);
+}
+
+void* operator new(size_t size, const std::nothrow_t&) noexcept
+{
+    return hooked_new(size, 0, OP_NEW, true);
+}
+
+void* operator new[](size_t size, const std::nothrow_t&) noexcept
+{
+    return hooked_new(size, 0, OP_NEW_ARRAY, true);
+}
+
+void* operator new(size_t size, std::align_val_t alignment)
+{
+    return hooked_new(size, (size_t) alignment, OP_NEW, false);
+}
+
+void* operator new[](size_t size, std::align_val_t alignment)
+{
+    return hooked_new(size, (size_t) alignment, OP_NEW_ARRAY, false);
+}
+
+void* operator new(size_t size, std::align_val_t alignment,
+                   const std::nothrow_t&) noexcept
+{
+    return hooked_new(size, (size_t) alignment, OP_NEW, true);
+}
+
+void* operator new[](size_t size, std::align_val_t alignment,
+                     const std::nothrow_t&) noexcept
+{
+    return hooked_new(size, (size_t) alignment, OP_NEW_ARRAY, true);
+}
+
+void operator delete(void* addr) noexcept
+{
+    hooked_delete(addr, OP_DELETE);
+}
+
+void operator delete[](void* addr) noexcept
+{
+    hooked_delete(addr, OP_DELETE_ARRAY);
+}
+
+void operator delete(void* addr, const std::nothrow_t&) noexcept
+{
+    hooked_delete(addr, OP_DELETE);
+}
+
+void operator delete[](void* addr, const std::nothrow_t&) noexcept
+{
+    hooked_delete(addr, OP_DELETE_ARRAY);
+}
+
+void operator delete(void* addr, size_t) noexcept
+{
+    hooked_delete(addr, OP_DELETE);
+}
+
+void operator delete[](void* addr, size_t) noexcept
+{
+    hooked_delete(addr, OP_DELETE_ARRAY);
+}
+
+void operator delete(void* addr, std::align_val_t) noexcept
+{
+    hooked_delete(addr, OP_DELETE);
+}
+
+void operator delete[](void* addr, std::align_val_t) noexcept
+{
+    hooked_delete(addr, OP_DELETE_ARRAY);
+}
+
+void operator delete(void* addr, std::align_val_t,
+                     const std::nothrow_t&) noexcept
+{
+    hooked_delete(addr, OP_DELETE);
+}
+
+void operator delete[](void* addr, std::align_val_t,
+                       const std::nothrow_t&) noexcept
+{
+    hooked_delete(addr, OP_DELETE_ARRAY);
+}
+
+void operator delete(void* addr, size_t, std::align_val_t) noexcept
+{
+    hooked_delete(addr, OP_DELETE);
+}
+
+void operator delete[](void* addr, size_t, std::align_val_t) noexcept
+{
+    hooked_delete(addr, OP_DELETE_ARRAY);
+}
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+#
+#    Copyright (C) 2015-2016 Jakub Beranek
+#
+#    This file is part of Devi.
+#
+#    Devi is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Devi is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Devi.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import bisect
+import collections
+import mmap
+import operator
+import os
+import struct
+import tempfile
+
+
+class AllocOp(object):
+    """
+    Operations recorded by the allocation hook (see alloc_hook.cpp).
+    """
+    Malloc = 1
+    Calloc = 2
+    Realloc = 3
+    Free = 4
+    Site = 5
+    Memalign = 6
+    New = 7
+    NewArray = 8
+    Delete = 9
+    DeleteArray = 10
+
+    allocations = (Malloc, Calloc, Memalign, New, NewArray)
+    deallocations = (Free, Delete, DeleteArray)
+
+
+AllocEvent = collections.namedtuple("AllocEvent", ["op", "thread",
+                                                   "timestamp", "address",
+                                                   "size", "argument",
+                                                   "site", "alignment"])
+"""
+Allocation event, timestamp is in nanoseconds of CLOCK_MONOTONIC,
+argument is the old address for realloc, site is the hash of the call site
+(0 if call sites are not captured), alignment is the requested alignment
+(0 for the default one).
+Site events carry one frame of a call site, the return address in address
+and the index of the frame in size.
+"""
+
+
+class AllocRing(object):
+    """
+    Ring buffers of fixed-size allocation records in a memory-mapped file
+    shared with the allocation hook (the layout must match alloc_hook.cpp).
+
+    The first ring is shared by all threads of the program, the others are
+    channels that the threads claim for themselves. The file header holds
+    the number of rings, every ring has a header and its records.
+    The ring header has three cache lines: owner of the channel and
+    capacity; the write index and overrun counter updated by the hook;
+    the read index updated by the debugger. A record is published when its
+    sequence number (index + 1) is written.
+    """
+    MAGIC = 0x49564544
+    VERSION = 3
+
+    file_header_struct = struct.Struct("<III")
+    capacity_struct = struct.Struct("<Q")
+    write_struct = struct.Struct("<QQ")
+    read_struct = struct.Struct("<Q")
+    record_struct = struct.Struct("<QIIQQQQQQ")
+    sequence_struct = struct.Struct("<Q")
+
+    FILE_HEADER_SIZE = 64
+    CAPACITY_OFFSET = 8
+    WRITE_OFFSET = 64
+    READ_OFFSET = 128
+    HEADER_SIZE = 192
+
+    @staticmethod
+    def create(capacity, channel_count=0, channel_capacity=0):
+        """
+        Creates a ring file in the temp dir.
+        @param capacity: number of records in the shared ring
+        @type capacity: int
+        @param channel_count: number of per-thread channels
+        @type channel_count: int
+        @param channel_capacity: number of records in every channel
+        @type channel_capacity: int
+        @rtype: AllocRing
+        """
+        capacities = [capacity] + [channel_capacity] * channel_count
+        size = AllocRing.FILE_HEADER_SIZE + sum(
+            AllocRing.HEADER_SIZE + ring_capacity *
+            AllocRing.record_struct.size for ring_capacity in capacities)
+
+        fd, path = tempfile.mkstemp(suffix=".ring")
+
+        try:
+            os.ftruncate(fd, size)
+            memory = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        AllocRing.file_header_struct.pack_into(memory, 0, AllocRing.MAGIC,
+                                               AllocRing.VERSION,
+                                               len(capacities))
+
+        rings = []
+        offset = AllocRing.FILE_HEADER_SIZE
+        for ring_capacity in capacities:
+            AllocRing.capacity_struct.pack_into(
+                memory, offset + AllocRing.CAPACITY_OFFSET, ring_capacity)
+            rings.append(_Ring(offset, ring_capacity))
+            offset += (AllocRing.HEADER_SIZE +
+                       ring_capacity * AllocRing.record_struct.size)
+
+        return AllocRing(os.path.abspath(path), memory, rings)
+
+    def __init__(self, path, memory, rings):
+        """
+        @type path: str
+        @type memory: mmap.mmap
+        @type rings: list of _Ring
+        """
+        self.path = path
+        self.memory = memory
+        self.rings = rings
+        self.held_events = []
+        self.newest_timestamp = 0
+
+    def get_overruns(self):
+        """
+        Returns the number of events that were dropped because a ring was
+        full.
+        @rtype: int
+        """
+        return sum(AllocRing.write_struct.unpack_from(
+            self.memory, ring.offset + AllocRing.WRITE_OFFSET)[1]
+            for ring in self.rings)
+
+    def read(self, limit, flush=False):
+        """
+        Returns up to limit published events from every ring and frees their
+        slots. Events from different rings are ordered by their timestamps.
+
+        Rings are read one after another, so an event can be published to
+        a ring that was already read (or to a slot that was reserved before)
+        after newer events of other rings were read. Every ring therefore
+        gives a bound, the lowest timestamp its unread events can have, and
+        events newer than the lowest bound are held back until a later
+        read:
+            - a ring that was read to its end can only get events newer
+              than the events published before it was read,
+            - a ring that stopped at the limit or at a reserved slot can
+              only get events newer than the last one read from it (events
+              of the shared ring are ordered only roughly).
+        @type limit: int
+        @param flush: do not hold back events because of events that may
+            still be published, e.g. when the program is stopped or has
+            ended
+        @type flush: bool
+        @rtype: list of AllocEvent
+        """
+        events = self.held_events
+        self.held_events = []
+        sources = 1 if events else 0
+        horizon = None
+
+        for ring in self.rings:
+            count = len(events)
+            published = self.newest_timestamp
+
+            bound = self._read_ring(ring, limit, events)
+            if len(events) - count < limit:
+                # the ring has no other published events
+                if flush:
+                    bound = None
+                elif bound is None:
+                    bound = published
+            if bound is not None and (horizon is None or bound < horizon):
+                horizon = bound
+
+            if len(events) > count:
+                sources += 1
+                self.newest_timestamp = max(self.newest_timestamp,
+                                            events[-1].timestamp)
+
+        if sources > 1:
+            events.sort(key=operator.itemgetter(2))
+
+        if horizon is not None:
+            index = bisect.bisect_right([event.timestamp for event in events],
+                                        horizon)
+            self.held_events = events[index:]
+            del events[index:]
+
+        return events
+
+    def _read_ring(self, ring, limit, events):
+        """
+        Appends up to limit events of the given ring to events.
+        Returns None if the ring was read to its end, otherwise the timestamp
+        of the last event read from it.
+        @type ring: _Ring
+        @type limit: int
+        @type events: list of AllocEvent
+        @rtype: int | None
+        """
+        memory = self.memory
+        capacity = ring.capacity
+        records_offset = ring.offset + AllocRing.HEADER_SIZE
+        record_size = AllocRing.record_struct.size
+        unpack_record = AllocRing.record_struct.unpack_from
+        unpack_sequence = AllocRing.sequence_struct.unpack_from
+
+        write_index = AllocRing.write_struct.unpack_from(
+            memory, ring.offset + AllocRing.WRITE_OFFSET)[0]
+        end = min(write_index, ring.read_index + limit)
+
+        index = ring.read_index
+
+        while index < end:
+            offset = records_offset + (index % capacity) * record_size
+
+            # the slot is reserved, but the record is not written yet
+            if unpack_sequence(memory, offset)[0] != index + 1:
+                break
+
+            events.append(AllocEvent._make(
+                unpack_record(memory, offset)[1:]))
+            index += 1
+
+        if index != ring.read_index:
+            ring.read_index = index
+            ring.last_timestamp = events[-1].timestamp
+            AllocRing.read_struct.pack_into(
+                memory, ring.offset + AllocRing.READ_OFFSET, index)
+
+        if index == write_index:
+            return None
+
+        return ring.last_timestamp
+
+    def close(self):
+        """
+        Unmaps the rings and removes their file.
+        """
+        self.memory.close()
+
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class _Ring(object):
+    def __init__(self, offset, capacity):
+        """
+        @type offset: int
+        @type capacity: int
+        """
+        self.offset = offset
+        self.capacity = capacity
+        self.read_index = 0
+        self.last_timestamp = 0
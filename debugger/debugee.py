@@ -149,19 +149,58 @@ class Variable(object):
         self._value = value
         self.type = type
         self.path = path
+        self.bitsize = 0
+        """@type bitsize: int"""
 
-        self.children = []
+        self._children = []
+        self.children_loader = None
+        """@type children_loader: callable | None"""
 
         self.on_value_changed = EventBroadcaster()
 
         self.constraint = None
 
+    @property
+    def children(self):
+        """
+        Children of the variable. If they were not loaded together with the
+        variable, they are loaded by the children loader on first access.
+        @rtype: list of Variable
+        """
+        if self.children_loader:
+            loader = self.children_loader
+            self.children_loader = None
+            loader(self)
+
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        self.children_loader = None
+        self._children = children
+
+    def has_loaded_children(self):
+        """
+        @rtype: bool
+        """
+        return self.children_loader is None
+
+    def get_loaded_children(self):
+        """
+        Returns the children without loading them.
+        @rtype: list of Variable
+        """
+        if self.has_loaded_children():
+            return self._children
+        else:
+            return []
+
     def add_child(self, child):
         """
         Adds a child variable to this variable.
         @type child: Variable
         """
-        self.children.append(child)
+        self._children.append(child)
         child.on_value_changed.redirect(self.on_value_changed)
 
     def set_constraint(self, constraint):
@@ -334,13 +373,127 @@ class Register(object):
 
 
 class HeapBlock(object):
-    def __init__(self, address, size):
+    def __init__(self, address, size, site=0, alignment=0):
         """
         @type address: str
         @type size: int
+        @param site: id of the call site that allocated the block (0 if
+            unknown)
+        @type site: int
+        @param alignment: requested alignment (0 for the default one)
+        @type alignment: int
         """
         self.address = address
         self.size = size
+        self.site = site
+        self.alignment = alignment
 
     def __repr__(self):
         return "[{}: {} bytes]".format(self.address, self.size)
+
+
+class CallSite(object):
+    def __init__(self, id):
+        """
+        Code location (backtrace) that allocates heap blocks.
+        @type id: int
+        """
+        self.id = id
+        self.frames = []
+        """@type frames: list of int"""
+        self.live_bytes = 0
+        self.live_blocks = 0
+        self.total_allocations = 0
+
+    def __repr__(self):
+        return "CallSite {:x}: {} bytes in {} blocks".format(
+            self.id, self.live_bytes, self.live_blocks)
+
+
+class HeapEstimate(object):
+    def __init__(self, live_blocks, live_bytes, total_allocations,
+                 total_deallocations):
+        """
+        Statistics of the whole heap estimated from sampled allocations.
+        @type live_blocks: float
+        @type live_bytes: float
+        @type total_allocations: float
+        @type total_deallocations: float
+        """
+        self.live_blocks = live_blocks
+        self.live_bytes = live_bytes
+        self.total_allocations = total_allocations
+        self.total_deallocations = total_deallocations
+
+    def __repr__(self):
+        return "HeapEstimate: {:.0f} bytes in {:.0f} blocks".format(
+            self.live_bytes, self.live_blocks)
+
+
+class HeapStats(object):
+    def __init__(self, size_classes, peak_live_bytes, allocation_rate,
+                 address_span, fragmentation):
+        """
+        Health statistics of the heap.
+        @param size_classes: triples (size class, live blocks, live bytes)
+            of the non-empty power-of-two size classes ordered by the size
+            class, a block belongs to the smallest class that fits it
+        @type size_classes: list of (int, int, int)
+        @param peak_live_bytes: maximum of the live bytes so far
+        @type peak_live_bytes: int
+        @param allocation_rate: allocations per second since the previous
+            notification
+        @type allocation_rate: float
+        @param address_span: distance between the start of the lowest block
+            and the end of the highest block
+        @type address_span: int
+        @param fragmentation: part of the address span that is not covered
+            by live blocks (0 to 1)
+        @type fragmentation: float
+        """
+        self.size_classes = size_classes
+        self.peak_live_bytes = peak_live_bytes
+        self.allocation_rate = allocation_rate
+        self.address_span = address_span
+        self.fragmentation = fragmentation
+
+    def __repr__(self):
+        return "HeapStats: peak {} bytes, {:.0f} allocations/s".format(
+            self.peak_live_bytes, self.allocation_rate)
+
+
+class HeapDelta(object):
+    def __init__(self, added, removed, live_blocks, live_bytes,
+                 total_allocations, total_deallocations, estimate=None,
+                 stats=None):
+        """
+        Changes of the heap since the previous notification.
+        Blocks that were allocated and freed in between are in neither list,
+        they are counted only in the totals. The removed blocks have to be
+        dropped before the added ones are added, a new block can start at
+        the address of a removed one.
+        If the allocations are sampled, the lists and the totals contain
+        only the sampled blocks and the estimate scales them to the whole
+        heap.
+        @type added: list of HeapBlock
+        @type removed: list of HeapBlock
+        @type live_blocks: int
+        @type live_bytes: int
+        @type total_allocations: int
+        @type total_deallocations: int
+        @type estimate: HeapEstimate | None
+        @type stats: HeapStats | None
+        """
+        self.added = added
+        self.removed = removed
+        self.live_blocks = live_blocks
+        self.live_bytes = live_bytes
+        self.total_allocations = total_allocations
+        self.total_deallocations = total_deallocations
+        self.estimate = estimate
+        self.stats = stats
+
+    def __repr__(self):
+        return "HeapDelta: +{} -{} blocks, {} bytes in {} blocks".format(
+            len(self.added), len(self.removed), self.live_bytes,
+            self.live_blocks)
@@ -76,6 +76,12 @@ class HeapManager(object):
     def stop(self):
         raise NotImplementedError()
 
+    def flush(self):
+        """
+        Notifies pending heap changes immediately.
+        """
+        raise NotImplementedError()
+
     def find_block_by_address(self, addr):
         """
         @type addr: str
@@ -83,6 +89,14 @@ class HeapManager(object):
         """
         raise NotImplementedError()
 
+    def find_block_containing(self, addr):
+        """
+        Returns the heap block that contains the given address.
+        @type addr: str
+        @rtype: HeapBlock | None
+        """
+        return None
+
     def get_total_allocations(self):
         """
         @rtype: int
@@ -95,6 +109,48 @@ class HeapManager(object):
         """
         raise NotImplementedError()
 
+    def get_live_bytes(self):
+        """
+        @rtype: int
+        """
+        raise NotImplementedError()
+
+    def get_overruns(self):
+        """
+        Returns the number of allocation events that were lost because
+        the debugger did not keep up with the debugged program.
+        @rtype: int
+        """
+        raise NotImplementedError()
+
+    def get_call_sites(self):
+        """
+        @rtype: list of debugee.CallSite
+        """
+        return []
+
+    def get_stats(self):
+        """
+        @rtype: debugee.HeapStats | None
+        """
+        return None
+
+    def get_leak_report(self):
+        """
+        Returns the report of the heap blocks that were not freed by the
+        last program that ended.
+        @rtype: debugger.heap_report.LeakReport | None
+        """
+        return None
+
+    def get_sampling_rate(self):
+        """
+        Returns the sampling of the recorded allocations as a pair (every,
+        byte_interval), (0, 0) if all allocations are recorded.
+        @rtype: (int, int)
+        """
+        return (0, 0)
+
 
 class IOManager(object):
     def __init__(self):
@@ -197,6 +253,16 @@ class FileManager(object):
         """
         raise NotImplementedError()
 
+    def iter_disassembly(self, filename, line):
+        """
+        Yields the disassembled source lines for the given location as
+        they are parsed.
+        @type filename: str
+        @type line: int
+        @rtype: generator of dict
+        """
+        raise NotImplementedError()
+
     def disassemble_raw(self, filename, line):
         """
         Disassembles the given line in a raw form (returns a string with the
@@ -248,6 +314,13 @@ class ThreadManager(object):
         """
         raise NotImplementedError()
 
+    def iter_frames(self):
+        """
+        Yields the stack frames as they are parsed.
+        @rtype: generator of debugee.Frame
+        """
+        raise NotImplementedError()
+
     def get_frames_with_variables(self):
         """
         @rtype: list of debugee.Frame
@@ -291,6 +364,23 @@ class VariableManager(object):
         """
         raise NotImplementedError()
 
+    def get_variable_at(self, address, type_name):
+        """
+        Returns the variable of the given type located at the given address.
+        @type address: str
+        @type type_name: str
+        @rtype: debugee.Variable
+        """
+        return self.get_variable("{{{0}}}({1})".format(type_name, address))
+
+    def load_children(self, variables):
+        """
+        Loads children of the given variables that were not loaded yet.
+        @type variables: list of debugee.Variable
+        """
+        for variable in variables:
+            variable.children
+
     def update_variable(self, variable):
         """
         Updates the variable's value in the debugged process.
@@ -298,12 +388,35 @@ class VariableManager(object):
         """
         raise NotImplementedError()
 
+    def track_variables(self, frames):
+        """
+        Starts tracking changes of the variables of the given frames.
+        @type frames: list of debugee.Frame
+        """
+        pass
+
+    def track_variable(self, variable):
+        """
+        Starts tracking changes of a variable that does not belong to any
+        frame.
+        @type variable: debugee.Variable
+        """
+        pass
+
+    def update_tracked_variables(self):
+        """
+        Updates the tracked variables that changed since the last stop.
+        Returns None if the frames have to be loaded again.
+        @rtype: list of debugee.Variable | None
+        """
+        return None
+
     def get_memory(self, address, count):
         """
         Returns count bytes from the given address.
         @type address: str
         @type count: int
-        @rtype: list of int
+        @rtype: memoryview
         """
         raise NotImplementedError()
 
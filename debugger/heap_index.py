@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+#    Copyright (C) 2015-2016 Jakub Beranek
+#
+#    This file is part of Devi.
+#
+#    Devi is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Devi is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Devi.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import bisect
+
+
+class HeapIndex(object):
+    """
+    Live heap blocks indexed by their start address.
+
+    Exact lookups go through a dict, the sorted start addresses answer
+    which block contains a given address by bisection.
+    The start addresses are kept in sorted chunks of limited size, so adding
+    or removing a block shifts only one chunk and the list of the chunk
+    maxima instead of all addresses.
+    Iteration and indexing return the blocks ordered by address.
+    """
+    CHUNK_SIZE = 512
+
+    def __init__(self):
+        self.blocks = {}
+        """@type blocks: dict of (int, debugger.debugee.HeapBlock)"""
+        self.chunks = []
+        """@type chunks: list of list of int"""
+        self.maxes = []
+        """@type maxes: list of int"""
+
+    def add(self, address, block):
+        """
+        Adds the block starting at the given address, a block with the same
+        start address is replaced.
+        @type address: int
+        @type block: debugger.debugee.HeapBlock
+        """
+        if address not in self.blocks:
+            self._insert_start(address)
+        self.blocks[address] = block
+
+    def remove(self, address):
+        """
+        Removes and returns the block starting at the given address.
+        @type address: int
+        @rtype: debugger.debugee.HeapBlock | None
+        """
+        block = self.blocks.pop(address, None)
+
+        if block is not None:
+            self._remove_start(address)
+
+        return block
+
+    def get(self, address):
+        """
+        Returns the block starting at the given address.
+        @type address: int
+        @rtype: debugger.debugee.HeapBlock | None
+        """
+        return self.blocks.get(address)
+
+    def find_block_containing(self, address):
+        """
+        Returns the block whose range [start, start + size) contains the
+        given address.
+        @type address: int
+        @rtype: debugger.debugee.HeapBlock | None
+        """
+        if not self.chunks:
+            return None
+
+        # the first chunk with addresses above the given one
+        index = bisect.bisect_right(self.maxes, address)
+
+        if index == len(self.chunks):
+            start = self.maxes[-1]
+        else:
+            chunk = self.chunks[index]
+            position = bisect.bisect_right(chunk, address) - 1
+            if position >= 0:
+                start = chunk[position]
+            elif index > 0:
+                start = self.maxes[index - 1]
+            else:
+                return None
+
+        block = self.blocks.get(start)
+
+        if block is not None and (address == start or
+                                  address < start + block.size):
+            return block
+
+        return None
+
+    def get_span(self):
+        """
+        Returns the distance between the start of the lowest block and the
+        end of the highest block (0 if there are no blocks).
+        @rtype: int
+        """
+        if not self.chunks:
+            return 0
+
+        end = self.maxes[-1]
+        return end + self.blocks[end].size - self.chunks[0][0]
+
+    def clear(self):
+        self.blocks.clear()
+        del self.chunks[:]
+        del self.maxes[:]
+
+    def _insert_start(self, address):
+        """
+        @type address: int
+        """
+        chunks = self.chunks
+        maxes = self.maxes
+
+        if not chunks:
+            chunks.append([address])
+            maxes.append(address)
+            return
+
+        index = bisect.bisect_left(maxes, address)
+
+        if index == len(chunks):
+            index -= 1
+            chunks[index].append(address)
+            maxes[index] = address
+        else:
+            bisect.insort(chunks[index], address)
+
+        chunk = chunks[index]
+        if len(chunk) > 2 * HeapIndex.CHUNK_SIZE:
+            chunks.insert(index + 1, chunk[HeapIndex.CHUNK_SIZE:])
+            del chunk[HeapIndex.CHUNK_SIZE:]
+            maxes.insert(index, chunk[-1])
+
+    def _remove_start(self, address):
+        """
+        @type address: int
+        """
+        chunks = self.chunks
+        maxes = self.maxes
+
+        index = bisect.bisect_left(maxes, address)
+        chunk = chunks[index]
+        del chunk[bisect.bisect_left(chunk, address)]
+
+        if not chunk:
+            del chunks[index]
+            del maxes[index]
+        elif (len(chunk) < HeapIndex.CHUNK_SIZE // 4 and
+                index + 1 < len(chunks) and
+                len(chunk) + len(chunks[index + 1]) <=
+                2 * HeapIndex.CHUNK_SIZE):
+            # merge small chunks, so that the number of chunks stays low
+            chunk.extend(chunks[index + 1])
+            del chunks[index + 1]
+            del maxes[index]
+        else:
+            maxes[index] = chunk[-1]
+
+    def __copy__(self):
+        index = HeapIndex()
+        index.blocks = dict(self.blocks)
+        index.chunks = [list(chunk) for chunk in self.chunks]
+        index.maxes = list(self.maxes)
+        return index
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.blocks)
+
+        if index >= 0:
+            for chunk in self.chunks:
+                if index < len(chunk):
+                    return self.blocks[chunk[index]]
+                index -= len(chunk)
+
+        raise IndexError("Heap block index out of range")
+
+    def __iter__(self):
+        blocks = self.blocks
+        starts = [start for chunk in self.chunks for start in chunk]
+
+        for start in starts:
+            block = blocks.get(start)
+            if block is not None:
+                yield block
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+#    Copyright (C) 2015-2016 Jakub Beranek
+#
+#    This file is part of Devi.
+#
+#    Devi is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Devi is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Devi.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import mmap
+import os
+import struct
+
+from debugger.alloc_ring import AllocEvent, AllocOp
+
+
+COLUMNS = (
+    ("timestamp", "Q"),
+    ("op", "B"),
+    ("address", "Q"),
+    ("size", "Q"),
+    ("site", "Q"),
+    ("alignment", "I")
+)
+"""
+Columns of the heap log, every column is stored in its own file in the log
+directory as an array of little-endian values of the given struct format.
+"""
+
+
+class HeapLogWriter(object):
+    """
+    Appends allocation events to a new heap log (an existing log in the
+    directory is replaced).
+
+    Timestamps are clamped to be non-decreasing (events of different threads
+    can be published slightly out of order), so the log can be searched by
+    time. Reallocations are stored as a free of the old address followed by
+    a realloc without the old address.
+    """
+    def __init__(self, path):
+        """
+        @param path: directory of the log
+        @type path: str
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self.path = path
+        self.files = [open(os.path.join(path, name), "wb")
+                      for (name, format) in COLUMNS]
+        self.last_timestamp = 0
+
+    def append(self, events):
+        """
+        @type events: list of debugger.alloc_ring.AllocEvent
+        """
+        rows = []
+        last_timestamp = self.last_timestamp
+
+        for event in events:
+            timestamp = max(event.timestamp, last_timestamp)
+            last_timestamp = timestamp
+
+            if event.op == AllocOp.Realloc and event.argument:
+                rows.append((timestamp, AllocOp.Free, event.argument, 0, 0,
+                             0))
+            rows.append((timestamp, event.op, event.address, event.size,
+                         event.site, event.alignment))
+
+        self.last_timestamp = last_timestamp
+
+        if not rows:
+            return
+
+        for column, (name, format) in enumerate(COLUMNS):
+            self.files[column].write(struct.pack(
+                "<{}{}".format(len(rows), format),
+                *[row[column] for row in rows]))
+
+    def flush(self):
+        for file in self.files:
+            file.flush()
+
+    def close(self):
+        for file in self.files:
+            file.close()
+
+
+class HeapLog(object):
+    """
+    Memory-mapped heap log opened for reading.
+    """
+    def __init__(self, path):
+        """
+        @param path: directory of the log
+        @type path: str
+        """
+        self.path = path
+        self.columns = []
+        self.count = None
+
+        for name, format in COLUMNS:
+            width = struct.calcsize("<" + format)
+
+            with open(os.path.join(path, name), "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                if size > 0:
+                    memory = mmap.mmap(file.fileno(), size,
+                                       access=mmap.ACCESS_READ)
+                else:
+                    memory = None
+
+            # a column may be written only partially if the writer crashed
+            count = size // width
+            if self.count is None or count < self.count:
+                self.count = count
+
+            self.columns.append((memory, format, width))
+
+    def __len__(self):
+        return self.count
+
+    def get_timestamp(self, index):
+        """
+        @type index: int
+        @rtype: int
+        """
+        memory, format, width = self.columns[0]
+        return struct.unpack_from("<" + format, memory, index * width)[0]
+
+    def find_index(self, timestamp):
+        """
+        Returns the number of events that happened until the given timestamp
+        (including).
+        @type timestamp: int
+        @rtype: int
+        """
+        low = 0
+        high = self.count
+
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_timestamp(middle) <= timestamp:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def read(self, start, end):
+        """
+        Returns the events with indices in [start, end).
+        @type start: int
+        @type end: int
+        @rtype: list of debugger.alloc_ring.AllocEvent
+        """
+        end = min(end, self.count)
+        if start >= end:
+            return []
+
+        count = end - start
+        columns = [struct.unpack_from("<{}{}".format(count, format), memory,
+                                      start * width)
+                   for (memory, format, width) in self.columns]
+
+        return [AllocEvent(op, 0, timestamp, address, size, 0, site,
+                           alignment)
+                for (timestamp, op, address, size, site, alignment)
+                in zip(*columns)]
+
+    def close(self):
+        for memory, format, width in self.columns:
+            if memory is not None:
+                memory.close()
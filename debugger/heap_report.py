@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#
+#    Copyright (C) 2015-2016 Jakub Beranek
+#
+#    This file is part of Devi.
+#
+#    Devi is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Devi is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with Devi.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+import csv
+import json
+
+
+def get_size_class(size):
+    """
+    Returns the smallest power of two that is not smaller than the given
+    size (0 for empty blocks).
+    @type size: int
+    @rtype: int
+    """
+    if size <= 0:
+        return 0
+
+    return 1 << (size - 1).bit_length()
+
+
+class LeakGroup(object):
+    def __init__(self, key):
+        """
+        Outstanding blocks that share a size class or a call site.
+        @param key: size class or call site id
+        @type key: int
+        """
+        self.key = key
+        self.blocks = 0
+        self.bytes = 0
+
+    def __repr__(self):
+        return "LeakGroup {}: {} bytes in {} blocks".format(
+            self.key, self.bytes, self.blocks)
+
+
+class LeakReport(object):
+    """
+    Heap blocks that were still allocated when the program ended, grouped
+    by their size class and by their call site (if call sites were
+    captured).
+    """
+    def __init__(self, sampling_rate=(0, 0)):
+        """
+        @param sampling_rate: sampling of the recorded allocations, see
+            debugger.mi.heap_manager.HeapManager.set_sampling
+        @type sampling_rate: (int, int)
+        """
+        self.sampling_rate = sampling_rate
+        self.blocks = 0
+        self.bytes = 0
+        self.size_classes = {}
+        """@type size_classes: dict of (int, LeakGroup)"""
+        self.sites = {}
+        """@type sites: dict of (int, LeakGroup)"""
+        self.call_sites = {}
+        """@type call_sites: dict of (int, debugger.debugee.CallSite)"""
+
+    def add_block(self, block, call_site=None):
+        """
+        @type block: debugger.debugee.HeapBlock
+        @param call_site: call site of the block
+        @type call_site: debugger.debugee.CallSite | None
+        """
+        self.blocks += 1
+        self.bytes += block.size
+
+        size_class = get_size_class(block.size)
+        group = self.size_classes.get(size_class)
+        if group is None:
+            group = LeakGroup(size_class)
+            self.size_classes[size_class] = group
+        group.blocks += 1
+        group.bytes += block.size
+
+        if block.site:
+            group = self.sites.get(block.site)
+            if group is None:
+                group = LeakGroup(block.site)
+                self.sites[block.site] = group
+                if call_site is not None:
+                    self.call_sites[block.site] = call_site
+            group.blocks += 1
+            group.bytes += block.size
+
+    def get_size_classes(self):
+        """
+        Returns the size class groups ordered by their size class.
+        @rtype: list of LeakGroup
+        """
+        return sorted(self.size_classes.itervalues(),
+                      key=lambda group: group.key)
+
+    def get_sites(self):
+        """
+        Returns the call site groups ordered by their bytes.
+        @rtype: list of LeakGroup
+        """
+        return sorted(self.sites.itervalues(),
+                      key=lambda group: group.bytes, reverse=True)
+
+    def write_json(self, file, symbolize=None):
+        """
+        @type file: file
+        @param symbolize: returns descriptions of the frames of a call site
+            (e.g. HeapManager.symbolize_call_site), frames are written as
+            addresses without it
+        @type symbolize: callable | None
+        """
+        sites = []
+        for group in self.get_sites():
+            site = {
+                "site": "0x{:x}".format(group.key),
+                "blocks": group.blocks,
+                "bytes": group.bytes,
+                "frames": self._get_frames(group.key, symbolize)
+            }
+            sites.append(site)
+
+        json.dump({
+            "blocks": self.blocks,
+            "bytes": self.bytes,
+            "sampling_rate": list(self.sampling_rate),
+            "size_classes": [{"size_class": group.key,
+                              "blocks": group.blocks,
+                              "bytes": group.bytes}
+                             for group in self.get_size_classes()],
+            "call_sites": sites
+        }, file, indent=2)
+
+    def write_csv(self, file, symbolize=None):
+        """
+        Writes a row for every group, the call site frames are joined
+        by " <- ".
+        @type file: file
+        @type symbolize: callable | None
+        """
+        writer = csv.writer(file)
+        writer.writerow(["group", "key", "blocks", "bytes", "frames"])
+
+        for group in self.get_size_classes():
+            writer.writerow(["size_class", group.key, group.blocks,
+                             group.bytes, ""])
+        for group in self.get_sites():
+            writer.writerow(["call_site", "0x{:x}".format(group.key),
+                             group.blocks, group.bytes,
+                             " <- ".join(self._get_frames(group.key,
+                                                          symbolize))])
+
+    def _get_frames(self, site, symbolize):
+        """
+        @type site: int
+        @type symbolize: callable | None
+        @rtype: list of str
+        """
+        call_site = self.call_sites.get(site)
+        if call_site is None:
+            return []
+
+        if symbolize:
+            return symbolize(call_site)
+
+        return ["0x{:x}".format(address) for address in call_site.frames]
+
+    def __repr__(self):
+        return "LeakReport: {} bytes in {} blocks".format(self.bytes,
+                                                          self.blocks)
@@ -19,10 +19,11 @@
 #
 
 
+import Queue
+import collections
 import glob
 import os
 import re
-import select
 import subprocess
 import threading
 import traceback
@@ -35,14 +36,10 @@ from debugger.mi.parser import Parser
 
 GDB_PATH = util.get_root_path("build/gdb-build/gdb")
 
-if not os.path.isfile(GDB_PATH):
-    raise BaseException(
-        "GDB executable is missing in {}. Please run install.sh."
-        "".format(os.path.dirname(GDB_PATH)))
-
-
 gdb_pretty_print_file = os.path.join(os.path.dirname(__file__),
                                      "gdb_pretty_print.py")
+gdb_variable_serializer_file = os.path.join(os.path.dirname(__file__),
+                                            "gdb_variable_serializer.py")
 
 pp_function = "register_libstdcxx_printers"
 pp_dir = glob.glob("/usr/share/gcc-*/python")
@@ -191,6 +188,123 @@ class OutputMessage(object):
         return "[MSG: {0}, {1}]".format(self.type, self.data)
 
 
+class LineReader(object):
+    """
+    Reads lines from a file descriptor in large chunks.
+    Partial lines are accumulated in a reusable buffer, so long records
+    are not read byte by byte.
+    """
+    CHUNK_SIZE = 65536
+
+    def __init__(self, fd, chunk_size=CHUNK_SIZE):
+        """
+        @type fd: int
+        @type chunk_size: int
+        """
+        self.fd = fd
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.lines = collections.deque()
+        self.closed = False
+
+    def readline(self):
+        """
+        Returns the next line without the line terminator.
+        Returns None if the file descriptor was closed.
+        @rtype: str | None
+        """
+        while len(self.lines) == 0:
+            if self.closed:
+                if len(self.buffer) > 0:
+                    line = str(self.buffer)
+                    del self.buffer[:]
+                    return line
+                return None
+
+            chunk = os.read(self.fd, self.chunk_size)
+
+            if not chunk:
+                self.closed = True
+            else:
+                self._split_lines(chunk)
+
+        return self.lines.popleft()
+
+    def _split_lines(self, chunk):
+        """
+        Splits the chunk into complete lines, the remainder is kept in the
+        buffer until its line terminator arrives.
+        @type chunk: str
+        """
+        start = 0
+        end = chunk.find("\n")
+
+        while end != -1:
+            if len(self.buffer) > 0:
+                self.buffer.extend(chunk[start:end])
+                self.lines.append(str(self.buffer))
+                del self.buffer[:]
+            else:
+                self.lines.append(chunk[start:end])
+
+            start = end + 1
+            end = chunk.find("\n", start)
+
+        if start < len(chunk):
+            self.buffer.extend(chunk[start:])
+
+
+class CommandFuture(object):
+    """
+    Represents a command that was already written to GDB, but whose result
+    record may not have been read yet.
+    """
+    def __init__(self, communicator, token, command):
+        """
+        @type communicator: Communicator
+        @type token: int
+        @type command: str
+        """
+        self.communicator = communicator
+        self.token = token
+        self.command = command
+        self.cli = (command[0] != "-" or
+                    command.startswith("-interpreter-exec"))
+        self.cli_data = []
+        self.response = None
+        self.resolved = threading.Event()
+
+    def resolve(self, response):
+        """
+        Sets the result of the command and wakes up threads waiting for it.
+        @type response: CommandResult
+        """
+        response.cli_data = self.cli_data
+        self.response = response
+        self.resolved.set()
+
+    def is_done(self):
+        """
+        @rtype: bool
+        """
+        return self.resolved.is_set()
+
+    def result(self):
+        """
+        Waits until the result record of the command arrives and returns it.
+        @rtype: CommandResult
+        """
+        if not self.is_done():
+            self.communicator.wait_for(self)
+
+        return self.response
+
+    def __repr__(self):
+        return "[CMD_FUTURE: {0} ({1}): {2}]".format(self.command,
+                                                     self.token,
+                                                     self.response)
+
+
 class Communicator(object):
     GROUP_SEPARATOR = "(gdb)"
     RESPONSE_START = "^"
@@ -201,21 +315,32 @@ class Communicator(object):
     def __init__(self):
         self.process = None
         self.io_lock = threading.RLock()
+        self.write_lock = threading.Lock()
 
         self.token = 0
+        self.pending = collections.OrderedDict()
+        """@type pending: dict of (int, CommandFuture)"""
+
+        self.read_thread = None
+        self.event_thread = None
+        self.events = None
 
-        self.read_timer = None
+        self.run_epoch = 0
+        """Incremented every time the debugged process may have changed."""
 
         self.on_process_change = util.EventBroadcaster()
 
     def start_gdb(self):
+        if not os.path.isfile(GDB_PATH):
+            raise BaseException(
+                "GDB executable is missing in {}. Please run install.sh."
+                "".format(os.path.dirname(GDB_PATH)))
+
         if self.process is not None:
             self.kill()
 
-        if self.read_timer is not None:
-            self.read_timer.stop_repeating()
-
-        self.token = 0
+        self._fail_pending()
+        self.run_epoch += 1
 
         self.process = subprocess.Popen(
             bufsize=0,
@@ -231,7 +356,18 @@ class Communicator(object):
             close_fds=True
         )
 
-        self._skip_to_separator()
+        self.events = Queue.Queue()
+        self.event_thread = threading.Thread(target=self._dispatch_events,
+                                             args=(self.events,))
+        self.event_thread.daemon = True
+        self.event_thread.start()
+
+        self.read_thread = threading.Thread(
+            target=self._read_output,
+            args=(self.process.stdout,
+                  LineReader(self.process.stdout.fileno())))
+        self.read_thread.daemon = True
+        self.read_thread.start()
 
         self.send("set print elements 0")
         self.send("set print frame-arguments none")
@@ -241,49 +377,41 @@ class Communicator(object):
         self.send("python {}".format(pp_import))
         self.send("python {}(None)".format(pp_function))
         self.send("source {0}".format(gdb_pretty_print_file))
-
-        self.read_timer = util.RepeatTimer(0.1, self._timer_read_output)
-        self.read_timer.start()
+        self.send("source {0}".format(gdb_variable_serializer_file))
 
     def send(self, command):
         """
-        Sends the given command to GDB.
+        Sends the given command to GDB and waits for its result.
         @type command: str
         @rtype: CommandResult
         """
-        self.io_lock.acquire()
-        response = CommandResult(ResultType.Error)
-
-        token = self.token
-        self.token += 1
-
-        cli = command[0] != "-"
-        cli_data = []
+        return self.send_async(command).result()
 
-        try:
-            self.process.stdin.write(str(token) + command + "\n")
-            self.process.stdin.flush()
-
-            while True:
-                output = self._parse_output(self._readline(True))
-                if (output.type == OutputType.CommandResult and
-                        output.data.token == token):
-                    response = output.data
-                elif cli and output.type == OutputType.CliResponse:
-                    cli_data.append(output.data[2:-1].rstrip("\\n").strip())
-                elif output.type == OutputType.Separator:
-                    break
-                else:
-                    self._handle_output(output)
-
-        except:
-            util.Logger.debug(traceback.format_exc())
-
-        self.io_lock.release()
+    def send_async(self, command):
+        """
+        Sends the given command to GDB without waiting for its result.
+        @type command: str
+        @rtype: CommandFuture
+        """
+        return self._write_commands([command])[0]
 
-        response.cli_data = cli_data
+    def send_many(self, commands):
+        """
+        Sends all of the given commands to GDB at once and waits for all of
+        their results.
+        The commands are pipelined, so GDB can process them without waiting
+        for the results of the previous commands to be read.
+        @type commands: list of str
+        @rtype: list of CommandResult
+        """
+        return [future.result() for future in self._write_commands(commands)]
 
-        return response
+    def wait_for(self, future):
+        """
+        Waits until the given command is resolved by the reader thread.
+        @type future: CommandFuture
+        """
+        future.resolved.wait()
 
     def quit_program(self):
         if self.process:
@@ -304,29 +432,158 @@ class Communicator(object):
             self.process.kill()
         self._reset()
 
-    def _timer_read_output(self):
-        try:
+    def _read_output(self, stream, reader):
+        """
+        Reads the output of GDB as soon as it arrives and dispatches it.
+        Runs in a separate thread until GDB closes its output.
+        @type stream: file
+        @type reader: LineReader
+        """
+        while True:
+            line = self._readline(reader)
+
+            if line is None:
+                break
+
             self.io_lock.acquire()
-        except:
-            return
+            try:
+                if self._owns_stream(stream):
+                    self._dispatch_output(line)
+            finally:
+                self.io_lock.release()
 
+        self.io_lock.acquire()
         try:
-            output = self._readline(False)
+            if self._owns_stream(stream):
+                self._fail_pending()
+        finally:
+            self.io_lock.release()
+
+    def _owns_stream(self, stream):
+        """
+        Checks that the given stream belongs to the currently running GDB.
+        Output of a previously killed GDB instance is ignored.
+        @type stream: file
+        @rtype: bool
+        """
+        return self.process is not None and self.process.stdout is stream
+
+    def _dispatch_events(self, events):
+        """
+        Delivers asynchronous records to the listeners.
+        The listeners are called outside of the reader thread, so that they
+        can send commands to GDB and wait for their results.
+        @type events: Queue.Queue
+        """
+        while True:
+            output = events.get()
 
-            if output:
-                output = self._parse_output(output)
+            if output is None:
+                break
+
+            try:
                 self._handle_output(output)
+            except:
+                util.Logger.debug(traceback.format_exc())
+
+    def _write_commands(self, commands):
+        """
+        Writes the given commands to GDB, each with a unique token.
+        @type commands: list of str
+        @rtype: list of CommandFuture
+        """
+        futures = []
+        data = ""
+
+        # the write lock keeps the order of tokens equal to the order in
+        # which GDB receives the commands, the IO lock is not held during
+        # the write, so that the reader thread can drain GDB's output
+        with self.write_lock:
+            self.io_lock.acquire()
+            try:
+                for command in commands:
+                    future = CommandFuture(self, self.token, command)
+                    self.token += 1
+                    self.pending[future.token] = future
+                    futures.append(future)
+                    data += str(future.token) + command + "\n"
+            finally:
+                self.io_lock.release()
+
+            try:
+                self.process.stdin.write(data)
+                self.process.stdin.flush()
+            except:
+                util.Logger.debug(traceback.format_exc())
+
+                self.io_lock.acquire()
+                try:
+                    for future in futures:
+                        self.pending.pop(future.token, None)
+                        future.resolve(CommandResult(ResultType.Error,
+                                                     future.token))
+                finally:
+                    self.io_lock.release()
+
+        return futures
+
+    def _dispatch_output(self, line):
+        """
+        Routes a single line of GDB output to the command it belongs to.
+        Result records are matched to pending commands by their token,
+        CLI output belongs to the oldest pending command, because GDB
+        processes the commands in order.
+        @type line: str
+        """
+        try:
+            output = self._parse_output(line)
         except:
             util.Logger.debug(traceback.format_exc())
-        finally:
-            self.io_lock.release()
+            return
 
-    def _reset(self):
-        if self.read_timer is not None:
-            self.read_timer.stop_repeating()
-        self.read_timer = None
+        if output.type == OutputType.CommandResult:
+            future = self.pending.pop(output.data.token, None)
+            if future:
+                future.resolve(output.data)
+            else:
+                util.Logger.debug("Result of an unknown command: {}".format(
+                    output.data))
+        elif output.type == OutputType.CliResponse:
+            if len(self.pending) > 0:
+                future = next(self.pending.itervalues())
+                if future.cli:
+                    future.cli_data.append(
+                        output.data[2:-1].rstrip("\\n").strip())
+        elif output.type in (OutputType.AsyncExec, OutputType.AsyncNotify):
+            # cached memory is invalidated before anyone can read it again
+            if output.data.startswith("*running"):
+                self.run_epoch += 1
+            if self.events is not None:
+                self.events.put(output)
+
+    def _fail_pending(self):
+        """
+        Resolves all pending commands with an error result.
+        """
+        pending = self.pending
+        self.pending = collections.OrderedDict()
 
-        self.process = None
+        for future in pending.itervalues():
+            future.resolve(CommandResult(ResultType.Error, future.token))
+
+    def _reset(self):
+        self.io_lock.acquire()
+        try:
+            if self.events is not None:
+                self.events.put(None)
+            self.events = None
+            self.event_thread = None
+            self.read_thread = None
+
+            self.process = None
+            self._fail_pending()
+        finally:
+            self.io_lock.release()
 
     def _handle_output(self, output):
         if output.type == OutputType.AsyncExec:
@@ -334,36 +591,26 @@ class Communicator(object):
         elif output.type == OutputType.AsyncNotify:
             pass
 
-    def _readline(self, block=False):
-        self.io_lock.acquire()
-
-        process = self.process
-        input = None
-
+    def _readline(self, reader):
+        """
+        Reads a single line from the given reader.
+        Returns None if the stream was closed.
+        @type reader: LineReader
+        @rtype: str | None
+        """
         try:
-            if not block:
-                if len(select.select([process.stdout], [], [], 0.05)[0]) > 0:
-                    input = process.stdout.readline()
-            else:
-                input = process.stdout.readline()
+            input = reader.readline()
         except:
             util.Logger.debug(traceback.format_exc())
+            return None
 
-        self.io_lock.release()
-
-        if not input:
+        if input is None:
             return None
 
         return input.strip()
 
-    def _skip_to_separator(self):
-        data = ""
-
-        while data != Communicator.GROUP_SEPARATOR:
-            data = self._readline(True)
-
     def _parse_output(self, response):
-        if response is None:
+        if not response:
             return OutputMessage(OutputType.Unknown)
 
         if response == Communicator.GROUP_SEPARATOR:
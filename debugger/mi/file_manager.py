@@ -132,18 +132,29 @@ class FileManager(debugger_api.FileManager):
         @type line: int
         @rtype: str | None
         """
+        try:
+            disassembled = list(self.iter_disassembly(filename, line))
+            if disassembled:
+                return disassembled
+        except:
+            Logger.debug(traceback.format_exc())
+
+        return None
+
+    def iter_disassembly(self, filename, line):
+        """
+        Yields the disassembled source lines for the given location while
+        the response is being parsed.
+        @type filename: str
+        @type line: int
+        @rtype: generator of dict
+        """
         command = "-data-disassemble -f {0} -l {1} -n 10 -- 1".format(filename,
                                                                       line)
         result = self.debugger.communicator.send(command)
         if result:
-            try:
-                disassembled = self.parser.parse_disassembly(result.data)
-                if disassembled:
-                    return disassembled
-            except:
-                Logger.debug(traceback.format_exc())
-
-        return None
+            for line_obj in self.parser.iter_disassembly(result.data):
+                yield line_obj
 
     def disassemble_raw(self, filename, line):
         """
@@ -0,0 +1,341 @@
+import json
+
+import gdb
+
+
+struct_keywords = {}
+"""Maps struct type names to the keyword they were declared with."""
+
+
+def to_text(value):
+    """
+    Converts the given object to a string that can be serialized to JSON.
+    @rtype: str
+    """
+    text = str(value)
+
+    if not isinstance(text, type(u"")):
+        text = text.decode("utf-8", "replace")
+
+    return text
+
+
+def format_address(address):
+    """
+    @type address: gdb.Value
+    @rtype: str | None
+    """
+    if address is None:
+        return None
+
+    return "0x{:x}".format(int(address))
+
+
+def strip_modificators(name):
+    """
+    Returns the given type name without leading const/volatile qualifiers.
+    @type name: str
+    @rtype: str
+    """
+    while name.startswith("const ") or name.startswith("volatile "):
+        name = name[name.find(" ") + 1:]
+
+    return name
+
+
+def get_struct_keyword(type):
+    """
+    Returns "class" or "struct" depending on how the given type was declared.
+    The Python API does not expose it, so it is read from ptype once per type.
+    @type type: gdb.Type
+    @rtype: str
+    """
+    name = str(type)
+
+    if name not in struct_keywords:
+        keyword = "struct"
+        try:
+            output = gdb.execute("ptype {}".format(name), False, True)
+            output = output[output.find("=") + 1:].lstrip()
+            if output.startswith("class"):
+                keyword = "class"
+        except gdb.error:
+            pass
+        struct_keywords[name] = keyword
+
+    return struct_keywords[name]
+
+
+def describe_type(type):
+    """
+    Returns the type as it would be printed by ptype (without the body).
+    @type type: gdb.Type
+    @rtype: str
+    """
+    stripped = type.strip_typedefs()
+    text = str(stripped)
+    code = stripped.code
+
+    if code == gdb.TYPE_CODE_STRUCT:
+        keyword = get_struct_keyword(stripped.unqualified())
+    elif code == gdb.TYPE_CODE_UNION:
+        keyword = "union"
+    elif code == gdb.TYPE_CODE_ENUM:
+        keyword = "enum"
+    else:
+        return text
+
+    words = text.split(" ")
+    modificators = []
+    while len(words) > 1 and words[0] in ("const", "volatile"):
+        modificators.append(words.pop(0))
+
+    return " ".join(modificators + [keyword] + words)
+
+
+class VariableSerializer(object):
+    """
+    Walks a gdb.Value tree and describes it with plain dicts and lists.
+    Types are stored only once in a table keyed by their name, nodes refer
+    to them by the name.
+    """
+    def __init__(self, budget, byte_budget=None):
+        """
+        @param budget: maximum number of nodes that will be described
+        @type budget: int
+        @param byte_budget: maximum total length of the described values
+        @type byte_budget: int | None
+        """
+        self.budget = budget
+        self.byte_budget = byte_budget
+        self.types = {}
+
+    def is_exhausted(self):
+        """
+        @rtype: bool
+        """
+        return self.budget <= 0 or (self.byte_budget is not None and
+                                    self.byte_budget <= 0)
+
+    def describe_value(self, value):
+        """
+        @type value: gdb.Value
+        @rtype: str
+        """
+        text = to_text(value)
+
+        if self.byte_budget is not None:
+            self.byte_budget -= len(text)
+
+        return text
+
+    def add_type(self, type):
+        """
+        Adds the given type to the type table and returns its name.
+        @type type: gdb.Type
+        @rtype: str
+        """
+        name = to_text(type)
+
+        if name in self.types:
+            return name
+
+        self.types[name] = None
+
+        stripped = type.strip_typedefs()
+
+        try:
+            size = stripped.sizeof
+        except gdb.error:
+            size = None
+
+        description = {
+            "ptype": to_text(describe_type(type)),
+            "size": size
+        }
+
+        if stripped.code == gdb.TYPE_CODE_ARRAY:
+            description["child"] = self.add_type(stripped.target())
+        elif (stripped.code == gdb.TYPE_CODE_STRUCT and
+                strip_modificators(name).startswith("std::vector")):
+            description["child"] = self.add_type(
+                stripped.template_argument(0))
+
+        self.types[name] = description
+        return name
+
+    def serialize(self, value, path, depth):
+        """
+        Describes the given value.
+        @type value: gdb.Value
+        @param path: expression of the value
+        @type path: str
+        @param depth: how many levels of struct members will be described
+        @type depth: int
+        @rtype: dict
+        """
+        self.budget -= 1
+
+        type = value.type
+        type_name = self.add_type(type)
+        stripped = type.strip_typedefs()
+        code = stripped.code
+
+        node = {
+            "path": path,
+            "type": type_name,
+            "address": format_address(value.address)
+        }
+
+        if code in (gdb.TYPE_CODE_PTR, gdb.TYPE_CODE_REF):
+            node["value"] = self.describe_value(value)
+            node["target"] = self.add_type(stripped.target())
+        elif code == gdb.TYPE_CODE_ARRAY:
+            if value.type.sizeof > 0:
+                node["data_address"] = format_address(value[0].address)
+        elif code in (gdb.TYPE_CODE_STRUCT, gdb.TYPE_CODE_UNION):
+            name = strip_modificators(type_name)
+            if name.startswith("std::vector"):
+                impl = value["_M_impl"]
+                node["length"] = int(impl["_M_finish"] - impl["_M_start"])
+                node["data_address"] = format_address(impl["_M_start"])
+            elif name.startswith("std::string"):
+                node["value"] = self.describe_value(value)
+            elif depth > 0:
+                children = self.serialize_members(value, path, depth)
+                if children is not None:
+                    node["children"] = children
+        else:
+            node["value"] = self.describe_value(value)
+
+        return node
+
+    def serialize_members(self, value, path, depth):
+        """
+        Describes the fields of the given struct value.
+        Returns None if the budget ran out before all fields were described.
+        @type value: gdb.Value
+        @type path: str
+        @type depth: int
+        @rtype: list of dict | None
+        """
+        children = []
+
+        for field in value.type.strip_typedefs().fields():
+            if self.is_exhausted():
+                return None
+            if not field.name:
+                continue
+
+            try:
+                child = self.serialize(value[field],
+                                       "({0}).{1}".format(path, field.name),
+                                       depth - 1)
+            except gdb.error:
+                continue
+            if field.bitsize:
+                child["bitsize"] = field.bitsize
+            children.append(child)
+
+        return children
+
+    def serialize_frame(self, frame, level, depth):
+        """
+        Describes the given frame with its arguments and local variables.
+        If the budget runs out, the frame has variables None.
+        @type frame: gdb.Frame
+        @type level: int
+        @type depth: int
+        @rtype: dict
+        """
+        sal = frame.find_sal()
+        fullname = ""
+        if sal.symtab is not None:
+            fullname = sal.symtab.fullname()
+
+        description = {
+            "level": level,
+            "func": to_text(frame.name() or ""),
+            "fullname": to_text(fullname),
+            "line": sal.line,
+            "variables": None
+        }
+
+        try:
+            block = frame.block()
+        except RuntimeError:
+            block = None
+
+        variables = []
+        names = set()
+
+        # walk from the innermost block up to the function, inner variables
+        # shadow outer ones
+        while block is not None:
+            for symbol in block:
+                if (not (symbol.is_variable or symbol.is_argument) or
+                        symbol.name in names):
+                    continue
+
+                if self.is_exhausted():
+                    return description
+
+                names.add(symbol.name)
+                try:
+                    variables.append(self.serialize(symbol.value(frame),
+                                                    symbol.name, depth))
+                except (gdb.error, RuntimeError):
+                    continue
+
+            if block.function is not None:
+                break
+            block = block.superblock
+
+        description["variables"] = variables
+        return description
+
+
+def devi_serialize_variable(expression, depth, budget, path=None):
+    """
+    Prints a JSON description of the given expression with its types.
+    Struct members are described up to the given depth, deeper structs
+    (and structs that did not fit into the budget) have no children.
+    @type expression: str
+    @type depth: int
+    @type budget: int
+    @param path: expression used in the description instead of expression
+    @type path: str | None
+    """
+    try:
+        value = gdb.parse_and_eval(expression)
+        serializer = VariableSerializer(budget)
+        root = serializer.serialize(value, path or expression, depth)
+        result = {"types": serializer.types, "root": root}
+    except gdb.error as error:
+        result = {"error": to_text(error)}
+
+    gdb.write(json.dumps(result, separators=(",", ":")) + "\n")
+
+
+def devi_serialize_frames(depth, budget, byte_budget):
+    """
+    Prints a JSON description of all frames of the selected thread with
+    their arguments and local variables.
+    @type depth: int
+    @type budget: int
+    @type byte_budget: int
+    """
+    serializer = VariableSerializer(budget, byte_budget)
+    frames = []
+
+    try:
+        frame = gdb.newest_frame()
+        while frame is not None:
+            frames.append(serializer.serialize_frame(frame, len(frames),
+                                                     depth))
+            frame = frame.older()
+        result = {"types": serializer.types, "frames": frames}
+    except gdb.error as error:
+        result = {"error": to_text(error)}
+
+    gdb.write(json.dumps(result, separators=(",", ":")) + "\n")
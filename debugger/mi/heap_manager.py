@@ -19,31 +19,57 @@
 #
 
 
-import os
+import math
 import threading
-import select
+import time
 import traceback
 
-from debugger.debugee import HeapBlock
-from debugger import debugger_api, util
+from debugger.alloc_ring import AllocRing, AllocOp
+from debugger.debugee import HeapBlock, HeapDelta, HeapEstimate, \
+    HeapStats, CallSite
+from debugger.heap_index import HeapIndex
+from debugger.heap_log import HeapLog, HeapLogWriter
+from debugger.heap_report import LeakReport, get_size_class
+from debugger import debugger_api
 from debugger.util import Logger
 
 
 class HeapManager(debugger_api.HeapManager):
+    RING_CAPACITY = 64 * 1024
+    """Number of records in the ring shared by all threads of the program."""
+    CHANNEL_COUNT = 32
+    CHANNEL_CAPACITY = 16 * 1024
+    """Number of records in the ring of every thread that gets a channel."""
+    BATCH_SIZE = 4096
+    POLL_INTERVAL = 0.01
+    NOTIFICATION_RATE = 10
+    """Default maximum number of heap notifications per second."""
+
     def __init__(self, debugger):
         """
         @type debugger: debugger.Debugger
         """
         super(HeapManager, self).__init__(debugger)
-        self.heap = []
-        """@type heap: list of HeapBlock"""
-
-        self.total_allocations = 0
-        self.total_deallocations = 0
+        self.lock = threading.RLock()
+        self.notify_interval = 1.0 / HeapManager.NOTIFICATION_RATE
+        self.last_notify_time = 0
+
+        self.call_site_depth = 0
+        self.sample_every = 0
+        self.sample_bytes = 0
+        self.log_path = None
+        self.log_writer = None
+        self.replay_log = None
+        self.replay_index = 0
+        self.symbol_cache = {}
+        """@type symbol_cache: dict of (int, str)"""
+        self.leak_report = None
+        """@type leak_report: LeakReport"""
+
+        self._reset_state()
 
         self.read_thread = None
-        self.alloc_path = None
-        self.file = None
+        self.ring = None
         self.stop_flag = threading.Event()
 
     def watch(self):
@@ -52,43 +78,208 @@ class HeapManager(debugger_api.HeapManager):
         """
         assert self.read_thread is None
 
-        self.total_allocations = 0
-        self.total_deallocations = 0
+        with self.lock:
+            self._close_replay_log()
+            self._reset_state()
+            self.leak_report = None
+
+            if self.sample_every > 1:
+                self.sampling_rate = (self.sample_every, 0)
+            elif self.sample_bytes > 0:
+                self.sampling_rate = (0, self.sample_bytes)
+
+            if self.log_path:
+                self.log_writer = HeapLogWriter(self.log_path)
 
         self.stop_flag.clear()
 
-        self.alloc_path = util.create_pipe()
+        self.ring = AllocRing.create(HeapManager.RING_CAPACITY,
+                                     HeapManager.CHANNEL_COUNT,
+                                     HeapManager.CHANNEL_CAPACITY)
 
         self.read_thread = threading.Thread(target=self._read_thread,
-                                            args=(self.alloc_path,))
+                                            args=(self.ring,))
         self.read_thread.daemon = True
         self.read_thread.start()
 
-        return self.alloc_path
+        return self.ring.path
 
     def stop(self):
         self.stop_flag.set()
 
         self.read_thread.join()
 
-        try:
-            os.remove(self.alloc_path)
-        except:
-            pass
+        with self.lock:
+            # the read thread has handled all events, the blocks that are
+            # left were not freed by the program
+            self.leak_report = self.create_leak_report()
+
+            self.ring.close()
+            self.ring = None
+
+            if self.log_writer:
+                self.log_writer.close()
+                self.log_writer = None
+
+            self.heap = HeapIndex()
+            self.pending_added = {}
+            self.pending_removed = {}
+            self.dirty = False
 
-        self.heap = []
         self.read_thread = None
 
+    def get_hook_environment(self):
+        """
+        Returns environment variables that configure the allocation hook.
+        @rtype: list of (str, str)
+        """
+        environment = []
+
+        if self.call_site_depth > 0:
+            environment.append(("DEVI_ALLOC_CALL_SITES",
+                                str(self.call_site_depth)))
+
+        if self.sample_every > 1:
+            environment.append(("DEVI_ALLOC_SAMPLE_EVERY",
+                                str(self.sample_every)))
+        elif self.sample_bytes > 0:
+            environment.append(("DEVI_ALLOC_SAMPLE_BYTES",
+                                str(self.sample_bytes)))
+
+        return environment
+
+    def set_call_site_depth(self, depth):
+        """
+        Sets how many return addresses identify the call site of an
+        allocation, 0 disables call site capture.
+        Takes effect when the program is launched.
+        @type depth: int
+        """
+        self.call_site_depth = depth
+
+    def set_sampling(self, every=0, byte_interval=0):
+        """
+        Sets which allocations are recorded, the frees of recorded blocks
+        are always recorded. With every set to N, every Nth allocation of
+        each thread is recorded. With byte_interval set to B, allocations
+        are sampled once per B allocated bytes on average (a block of size s
+        is recorded with the probability 1 - exp(-s / B)).
+        Without both, all allocations are recorded.
+        Takes effect when the program is launched.
+        @type every: int
+        @type byte_interval: int
+        """
+        self.sample_every = every
+        self.sample_bytes = byte_interval
+
+    def get_sampling_rate(self):
+        """
+        Returns the sampling of the recorded program as a pair (every,
+        byte_interval), see set_sampling. (0, 0) means no sampling.
+        @rtype: (int, int)
+        """
+        return self.sampling_rate
+
+    def set_log_path(self, path):
+        """
+        Sets the directory where all allocation events of the launched
+        program are recorded (None disables the recording).
+        The log is kept after the program ends and it can be loaded with
+        replay, it is replaced when the next program is launched.
+        @type path: str | None
+        """
+        self.log_path = path
+
+    def replay(self, path, timestamp=None):
+        """
+        Loads the heap state at the given time from a heap log and notifies
+        it as a single change.
+        Seeking forward in the same log continues from the previous
+        position, otherwise the log is replayed from its beginning.
+        @param path: directory of the log
+        @type path: str
+        @param timestamp: time in nanoseconds (CLOCK_MONOTONIC), None for
+            the end of the log
+        @type timestamp: int | None
+        """
+        assert self.read_thread is None
+
+        with self.lock:
+            if self.replay_log and self.replay_log.path != path:
+                self._close_replay_log()
+
+            if self.replay_log is None:
+                self.replay_log = HeapLog(path)
+                self.replay_index = 0
+
+            log = self.replay_log
+
+            if timestamp is None:
+                end = len(log)
+            else:
+                end = log.find_index(timestamp)
+
+            if end < self.replay_index or self.replay_index == 0:
+                # the listeners have to drop the blocks they were notified of
+                removed = dict(self.pending_removed)
+                for address, block in self.heap.blocks.iteritems():
+                    if self.pending_added.get(address) is not block:
+                        removed[address] = block
+
+                self._reset_state()
+                self.pending_removed = removed
+                self.replay_index = 0
+
+            batch = HeapManager.BATCH_SIZE
+            for start in xrange(self.replay_index, end, batch):
+                self._handle_events(log.read(start, min(end, start + batch)),
+                                    ordered=True)
+
+            self.replay_index = end
+            self.dirty = True
+            self._notify_changes()
+
+    def set_max_notification_rate(self, rate):
+        """
+        Sets the maximum number of heap notifications per second.
+        @type rate: float
+        """
+        self.notify_interval = 1.0 / rate
+
+    def flush(self):
+        """
+        Handles all events written so far and notifies the changes
+        immediately.
+        """
+        with self.lock:
+            if self.ring:
+                while self._drain(self.ring, flush=True):
+                    pass
+
+            self._report_unmatched_frees()
+            self._notify_changes()
+
     def find_block_by_address(self, addr):
         """
         @type addr: str
         @rtype: HeapBlock | None
         """
-        for block in self.heap:
-            if block.address == addr:
-                return block
+        address = self._parse_address(addr)
+        if address is None:
+            return None
 
-        return None
+        return self.heap.get(address)
+
+    def find_block_containing(self, addr):
+        """
+        @type addr: str
+        @rtype: HeapBlock | None
+        """
+        address = self._parse_address(addr)
+        if address is None:
+            return None
+
+        return self.heap.find_block_containing(address)
 
     def get_total_allocations(self):
         """
@@ -102,85 +293,472 @@ class HeapManager(debugger_api.HeapManager):
         """
         return self.total_deallocations
 
-    def _read_thread(self, alloc_path):
+    def get_live_bytes(self):
+        """
+        @rtype: int
+        """
+        return self.live_bytes
+
+    def get_overruns(self):
+        """
+        @rtype: int
+        """
+        return self.overruns
+
+    def create_leak_report(self):
+        """
+        Returns a report of the currently allocated blocks.
+        @rtype: LeakReport
+        """
+        with self.lock:
+            report = LeakReport(self.sampling_rate)
+            sites = self.sites
+
+            for block in self.heap.blocks.itervalues():
+                report.add_block(block, sites.get(block.site))
+
+        return report
+
+    def get_leak_report(self):
+        """
+        Returns the report of the blocks that were allocated when the last
+        program ended, None if no program ended yet.
+        @rtype: LeakReport | None
+        """
+        return self.leak_report
+
+    def get_stats(self):
+        """
+        @rtype: HeapStats
+        """
+        with self.lock:
+            return self._create_stats()
+
+    def get_call_sites(self):
+        """
+        Returns the call sites ordered by their live bytes.
+        @rtype: list of debugger.debugee.CallSite
+        """
+        with self.lock:
+            sites = list(self.sites.itervalues())
+
+        return sorted(sites, key=lambda site: site.live_bytes, reverse=True)
+
+    def symbolize_call_site(self, site):
+        """
+        Returns descriptions of the frames of the given call site
+        (e.g. "main + 20 in section .text"), the symbols are cached.
+        @type site: debugger.debugee.CallSite
+        @rtype: list of str
+        """
+        missing = [address for address in set(site.frames)
+                   if address not in self.symbol_cache]
+
+        if missing:
+            results = self.debugger.communicator.send_many(
+                ["info symbol {}".format(self._format_address(address))
+                 for address in missing])
+
+            for address, result in zip(missing, results):
+                if result and result.cli_data:
+                    symbol = result.cli_data[0]
+                else:
+                    symbol = self._format_address(address)
+                self.symbol_cache[address] = symbol
+
+        return [self.symbol_cache[address] for address in site.frames]
+
+    def _reset_state(self):
+        self.heap = HeapIndex()
+        """@type heap: HeapIndex"""
+        self.total_allocations = 0
+        self.total_deallocations = 0
+        self.live_bytes = 0
+        self.overruns = 0
+
+        self.sampling_rate = (0, 0)
+        self.estimated_live_blocks = 0.0
+        self.estimated_live_bytes = 0.0
+        self.estimated_allocations = 0.0
+        self.estimated_deallocations = 0.0
+
+        self.size_class_blocks = {}
+        """@type size_class_blocks: dict of (int, int)"""
+        self.size_class_bytes = {}
+        """@type size_class_bytes: dict of (int, int)"""
+        self.peak_live_bytes = 0
+        self.allocation_rate = 0.0
+        self.last_timestamp = None
+        self.rate_timestamp = None
+        self.rate_allocations = 0
+
+        self.sites = {}
+        """@type sites: dict of (int, CallSite)"""
+
+        self.pending_added = {}
+        """@type pending_added: dict of (int, HeapBlock)"""
+        self.pending_removed = {}
+        """@type pending_removed: dict of (int, HeapBlock)"""
+        self.dirty = False
+
+        self.unmatched_frees = {}
+        """@type unmatched_frees: dict of (int, int)"""
+
+    def _close_replay_log(self):
+        if self.replay_log:
+            self.replay_log.close()
+            self.replay_log = None
+            self.replay_index = 0
+
+    def _read_thread(self, ring):
         """
-        @type alloc_path: str
+        @type ring: AllocRing
         """
         try:
-            with os.fdopen(os.open(alloc_path, os.O_NONBLOCK | os.O_RDONLY),
-                           "r", 1) as alloc_file:
-                self.alloc_file = alloc_file
+            while not self.stop_flag.is_set():
+                with self.lock:
+                    drained = self._drain(ring)
 
-                while not self.stop_flag.is_set():
-                    if len(select.select([alloc_file], [], [], 0.1)[0]) != 0:
-                        line = alloc_file.readline()[:-1]
+                    if (self.dirty and time.time() - self.last_notify_time >=
+                            self.notify_interval):
+                        self._notify_changes()
 
-                        if line:
-                            self._handle_message(line)
+                if not drained:
+                    self.stop_flag.wait(HeapManager.POLL_INTERVAL)
+
+            self.flush()
         except:
             Logger.debug(traceback.format_exc())
 
-    def _handle_malloc(self, addr, size, notify=True):
+    def _drain(self, ring, flush=False):
         """
-        @type addr: str
-        @type size: str
+        Handles a batch of events from the ring, returns the number of
+        handled events.
+        @type ring: AllocRing
+        @param flush: handle also the events held back by the ring
+        @type flush: bool
+        @rtype: int
         """
-        size = int(size)
-        block = HeapBlock(addr, size)
-        self.heap.append(block)
+        events = ring.read(HeapManager.BATCH_SIZE, flush)
 
-        self.total_allocations += 1
+        if self.log_writer and events:
+            self.log_writer.append(events)
+
+        self._handle_events(events)
+
+        overruns = ring.get_overruns()
+        if overruns != self.overruns:
+            Logger.debug("HEAP: {} events dropped".format(
+                overruns - self.overruns))
+            self.overruns = overruns
+            self.dirty = True
 
-        if notify:
-            self.on_heap_change.notify(self.heap)
+        return len(events)
 
-    def _handle_realloc(self, addr, new_addr, size):
+    def _notify_changes(self):
         """
-        @type addr: str
-        @type new_addr: str
-        @type size: str
+        Notifies the changes since the last notification, if there are any.
         """
-        self._handle_free(addr, False)
-        self._handle_malloc(new_addr, size, False)
+        if not self.dirty:
+            return
+
+        estimate = None
+        if self.sampling_rate != (0, 0):
+            estimate = HeapEstimate(self.estimated_live_blocks,
+                                    self.estimated_live_bytes,
+                                    self.estimated_allocations,
+                                    self.estimated_deallocations)
+
+        self._update_allocation_rate()
+
+        delta = HeapDelta(self.pending_added.values(),
+                          self.pending_removed.values(),
+                          len(self.heap), self.live_bytes,
+                          self.total_allocations, self.total_deallocations,
+                          estimate, self._create_stats())
 
-        self.on_heap_change.notify(self.heap)
+        self.pending_added = {}
+        self.pending_removed = {}
+        self.dirty = False
+        self.last_notify_time = time.time()
 
-    def _handle_free(self, addr, notify=True):
+        self.on_heap_change.notify(delta)
+
+    def _create_stats(self):
         """
-        @type addr: str
+        @rtype: HeapStats
+        """
+        size_classes = [(size_class, blocks,
+                         self.size_class_bytes[size_class])
+                        for (size_class, blocks)
+                        in sorted(self.size_class_blocks.iteritems())
+                        if blocks > 0]
+
+        span = self.heap.get_span()
+        fragmentation = 0.0
+        if span > 0:
+            fragmentation = max(0.0, 1.0 - float(self.live_bytes) / span)
+
+        return HeapStats(size_classes, self.peak_live_bytes,
+                         self.allocation_rate, span, fragmentation)
+
+    def _update_allocation_rate(self):
+        """
+        Computes the allocation rate from the event timestamps since the
+        previous update.
+        """
+        if self.last_timestamp is None:
+            return
+
+        if self.rate_timestamp is not None:
+            elapsed = self.last_timestamp - self.rate_timestamp
+            if elapsed <= 0:
+                return
+
+            self.allocation_rate = ((self.total_allocations -
+                                     self.rate_allocations) * 1e9 / elapsed)
+
+        self.rate_timestamp = self.last_timestamp
+        self.rate_allocations = self.total_allocations
+
+    def _handle_malloc(self, address, size, site=0, alignment=0,
+                       timestamp=None):
+        """
+        @type address: int
+        @type size: int
+        @type site: int
+        @type alignment: int
+        @type timestamp: int | None
+        """
+        if self.heap.get(address):  # the free was dropped from a full ring
+            self._remove_block(address)
+
+        self.total_allocations += 1
+        self.dirty = True
+
+        weight = self._get_sample_weight(size)
+        self.estimated_allocations += weight
+
+        if site:
+            call_site = self._get_call_site(site)
+            call_site.total_allocations += 1
+
+        if address in self.unmatched_frees:
+            free_timestamp = self.unmatched_frees.pop(address)
+
+            # the block was freed by another thread whose event was read
+            # first
+            if timestamp is not None and timestamp <= free_timestamp:
+                self.total_deallocations += 1
+                self.estimated_deallocations += weight
+                return
+
+            self._report_free_error(address)
+
+        block = HeapBlock(self._format_address(address), size, site,
+                          alignment)
+        self.heap.add(address, block)
+        self.pending_added[address] = block
+
+        self.live_bytes += size
+        self.estimated_live_blocks += weight
+        self.estimated_live_bytes += weight * size
+
+        if self.live_bytes > self.peak_live_bytes:
+            self.peak_live_bytes = self.live_bytes
+
+        size_class = get_size_class(size)
+        self.size_class_blocks[size_class] = \
+            self.size_class_blocks.get(size_class, 0) + 1
+        self.size_class_bytes[size_class] = \
+            self.size_class_bytes.get(size_class, 0) + size
+
+        if site:
+            call_site.live_bytes += size
+            call_site.live_blocks += 1
+
+    def _handle_realloc(self, address, new_address, size, site=0,
+                        timestamp=None):
+        """
+        @type address: int
+        @type new_address: int
+        @type size: int
+        @type site: int
+        @type timestamp: int | None
+        """
+        self._handle_free(address, timestamp)
+        if new_address:
+            self._handle_malloc(new_address, size, site, 0, timestamp)
+
+    def _handle_free(self, address, timestamp=None):
         """
-        if addr == "NULL":
+        Frees of unknown blocks with a timestamp are matched with
+        allocations read later, because events of different threads are not
+        read in order. They are reported when the heap is flushed.
+        @type address: int
+        @type timestamp: int | None
+        """
+        if address == 0:
             return
 
-        block = self.find_block_by_address(addr)
+        if not self._remove_block(address):
+            if timestamp is None:
+                self._report_free_error(address)
+            else:
+                self.unmatched_frees[address] = timestamp
+
+    def _report_free_error(self, address):
+        """
+        @type address: int
+        """
+        # the allocation may have been dropped from a full ring
+        if self.overruns == 0:
+            self.on_free_error.notify(self._format_address(address))
+
+    def _report_unmatched_frees(self):
+        for address in self.unmatched_frees:
+            self._report_free_error(address)
+
+        self.unmatched_frees = {}
+
+    def _remove_block(self, address):
+        """
+        Removes the block at the given address from the heap, returns it.
+        @type address: int
+        @rtype: HeapBlock | None
+        """
+        block = self.heap.remove(address)
         if not block:
-            self.on_free_error.notify(addr)
+            return None
 
-        self.heap.remove(block)
+        if self.pending_added.get(address) is block:
+            del self.pending_added[address]
+        else:
+            self.pending_removed[address] = block
 
         self.total_deallocations += 1
+        self.live_bytes -= block.size
+        self.dirty = True
+
+        weight = self._get_sample_weight(block.size)
+        self.estimated_deallocations += weight
+        self.estimated_live_blocks -= weight
+        self.estimated_live_bytes -= weight * block.size
+
+        size_class = get_size_class(block.size)
+        self.size_class_blocks[size_class] -= 1
+        self.size_class_bytes[size_class] -= block.size
+
+        if block.site:
+            call_site = self._get_call_site(block.site)
+            call_site.live_bytes -= block.size
+            call_site.live_blocks -= 1
+
+        return block
+
+    def _get_sample_weight(self, size):
+        """
+        Returns how many allocations of the given size a recorded
+        allocation stands for.
+        @type size: int
+        @rtype: float
+        """
+        every, byte_interval = self.sampling_rate
+
+        if every > 1:
+            return float(every)
+        if byte_interval > 0 and size > 0:
+            return 1.0 / -math.expm1(-float(size) / byte_interval)
+
+        return 1.0
+
+    def _get_call_site(self, site):
+        """
+        @type site: int
+        @rtype: CallSite
+        """
+        call_site = self.sites.get(site)
+
+        if call_site is None:
+            call_site = CallSite(site)
+            self.sites[site] = call_site
 
-        if notify:
-            self.on_heap_change.notify(self.heap)
+        return call_site
 
-    def _handle_message(self, message):
+    def _handle_site_frame(self, site, index, address):
         """
-        @type message: str
+        @type site: int
+        @type index: int
+        @type address: int
         """
-        util.Logger.debug("HEAP: {}".format(message))
+        frames = self._get_call_site(site).frames
 
-        msg_parts = message.split(" ")
-        action = msg_parts[0]
-        args = msg_parts[1:]
+        if index < len(frames):  # the site was sent again
+            frames[index] = address
+        else:
+            frames.extend([0] * (index - len(frames)))
+            frames.append(address)
+
+    def _handle_events(self, events, ordered=False):
+        """
+        @type events: list of debugger.alloc_ring.AllocEvent
+        @param ordered: the events are in the order they happened (e.g. from
+            a heap log), so frees of unknown blocks are not matched with
+            later allocations
+        @type ordered: bool
+        """
+        if not events:
+            return
+
+        if self.rate_timestamp is None:
+            self.rate_timestamp = events[0].timestamp
+        self.last_timestamp = events[-1].timestamp
+
+        for event in events:
+            self._handle_event(event, ordered)
+
+    def _handle_event(self, event, ordered=False):
+        """
+        @type event: debugger.alloc_ring.AllocEvent
+        @type ordered: bool
+        """
+        timestamp = None if ordered else event.timestamp
 
         try:
-            if action in ("malloc", "calloc"):
-                self._handle_malloc(*args)
-            elif action == "realloc":
-                self._handle_realloc(*args)
-            elif action == "free":
-                self._handle_free(*args)
+            if event.op in AllocOp.allocations:
+                if event.address:
+                    self._handle_malloc(event.address, event.size,
+                                        event.site, event.alignment,
+                                        timestamp)
+            elif event.op == AllocOp.Realloc:
+                self._handle_realloc(event.argument, event.address,
+                                     event.size, event.site, timestamp)
+            elif event.op in AllocOp.deallocations:
+                self._handle_free(event.address, timestamp)
+            elif event.op == AllocOp.Site:
+                self._handle_site_frame(event.site, event.size,
+                                        event.address)
             else:
-                Logger.debug("Unknown allocation action: {}".format(action))
+                Logger.debug("Unknown allocation action: {}".format(
+                    event.op))
         except:
             Logger.debug(traceback.format_exc())
+
+    def _format_address(self, address):
+        """
+        @type address: int
+        @rtype: str
+        """
+        return "0x{:x}".format(address)
+
+    def _parse_address(self, addr):
+        """
+        Parses an address printed by GDB (e.g. 0x601010 or
+        0x400604 <main>).
+        @type addr: str
+        @rtype: int | None
+        """
+        try:
+            return int(addr.split(" ", 1)[0], 16)
+        except (ValueError, AttributeError):
+            return None
@@ -73,6 +73,7 @@ class MiDebugger(debugger_api.Debugger):
             self._cleanup_program()
             self._on_program_ended(output.exit_code)
         elif output.state == ProcessState.Stopped:
+            self.heap_manager.flush()
             self.on_process_state_changed.notify(
                 output.state,
                 debugger_api.ProcessStoppedEventData(output.reason)
@@ -94,6 +95,9 @@ class MiDebugger(debugger_api.Debugger):
         binary_path = os.path.abspath(binary_path)
 
         self.communicator.start_gdb()
+        self.variable_manager.clear_type_cache()
+        self.variable_manager.clear_register_cache()
+        self.variable_manager.reset_tracking(gdb_restarted=True)
         result = self.communicator.send(
             "-file-exec-and-symbols {0}".format(binary_path))
 
@@ -127,6 +131,8 @@ class MiDebugger(debugger_api.Debugger):
 
         startup_info.env_vars.append(("DEVI_ALLOC_FILE_PATH", alloc_file))
         startup_info.env_vars.append(("LD_PRELOAD", shlib_path))
+        startup_info.env_vars.extend(
+            self.heap_manager.get_hook_environment())
 
         for env_var in startup_info.env_vars:
             self.communicator.send("set environment {}={}".format(
@@ -134,6 +140,7 @@ class MiDebugger(debugger_api.Debugger):
             ))
 
         self.communicator.send("cd {}".format(startup_info.working_directory))
+        self.variable_manager.clear_register_cache(keep_names=True)
 
         self.on_process_state_changed.notify(ProcessState.Launching, None)
         result = self.communicator.send("run 1>{0} 2>{1} <{2} {3}".format(
@@ -195,6 +202,7 @@ class MiDebugger(debugger_api.Debugger):
 
             self.io_manager.stop_io()
             self.heap_manager.stop()
+            self.variable_manager.reset_tracking()
         finally:
             self.exit_lock.release()
 
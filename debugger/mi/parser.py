@@ -26,6 +26,276 @@ from debugger.debugee import Breakpoint, InferiorThread, ThreadInfo, Frame
 from debugger.enums import ThreadState
 
 
+class MiTokenizer(object):
+    """
+    Single-pass recursive-descent parser of GDB/MI records.
+
+    Tuples are returned as dicts and lists as lists, labels of list items
+    are dropped (stack=[frame={...},frame={...}] becomes a list of dicts).
+    C strings are unescaped, bare numbers are converted to int or float.
+    """
+    key_regex = re.compile(r"\s*([a-zA-Z0-9_-]+)\s*=\s*")
+    whitespace_regex = re.compile(r"\s*")
+    string_regex = re.compile(r'[^"\\]*')
+    octal_regex = re.compile(r"[0-7]{1,3}")
+    bare_regex = re.compile(r"[^,\]}]*")
+
+    literals = {
+        "true": True,
+        "false": False,
+        "null": None
+    }
+    escapes = {
+        "n": "\n",
+        "t": "\t",
+        "r": "\r",
+        "a": "\a",
+        "b": "\b",
+        "f": "\f",
+        "v": "\v",
+        "e": "\x1b",
+        "\"": "\"",
+        "'": "'",
+        "\\": "\\"
+    }
+
+    def __init__(self, data):
+        """
+        @type data: str
+        """
+        self.data = data
+        self.pos = 0
+
+    def parse(self):
+        """
+        Parses the whole record.
+        Records that do not start with a tuple or a list are parsed as
+        a list of results (key=value pairs) and returned as a dict.
+        @rtype: dict | list | str
+        """
+        self._skip_whitespace()
+
+        if self.pos < len(self.data) and self.data[self.pos] in ("{", "["):
+            return self.parse_value()
+        else:
+            return self.parse_tuple()
+
+    def iter_list(self, key):
+        """
+        Yields items of the top-level list with the given key one by one,
+        each item is parsed only when it is requested.
+        Other top-level values before the list are parsed and skipped.
+        @type key: str
+        @rtype: generator of (dict | list | str | int | float)
+        """
+        self._skip_whitespace()
+
+        if self.pos < len(self.data) and self.data[self.pos] == "{":
+            self.pos += 1
+
+        while True:
+            self._skip_whitespace()
+
+            if self.pos >= len(self.data) or self.data[self.pos] == "}":
+                return
+
+            current_key = self._parse_key()
+            if current_key is None:
+                raise ValueError("Missing key at position {}".format(
+                    self.pos))
+
+            if current_key == key and self.data.startswith("[", self.pos):
+                self.pos += 1
+                break
+            else:
+                self.parse_value()
+                self._skip_separator()
+
+        while True:
+            self._skip_whitespace()
+
+            if self.pos >= len(self.data):
+                return
+            if self.data[self.pos] == "]":
+                self.pos += 1
+                return
+
+            self._parse_key()
+            yield self.parse_value()
+            self._skip_separator()
+
+    def parse_value(self):
+        """
+        @rtype: dict | list | str | int | float
+        """
+        self._skip_whitespace()
+
+        if self.pos >= len(self.data):
+            return ""
+
+        char = self.data[self.pos]
+
+        if char == "\"":
+            return self.parse_string()
+        elif char == "{":
+            self.pos += 1
+            return self.parse_tuple()
+        elif char == "[":
+            self.pos += 1
+            return self.parse_list()
+        elif char == "<":  # <error reading variable ...>
+            end = self.data.find(">", self.pos)
+            self.pos = len(self.data) if end == -1 else end + 1
+            return ""
+        else:
+            return self.parse_bare()
+
+    def parse_tuple(self):
+        """
+        Parses key=value pairs until the end of the tuple (the opening
+        brace must be already consumed).
+        @rtype: dict
+        """
+        result = {}
+
+        while True:
+            self._skip_whitespace()
+
+            if self.pos >= len(self.data):
+                return result
+            if self.data[self.pos] == "}":
+                self.pos += 1
+                return result
+
+            key = self._parse_key()
+            if key is None:
+                raise ValueError("Missing key at position {}".format(
+                    self.pos))
+
+            result[key] = self.parse_value()
+            self._skip_separator()
+
+    def parse_list(self):
+        """
+        Parses values until the end of the list (the opening bracket must be
+        already consumed).
+        @rtype: list
+        """
+        result = []
+
+        while True:
+            self._skip_whitespace()
+
+            if self.pos >= len(self.data):
+                return result
+            if self.data[self.pos] == "]":
+                self.pos += 1
+                return result
+
+            self._parse_key()  # labels of list items are dropped
+            result.append(self.parse_value())
+            self._skip_separator()
+
+    def parse_string(self):
+        """
+        Parses a C string (the position must be at the opening quote).
+        @rtype: str
+        """
+        data = self.data
+        chunks = []
+        self.pos += 1
+
+        while True:
+            match = self.string_regex.match(data, self.pos)
+            chunks.append(match.group(0))
+            self.pos = match.end()
+
+            if self.pos >= len(data):
+                break
+
+            if data[self.pos] == "\"":
+                self.pos += 1
+                break
+
+            chunks.append(self._parse_escape())
+
+        return "".join(chunks)
+
+    def parse_bare(self):
+        """
+        Parses an unquoted constant.
+        @rtype: str | int | float | bool | None
+        """
+        match = self.bare_regex.match(self.data, self.pos)
+
+        if match.end() == self.pos:
+            raise ValueError("Unexpected character {} at position {}".format(
+                self.data[self.pos], self.pos))
+
+        self.pos = match.end()
+        token = match.group(0).strip()
+
+        if token in MiTokenizer.literals:
+            return MiTokenizer.literals[token]
+
+        try:
+            return int(token)
+        except ValueError:
+            pass
+
+        try:
+            return float(token)
+        except ValueError:
+            return token
+
+    def _parse_escape(self):
+        """
+        Parses an escape sequence (the position must be at the backslash).
+        @rtype: str
+        """
+        self.pos += 1
+
+        if self.pos >= len(self.data):
+            return ""
+
+        char = self.data[self.pos]
+
+        if char in MiTokenizer.escapes:
+            self.pos += 1
+            return MiTokenizer.escapes[char]
+
+        match = self.octal_regex.match(self.data, self.pos)
+        if match:
+            self.pos = match.end()
+            return chr(int(match.group(0), 8) & 0xFF)
+
+        self.pos += 1
+        return char
+
+    def _parse_key(self):
+        """
+        Parses a key of a result (key=), returns None if there is no key at
+        the current position.
+        @rtype: str | None
+        """
+        match = self.key_regex.match(self.data, self.pos)
+
+        if match:
+            self.pos = match.end()
+            return match.group(1)
+        else:
+            return None
+
+    def _skip_whitespace(self):
+        self.pos = self.whitespace_regex.match(self.data, self.pos).end()
+
+    def _skip_separator(self):
+        self._skip_whitespace()
+
+        if self.pos < len(self.data) and self.data[self.pos] == ",":
+            self.pos += 1
+
+
 class Parser(object):
     def __init__(self):
         pass
@@ -65,13 +335,16 @@ class Parser(object):
         @type data: str
         @rtype: list of debugee.Frame
         """
-        data = self.parse(data)["stack"]
-        frames = []
+        return list(self.iter_stack_frames(data))
 
-        for frame in data:
-            frames.append(self._instantiate_frame(frame))
-
-        return frames
+    def iter_stack_frames(self, data):
+        """
+        Yields the stack frames while the record is being parsed.
+        @type data: str
+        @rtype: generator of debugee.Frame
+        """
+        for frame in MiTokenizer(data).iter_list("stack"):
+            yield self._instantiate_frame(frame)
 
     def parse_stack_frame(self, data):
         return self._instantiate_frame(self.parse(data)["frame"])
@@ -84,9 +357,16 @@ class Parser(object):
         return data[7:]
 
     def parse_disassembly(self, data):
-        lines_dis = self.parse(data)["asm_insns"]
-        lines = []
-        for line in lines_dis:
+        return list(self.iter_disassembly(data))
+
+    def iter_disassembly(self, data):
+        """
+        Yields the disassembled source lines while the record is being
+        parsed.
+        @type data: str
+        @rtype: generator of dict
+        """
+        for line in MiTokenizer(data).iter_list("asm_insns"):
             line_data = line["line_asm_insn"]
             line_obj = {
                 "line": int(line["line"]),
@@ -95,9 +375,7 @@ class Parser(object):
             for inst in line_data:
                 line_obj["instructions"].append(inst["inst"])
 
-            lines.append(line_obj)
-
-        return lines
+            yield line_obj
 
     def parse_print_expression(self, data):
         data = "".join(data)
@@ -127,8 +405,26 @@ class Parser(object):
         data = data.replace("'", "\"")
         return self._parse_json(data)
 
+    def parse_cli_json(self, data):
+        """
+        Parses JSON printed to the console by a GDB Python command.
+        @type data: list of str
+        @rtype: dict | list
+        """
+        data = MiTokenizer("\"{}\"".format("".join(data))).parse_string()
+        return self._parse_json(data)
+
     def parse(self, data):
-        return self._parse_json(self._prep_json(data))
+        """
+        Parses a GDB/MI record (without the result class) into dicts (tuples)
+        and lists.
+        @type data: str
+        @rtype: dict | list | str
+        """
+        if len(data) < 1:
+            return data
+        else:
+            return MiTokenizer(data).parse()
 
     def _instantiate_thread(self, thread):
         return InferiorThread(int(thread["id"]), thread["name"],
@@ -170,108 +466,6 @@ class Parser(object):
             name = bp["fullname"]
         return Breakpoint(int(bp["number"]), name, int(bp["line"]))
 
-    def _remove_array_labels(self, data):
-        in_array = []
-
-        i = 0
-        in_quote = False
-
-        while i < len(data):
-            char = data[i]
-
-            if char == "\"":
-                in_quote = not in_quote
-
-            if not in_quote:
-                if char == "[":
-                    in_array.append(1)
-                if char == "{":
-                    in_array.append(0)
-                if char in ("]", "}"):
-                    in_array.pop()
-
-                if len(in_array) > 0 and in_array[-1] == 1:
-                    j = i
-                    while (j < len(data) and
-                           (data[j].isalpha() or
-                            data[j] == "_" or
-                            data[j] == "=")):
-                        j += 1
-
-                    if j > i:
-                        data = data[:i] + data[j:]
-                        i -= 1
-            i += 1
-
-        for parentheses in in_array:
-            if parentheses == 1:
-                data += "]"
-            elif parentheses == 0:
-                data += "}"
-
-        return data
-
-    def _modify_labels(self, data):
-        """
-        Changes keys in the form ([a-zA-Z-_])+\s*= to "\1":
-        (replaces = with :, removes whitespace and adds quotes).
-        @type data: str
-        @rtype: str
-        """
-        in_str = False
-        in_ident = False
-        start_ident = 0
-        i = 0
-
-        while i < len(data):
-            char = data[i]
-
-            if char == "\"":
-                in_str = not in_str
-
-            if in_str:
-                i += 1
-                continue
-
-            matches_ident = re.match("[a-zA-Z-_]", char) is not None
-            if not in_ident and matches_ident:
-                in_ident = True
-                start_ident = i
-
-            if in_ident and re.match("\s", char) is not None:
-                i += 1
-                continue
-
-            if in_ident and char == "=":
-                old_length = len(data)
-                data = data[:start_ident] + re.sub("^((?:[a-zA-Z-_])+)\s*=",
-                                                   r'"\1":',
-                                                   data[start_ident:])
-                diff = old_length - len(data)
-                i -= diff
-
-                in_ident = False
-            elif in_ident and not matches_ident:
-                raise BaseException("Wrong attribute key")
-
-            i += 1
-
-        return data
-
-    def _prep_json(self, data):
-        if len(data) < 1:
-            return data
-
-        # remove array labels
-        data = self._remove_array_labels(data)
-        data = self._modify_labels(data)
-        data = re.sub("<error reading variable[^>]*>", "\"\"", data)
-
-        if data[0] not in ("{", "["):
-            data = "{" + data + "}"
-
-        return data
-
     def _parse_json(self, data):
         if len(data) < 1:
             return data
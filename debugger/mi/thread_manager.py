@@ -118,19 +118,56 @@ class ThreadManager(debugger_api.ThreadManager):
         """
         @rtype: list of debugee.Frame
         """
+        try:
+            return list(self.iter_frames())
+        except:
+            Logger.debug(traceback.format_exc())
+
+        return []
+
+    def iter_frames(self):
+        """
+        Yields the stack frames while the response is being parsed, so that
+        the caller can use the first frames or stop early without waiting
+        for the whole stack.
+        @rtype: generator of debugee.Frame
+        """
         output = self.debugger.communicator.send("-stack-list-frames")
 
         if output:
-            try:
-                return self.parser.parse_stack_frames(output.data)
-            except:
-                Logger.debug(traceback.format_exc())
-
-        return []
+            for frame in self.parser.iter_stack_frames(output.data):
+                yield frame
 
     def get_frames_with_variables(self):
         """
         Returns all stack frames with all their local variables and arguments.
+        All frames are serialized by GDB in a single command, frames that do
+        not fit into its budget are loaded one by one.
+        @rtype: list of debugger.debugee.Frame
+        """
+        frames = self.debugger.variable_manager.serialize_frames()
+
+        if frames is None:
+            return self._load_frames_with_variables(
+                [frame.level for frame in self.get_frames()])
+
+        missing = [frame.level for frame in frames if frame.variables is None]
+        if missing:
+            loaded = dict((frame.level, frame) for frame in
+                          self._load_frames_with_variables(missing)
+                          if frame)
+            frames = [loaded.get(frame.level, frame) for frame in frames]
+
+            for frame in frames:
+                if frame.variables is None:
+                    frame.variables = []
+
+        return frames
+
+    def _load_frames_with_variables(self, levels):
+        """
+        Loads the frames with the given levels by selecting them one by one.
+        @type levels: list of int
         @rtype: list of debugger.debugee.Frame
         """
         current_frame = self.get_current_frame(False)
@@ -140,8 +177,8 @@ class ThreadManager(debugger_api.ThreadManager):
 
         frames = []
         try:
-            for i, fr in enumerate(self.get_frames()):
-                self.change_frame(i, False)
+            for level in levels:
+                self.change_frame(level, False)
                 frames.append(self.get_current_frame(True))
         except:
             Logger.debug(traceback.format_exc())
@@ -156,7 +193,7 @@ class ThreadManager(debugger_api.ThreadManager):
         @type notify: bool
         @rtype: bool
         """
-        if frame_index >= len(self.get_frames()):
+        if not self._has_frame(frame_index):
             return False
 
         result = self.debugger.communicator.send(
@@ -172,3 +209,19 @@ class ThreadManager(debugger_api.ThreadManager):
             return True
         else:
             return False
+
+    def _has_frame(self, frame_index):
+        """
+        Checks whether the stack contains a frame with the given index,
+        parses the stack only up to the frame.
+        @type frame_index: int
+        @rtype: bool
+        """
+        try:
+            for i, frame in enumerate(self.iter_frames()):
+                if i == frame_index:
+                    return True
+        except:
+            Logger.debug(traceback.format_exc())
+
+        return False
@@ -19,13 +19,19 @@
 #
 
 
+import binascii
+import collections
+import copy
+import json
 import re
+import struct
+import threading
 import traceback
 
 from debugger.enums import BasicTypeCategory, TypeCategory
 from debugger.mi.parser import Parser
 from debugger.debugee import Type, Variable, Register, PointerVariable,\
-    ArrayType, VectorVariable
+    ArrayType, VectorVariable, Frame
 from debugger import debugger_api
 from debugger.util import Logger
 
@@ -52,6 +58,32 @@ basic_type_map = {
     "long double": BasicTypeCategory.LongDouble
 }
 
+signed_integer_types = (BasicTypeCategory.Char,
+                        BasicTypeCategory.SignedChar,
+                        BasicTypeCategory.Short,
+                        BasicTypeCategory.Int,
+                        BasicTypeCategory.Long,
+                        BasicTypeCategory.LongLong)
+
+unsigned_integer_types = (BasicTypeCategory.Bool,
+                          BasicTypeCategory.UnsignedChar,
+                          BasicTypeCategory.UnsignedShort,
+                          BasicTypeCategory.UnsignedInt,
+                          BasicTypeCategory.UnsignedLong,
+                          BasicTypeCategory.UnsignedLongLong)
+
+integer_formats = {1: "b", 2: "h", 4: "i", 8: "q"}
+
+float_formats = {
+    BasicTypeCategory.Float: ("f", 4, "{:.9g}"),
+    BasicTypeCategory.Double: ("d", 8, "{:.17g}")
+}
+
+char_escapes = {
+    7: "\\a", 8: "\\b", 9: "\\t", 10: "\\n", 11: "\\v", 12: "\\f",
+    13: "\\r", 39: "\\'", 92: "\\\\"
+}
+
 """
     Basic types:
     Bool = 20
@@ -115,6 +147,13 @@ basic_type_map = {
 
 class VariableManager(debugger_api.VariableManager):
     RECURSION_LIMIT = 3
+    PREFETCH_DEPTH = 1
+    NODE_BUDGET = 1000
+    FRAMES_NODE_BUDGET = 20000
+    FRAMES_BYTE_BUDGET = 4 * 1024 * 1024
+    MEMORY_CHUNK_SIZE = 64 * 1024
+    MEMORY_PAGE_SIZE = 4096
+    MEMORY_CACHE_PAGES = 256
 
     """
     Handles retrieval and updating of variables and raw memory of the
@@ -126,10 +165,61 @@ class VariableManager(debugger_api.VariableManager):
         """
         super(VariableManager, self).__init__(debugger)
         self.parser = Parser()
+        self.type_cache = {}
+        """@type type_cache: dict of (str, dict of (str, debugee.Type))"""
+
+        self.use_variable_objects = True
+        self.tracking_lock = threading.RLock()
+        self.tracked = {}
+        """@type tracked: dict of (str, (debugee.Variable | None, str))"""
+        self.tracked_containers = {}
+        """@type tracked_containers: dict of (debugee.Variable, str)"""
+        self.tracked_stack = None
+        """@type tracked_stack: (int, list of (int, str, list of str))"""
+        self.stale_tracked = []
+        """@type stale_tracked: list of str"""
+        self.applying_changes = threading.local()
+
+        self.register_lock = threading.Lock()
+        self.register_names = None
+        """@type register_names: list of str"""
+        self.registers = None
+        """@type registers: dict of (int, debugee.Register)"""
+
+        self.identity_map = {}
+        """@type identity_map: dict of ((str, str), debugee.Variable)"""
+        self.identity_epoch = None
+
+        self.memory_lock = threading.Lock()
+        self.memory_cache = collections.OrderedDict()
+        """@type memory_cache: dict of (int, str)"""
+        self.memory_epoch = None
+
+    def clear_type_cache(self):
+        """
+        Removes all cached types.
+        Types do not change while the binary stays loaded, so this only has
+        to be called when a binary is loaded.
+        """
+        self.type_cache = {}
+
+    def clear_register_cache(self, keep_names=False):
+        """
+        Removes cached register values and optionally also register names.
+        Names only change with the architecture, so they have to be cleared
+        when a binary is loaded, values when a process is launched.
+        @type keep_names: bool
+        """
+        with self.register_lock:
+            if not keep_names:
+                self.register_names = None
+            self.registers = None
 
     def get_type(self, expression, level=0):
         """
         Returns type for the given expression.
+        Types are cached by their name and ptype for the lifetime of the
+        loaded binary (local types with the same name differ in ptype).
         @type expression: str
         @type level: int
         @rtype: debugee.Type
@@ -137,105 +227,176 @@ class VariableManager(debugger_api.VariableManager):
         if level > VariableManager.RECURSION_LIMIT:
             return None
 
-        output = self.debugger.communicator.send("ptype {0}".
-                                                 format(expression))
-        short_output = self.debugger.communicator.send("whatis {0}".
-                                                       format(expression))
+        short_output, output = self.debugger.communicator.send_many(
+            ["whatis {0}".format(expression),
+             "ptype {0}".format(expression)])
+        if not short_output or not output:
+            return None
 
-        if output and short_output:
-            try:
-                type = self.parser.parse_variable_type(output.cli_data[0])
-                type_name = self.parser.parse_variable_type(
-                    short_output.cli_data[0])
-            except:
-                Logger.debug(traceback.format_exc())
-                return None
+        try:
+            type_name = self.parser.parse_variable_type(
+                short_output.cli_data[0])
+        except:
+            Logger.debug(traceback.format_exc())
+            return None
 
-            basic_type_category = BasicTypeCategory.Invalid
-            type_category = TypeCategory.Class
+        layout = "".join(output.cli_data)
+        type = self._get_cached_type(type_name, layout)
 
-            modificators = []
+        if not type:
+            type = self._create_type(expression, type_name, output, level)
 
-            try:
-                while type.startswith("volatile") or type.startswith("const"):
-                    modificator = type[:type.find(" ")]
-                    type = type[len(modificator) + 1:]
-                    modificators.append(modificator)
+            if type:
+                self._cache_type(type_name, layout, type)
 
-                    if type_name.startswith(modificator):
-                        type_name = type_name[len(modificator) + 1:]
-            except:
-                Logger.debug(traceback.format_exc())
-                return None
+        return type
 
-            if type in basic_type_map:
-                basic_type_category = basic_type_map[type]
-                type_category = TypeCategory.Builtin
-            else:
-                if type_name.startswith("std::vector"):
-                    type_category = TypeCategory.Vector
-                elif type_name.startswith("std::string"):
-                    type_category = TypeCategory.String
-                elif type_name.endswith("*"):
-                    type_category = TypeCategory.Pointer
-                elif type_name.endswith("&"):
-                    type_category = TypeCategory.Reference
-                elif type_name.endswith("]"):
-                    type_category = TypeCategory.Array
-                elif type_name.endswith(")"):
-                    type_category = TypeCategory.Function
-                elif type.startswith("struct"):
-                    type_category = TypeCategory.Struct
-                elif type.startswith("class"):
-                    type_category = TypeCategory.Class
-                elif type.startswith("union"):
-                    type_category = TypeCategory.Union
-                elif type.startswith("enum"):
-                    type_category = TypeCategory.Enumeration
-
-            size = None
-            size_output = self.debugger.communicator.send("p sizeof({0})".
-                                                          format(type_name))
-            if size_output:
-                try:
-                    size = int(self.parser.parse_print_expression(
-                        size_output.cli_data[0]))
-                except:
-                    Logger.debug(traceback.format_exc())
-                    return None
+    def _get_cached_type(self, type_name, layout):
+        """
+        @type type_name: str
+        @param layout: description that distinguishes types with the same
+            name
+        @type layout: str
+        @rtype: debugee.Type | None
+        """
+        return self.type_cache.get(type_name, {}).get(layout)
+
+    def _cache_type(self, type_name, layout, type):
+        """
+        Caches the type, unless it is anonymous (all anonymous types share
+        their name).
+        @type type_name: str
+        @type layout: str
+        @type type: debugee.Type
+        """
+        if "{...}" in type_name or "(anonymous" in type_name:
+            return
+
+        self.type_cache.setdefault(type_name, {})[layout] = type
+
+    def _create_type(self, expression, type_name, output, level):
+        """
+        Creates a type for the given expression, whose name and ptype were
+        already resolved.
+        @type expression: str
+        @type type_name: str
+        @param output: result of ptype
+        @type output: debugger.mi.communicator.CommandResult
+        @type level: int
+        @rtype: debugee.Type
+        """
+        size_output = self.debugger.communicator.send(
+            "p sizeof({0})".format(type_name))
 
-            args = [type_name, type_category, basic_type_category, size,
-                    tuple(modificators)]
+        try:
+            type = self.parser.parse_variable_type(output.cli_data[0])
+        except:
+            Logger.debug(traceback.format_exc())
+            return None
 
+        size = None
+        if size_output:
             try:
-                if type_category == TypeCategory.Array:
-                    right_bracket_end = type_name.rfind("]")
-                    right_bracket_start = type_name.rfind("[")
-                    count = int(type_name[
-                                right_bracket_start + 1:right_bracket_end])
-                    child_type = self.get_type("{}[0]".format(expression),
-                                               level + 1)
-                    type = ArrayType(count, child_type, *args)
-                elif type_category == TypeCategory.Vector:
-                    child_type = self.debugger.communicator.send(
-                        "python print(gdb.lookup_type(\"{}\")"
-                        ".template_argument(0))".format(type_name))
-                    child_type = self.get_type(" ".join(child_type.cli_data),
-                                               level + 1)
-                    type = ArrayType(0, child_type, *args)
-                else:
-                    type = Type(*args)
+                size = int(self.parser.parse_print_expression(
+                    size_output.cli_data[0]))
             except:
                 Logger.debug(traceback.format_exc())
                 return None
 
-            return type
+        def load_child_type(type_category, name):
+            if type_category == TypeCategory.Array:
+                return self.get_type("{}[0]".format(expression), level + 1)
+            else:
+                child_type = self.debugger.communicator.send(
+                    "python print(gdb.lookup_type(\"{}\")"
+                    ".template_argument(0))".format(name))
+                return self.get_type(" ".join(child_type.cli_data),
+                                     level + 1)
+
+        return self._build_type(type, type_name, size, load_child_type)
+
+    def _build_type(self, type, type_name, size, load_child_type):
+        """
+        Creates a type from its ptype and whatis descriptions.
+        @type type: str
+        @type type_name: str
+        @type size: int | None
+        @param load_child_type: returns the element type of an array or
+            vector, receives the type category and the type name
+        @type load_child_type: callable
+        @rtype: debugee.Type
+        """
+        basic_type_category = BasicTypeCategory.Invalid
+        type_category = TypeCategory.Class
+
+        modificators = []
+
+        try:
+            while type.startswith("volatile") or type.startswith("const"):
+                modificator = type[:type.find(" ")]
+                type = type[len(modificator) + 1:]
+                modificators.append(modificator)
+
+                if type_name.startswith(modificator):
+                    type_name = type_name[len(modificator) + 1:]
+        except:
+            Logger.debug(traceback.format_exc())
+            return None
+
+        if type in basic_type_map:
+            basic_type_category = basic_type_map[type]
+            type_category = TypeCategory.Builtin
         else:
+            if type_name.startswith("std::vector"):
+                type_category = TypeCategory.Vector
+            elif type_name.startswith("std::string"):
+                type_category = TypeCategory.String
+            elif type_name.endswith("*"):
+                type_category = TypeCategory.Pointer
+            elif type_name.endswith("&"):
+                type_category = TypeCategory.Reference
+            elif type_name.endswith("]"):
+                type_category = TypeCategory.Array
+            elif type_name.endswith(")"):
+                type_category = TypeCategory.Function
+            elif type.startswith("struct"):
+                type_category = TypeCategory.Struct
+            elif type.startswith("class"):
+                type_category = TypeCategory.Class
+            elif type.startswith("union"):
+                type_category = TypeCategory.Union
+            elif type.startswith("enum"):
+                type_category = TypeCategory.Enumeration
+
+        args = [type_name, type_category, basic_type_category, size,
+                tuple(modificators)]
+
+        try:
+            if type_category == TypeCategory.Array:
+                right_bracket_end = type_name.rfind("]")
+                right_bracket_start = type_name.rfind("[")
+                count = int(type_name[
+                            right_bracket_start + 1:right_bracket_end])
+                child_type = load_child_type(type_category, type_name)
+                type = ArrayType(count, child_type, *args)
+            elif type_category == TypeCategory.Vector:
+                child_type = load_child_type(type_category, type_name)
+                type = ArrayType(0, child_type, *args)
+            else:
+                type = Type(*args)
+        except:
+            Logger.debug(traceback.format_exc())
             return None
 
+        return type
+
     def get_variable(self, expression, level=0):
         """
-        Returns a variable for the given expression-
+        Returns a variable for the given expression.
+        The variable tree is described by a GDB-side helper
+        (gdb_variable_serializer.py) in a single command. Members of structs
+        deeper than PREFETCH_DEPTH are loaded on first access of their
+        children (or by load_children).
         @type expression: str
         @type level: int
         @rtype: debugee.Variable
@@ -243,142 +404,351 @@ class VariableManager(debugger_api.VariableManager):
         if level > VariableManager.RECURSION_LIMIT:
             return None
 
-        type = self.get_type(expression)
-        output = self.debugger.communicator.send("p {0}".format(expression))
+        output = self.debugger.communicator.send(
+            self._get_serialize_command(expression,
+                                        VariableManager.PREFETCH_DEPTH))
 
-        if output and type:
-            try:
-                data = self.parser.parse_print_expression(output.cli_data)
-            except:
-                Logger.debug(traceback.format_exc())
-                return None
+        return self._load_serialized_variable(output)
 
-            address = None
-            address_output = self.debugger.communicator.send(
-                "p &{0}".format(expression))
+    def get_variable_at(self, address, type_name):
+        """
+        Returns the variable of the given type located at the given address.
+        Variables that were already loaded by this method during the current
+        stop are returned without asking GDB.
+        @type address: str
+        @type type_name: str
+        @rtype: debugee.Variable | None
+        """
+        identity_map = self._get_identity_map()
+        key = (address, type_name)
+        variable = identity_map.get(key)
 
-            try:
-                if address_output:
-                    address = self._parse_address(address_output.cli_data)
-            except:
-                Logger.debug(traceback.format_exc())
+        if variable is None:
+            variable = self.get_variable("{{{0}}}({1})".format(type_name,
+                                                               address))
+            if variable is not None:
+                identity_map[key] = variable
 
-            name = self._get_name(expression)
-            value = None
-            variable = None
-            children = []
+        return variable
 
-            try:
-                if type.type_category == TypeCategory.Builtin:
-                    value = data
-                    variable = Variable(address, name, value, type, expression)
-
-                elif type.type_category == TypeCategory.Pointer:
-                        value = data[data.rfind(" ") + 1:].lower()
-                        target_type = self.get_type("*{0}".format(expression))
-
-                        if (target_type and BasicTypeCategory.is_char(
-                                target_type.basic_type_category)):
-                            type.type_category = TypeCategory.CString
-                            value = value[1:-1]  # strip quotes
-                        variable = PointerVariable(target_type, address, name,
-                                                   value, type, expression)
-
-                elif type.type_category == TypeCategory.Reference:
-                    value = data[data.find("@") + 1:data.find(":")]
-                    address = self.debugger.communicator.send(
-                        "p &(&{0})".format(expression))
-                    if address:
-                        address = self._parse_address(address.cli_data)
-                    else:
-                        address = "0x0"
-
-                    target_type = self.get_type("*{0}".format(expression))
-                    variable = PointerVariable(target_type, address, name,
-                                               value, type, expression)
-
-                elif type.type_category == TypeCategory.Function:
-                    # skip function pointer type
-                    if data.startswith("({}) ".format(type.name)):
-                        data = data[(3 + len(type.name)):]
-
-                    variable = Variable(address, name, data, type, expression)
-
-                elif type.type_category == TypeCategory.String:
-                    value = data.strip("\"")
-                    variable = Variable(address, name, value, type, expression)
-
-                elif type.type_category in (TypeCategory.Class,
-                                            TypeCategory.Struct,
-                                            TypeCategory.Union):
-                    result = self.debugger.communicator.send(
-                        "python print([field.name for field in "
-                        "gdb.lookup_type(\"{0}\").fields()])".format(type.name)
-                    )
-
-                    if result:
-                        members = self.parser.parse_struct_member_names(
-                            result.cli_data[0])
-                        for member in members:
-                            child = self.get_variable("({0}).{1}".format(
-                                expression, member), level + 1)
-                            if child:
-                                children.append(child)
-                    variable = Variable(address, name, value, type, expression)
-
-                elif type.type_category == TypeCategory.Vector:
-                    length = self.get_variable(
-                        "({0}._M_impl._M_finish - {0}._M_impl._M_start)"
-                        .format(expression), level + 1)
-
-                    if length:
-                        length = int(length.value)
-
-                    data_address = self.debugger.communicator.send(
-                        "p {}._M_impl._M_start".format(expression))
-                    data_address = " ".join(data_address.cli_data).rstrip()
-                    data_address = data_address[data_address.rfind(" ") + 1:]
-                    variable = VectorVariable(length, data_address, address,
-                                              name, value, type, expression)
-                elif type.type_category == TypeCategory.Array:
-                    length = type.count
-                    data_address = self.get_variable(
-                        "&({}[0])".format(expression), level + 1)
-
-                    if data_address:
-                        data_address = data_address.value
-                    else:
-                        data_address = ""
+    def _get_identity_map(self):
+        """
+        Returns the map of variables loaded by get_variable_at during the
+        current stop keyed by their address and type name.
+        @rtype: dict of ((str, str), debugee.Variable)
+        """
+        epoch = self.debugger.communicator.run_epoch
+        if self.identity_epoch != epoch:
+            self.identity_map = {}
+            self.identity_epoch = epoch
 
-                    variable = VectorVariable(length, data_address, address,
-                                              name, value, type, expression)
+        return self.identity_map
 
-                elif type.type_category == TypeCategory.Enumeration:
-                    variable = Variable(address, name, data, type, expression)
-                else:
-                    return None
+    def serialize_frames(self):
+        """
+        Returns all frames of the selected thread with their arguments and
+        local variables, loaded by a single command.
+        Frames whose variables did not fit into the node and byte budgets
+        have variables set to None. Returns None if the frames could not be
+        serialized.
+        @rtype: list of debugee.Frame | None
+        """
+        output = self.debugger.communicator.send(
+            "python devi_serialize_frames({0}, {1}, {2})".format(
+                VariableManager.PREFETCH_DEPTH,
+                VariableManager.FRAMES_NODE_BUDGET,
+                VariableManager.FRAMES_BYTE_BUDGET))
 
-            except:
-                Logger.debug(traceback.format_exc())
+        if not output:
+            return None
+
+        try:
+            data = self.parser.parse_cli_json(output.cli_data)
+            if "error" in data:
                 return None
 
-            if variable:
-                variable.on_value_changed.subscribe(self.update_variable)
+            types = {}
+            frames = []
 
-                for child in children:
-                    if child:
-                        variable.add_child(child)
+            for description in data["frames"]:
+                frame = Frame(int(description["level"]),
+                              self._to_str(description["func"]),
+                              self._to_str(description["fullname"]),
+                              int(description["line"] or 0))
+
+                if description["variables"] is None:
+                    frame.variables = None
+                else:
+                    for node in description["variables"]:
+                        variable = self._create_variable(node, data["types"],
+                                                         types)
+                        if variable:
+                            frame.variables.append(variable)
 
-            return variable
+                frames.append(frame)
 
+            return frames
+        except:
+            Logger.debug(traceback.format_exc())
+
+        return None
+
+    def load_children(self, variables):
+        """
+        Loads children of the given variables that were not loaded yet.
+        All the variables are loaded in a single round trip, so the GUI can
+        use it to prefetch one level of the variables it displays.
+        @type variables: list of debugee.Variable
+        """
+        variables = [variable for variable in variables
+                     if not variable.has_loaded_children()]
+
+        if not variables:
+            return
+
+        outputs = self.debugger.communicator.send_many(
+            [self._get_children_command(variable) for variable in variables])
+
+        for variable, output in zip(variables, outputs):
+            variable.children_loader = None
+
+            loaded = self._load_serialized_variable(output)
+            if loaded is None and variable.address:
+                # the type name cannot be used in a cast (anonymous types)
+                loaded = self._load_serialized_variable(
+                    self.debugger.communicator.send(
+                        self._get_serialize_command(variable.path, 1)))
+
+            if loaded is None:
+                continue
+
+            for child in loaded.children:
+                variable.add_child(child)
+
+            with self.tracking_lock:
+                options = self.tracked_containers.pop(variable, None)
+                if options is not None:
+                    nodes = []
+                    for child in variable.get_loaded_children():
+                        self._collect_tracked_nodes(child, options, nodes)
+                    self._create_variable_objects(nodes)
+
+    def _load_children(self, variable):
+        """
+        Children loader of variables whose children were not serialized.
+        @type variable: debugee.Variable
+        """
+        self.load_children([variable])
+
+    def _get_children_command(self, variable):
+        """
+        Returns the command that serializes one level of children of the
+        given variable.
+        The variable is located by its address, so that the command does
+        not depend on the selected frame.
+        @type variable: debugee.Variable
+        @rtype: str
+        """
+        if variable.address:
+            expression = "*({0} *) {1}".format(variable.type.name,
+                                               variable.address)
         else:
+            expression = variable.path
+
+        return self._get_serialize_command(expression, 1, path=variable.path)
+
+    def _get_serialize_command(self, expression, depth, options=None,
+                               path=None):
+        """
+        Returns the command that serializes the given expression.
+        @type expression: str
+        @param depth: how many levels of struct members will be serialized
+        @type depth: int
+        @param options: MI options selecting the thread and frame in which
+            the expression is evaluated
+        @type options: str | None
+        @param path: path of the serialized variable, expression by default
+        @type path: str | None
+        @rtype: str
+        """
+        arguments = [json.dumps(expression), str(depth),
+                     str(VariableManager.NODE_BUDGET)]
+        if path:
+            arguments.append(json.dumps(path))
+
+        command = "python devi_serialize_variable({0})".format(
+            ", ".join(arguments))
+
+        if options:
+            command = "-interpreter-exec {0} console {1}".format(
+                options, self._quote(command))
+
+        return command
+
+    def _load_serialized_variable(self, output):
+        """
+        Creates a variable from the output of the serializer.
+        @type output: mi.communicator.CommandResult
+        @rtype: debugee.Variable | None
+        """
+        if not output:
+            return None
+
+        try:
+            data = self.parser.parse_cli_json(output.cli_data)
+        except:
+            Logger.debug(traceback.format_exc())
+            return None
+
+        if "error" in data:
+            return None
+
+        return self._create_variable(data["root"], data["types"], {})
+
+    def _load_type(self, type_name, descriptions, types):
+        """
+        Returns the type with the given name described by the serializer.
+        @type type_name: str
+        @param descriptions: type table of the serializer
+        @type descriptions: dict
+        @param types: types already created from the type table
+        @type types: dict of (str, debugee.Type)
+        @rtype: debugee.Type | None
+        """
+        if type_name is None:
             return None
 
+        if type_name in types:
+            return types[type_name]
+
+        description = descriptions.get(type_name)
+        if not description:
+            return None
+
+        # the serializer names local types like the global ones, they are
+        # told apart by their size
+        layout = "sizeof {}".format(description["size"])
+        type = self._get_cached_type(self._to_str(type_name), layout)
+
+        if not type:
+            type = self._build_type(
+                self._to_str(description["ptype"]), self._to_str(type_name),
+                description["size"],
+                lambda category, name: self._load_type(
+                    description.get("child"), descriptions, types))
+
+            if type:
+                self._cache_type(self._to_str(type_name), layout, type)
+
+        types[type_name] = type
+        return type
+
+    def _create_variable(self, node, descriptions, types):
+        """
+        Creates a variable from a node described by the serializer.
+        @type node: dict
+        @type descriptions: dict
+        @type types: dict of (str, debugee.Type)
+        @rtype: debugee.Variable | None
+        """
+        type = self._load_type(node["type"], descriptions, types)
+
+        if not type:
+            return None
+
+        expression = self._to_str(node["path"])
+        address = self._to_str(node.get("address"))
+
+        data = self._to_str(node.get("value"))
+        name = self._get_name(expression)
+        variable = None
+        children = []
+
+        try:
+            if type.type_category == TypeCategory.Builtin:
+                variable = Variable(address, name, data, type, expression)
+
+            elif type.type_category == TypeCategory.Pointer:
+                value = data[data.rfind(" ") + 1:].lower()
+                target_type = self._load_type(node.get("target"),
+                                              descriptions, types)
+
+                if (target_type and BasicTypeCategory.is_char(
+                        target_type.basic_type_category)):
+                    type = copy.copy(type)  # the type is cached
+                    type.type_category = TypeCategory.CString
+                    value = value[1:-1]  # strip quotes
+                variable = PointerVariable(target_type, address, name,
+                                           value, type, expression)
+
+            elif type.type_category == TypeCategory.Reference:
+                value = data[data.find("@") + 1:data.find(":")]
+                target_type = self._load_type(node.get("target"),
+                                              descriptions, types)
+                variable = PointerVariable(target_type, address or "0x0",
+                                           name, value, type, expression)
+
+            elif type.type_category == TypeCategory.Function:
+                # skip function pointer type
+                if data.startswith("({}) ".format(type.name)):
+                    data = data[(3 + len(type.name)):]
+
+                variable = Variable(address, name, data, type, expression)
+
+            elif type.type_category == TypeCategory.String:
+                value = data.strip("\"")
+                variable = Variable(address, name, value, type, expression)
+
+            elif type.type_category in (TypeCategory.Class,
+                                        TypeCategory.Struct,
+                                        TypeCategory.Union):
+                for child_node in node.get("children", ()):
+                    child = self._create_variable(child_node, descriptions,
+                                                  types)
+                    if child:
+                        children.append(child)
+                variable = Variable(address, name, None, type, expression)
+
+                if "children" not in node:
+                    variable.children_loader = self._load_children
+
+            elif type.type_category == TypeCategory.Vector:
+                variable = VectorVariable(node.get("length"),
+                                          self._to_str(
+                                              node.get("data_address")),
+                                          address, name, None, type,
+                                          expression)
+
+            elif type.type_category == TypeCategory.Array:
+                data_address = self._to_str(node.get("data_address")) or ""
+                variable = VectorVariable(type.count, data_address, address,
+                                          name, None, type, expression)
+
+            elif type.type_category == TypeCategory.Enumeration:
+                variable = Variable(address, name, data, type, expression)
+            else:
+                return None
+
+        except:
+            Logger.debug(traceback.format_exc())
+            return None
+
+        variable.bitsize = node.get("bitsize", 0)
+        variable.on_value_changed.subscribe(self.update_variable)
+
+        for child in children:
+            variable.add_child(child)
+
+        return variable
+
     def update_variable(self, variable):
         """
         Updates the variable's value in the debugged process.
         @type variable: debugee.Variable
         """
+        if getattr(self.applying_changes, "active", False):
+            return True
+
         format = "set variable *{0} = {1}"
 
         value = variable.value
@@ -394,90 +764,715 @@ class VariableManager(debugger_api.VariableManager):
             Logger.debug(traceback.format_exc())
             return False
 
+        location = variable.address
+        if variable.bitsize:
+            # a bitfield shares its bytes with its neighbours
+            format = "set variable {0} = {1}"
+            location = variable.path
+
         result = self.debugger.communicator.send(format.format(
-            variable.address, value))
+            location, value))
+        self.invalidate_memory_cache()
+        self.identity_epoch = None
 
         return result.is_success()
 
+    def track_variables(self, frames):
+        """
+        Creates GDB variable objects for the values of the given frames, so
+        that update_tracked_variables can find out which of them changed
+        without loading the frames again.
+        Variable objects of previously tracked frames are deleted.
+        @type frames: list of debugee.Frame
+        """
+        with self.tracking_lock:
+            self.untrack_variables()
+
+            if not self.use_variable_objects:
+                return
+
+            thread_info = self.debugger.thread_manager.get_thread_info()
+            if not thread_info or not thread_info.selected_thread:
+                return
+
+            thread_id = thread_info.selected_thread.id
+            nodes = []
+            for frame in frames:
+                options = "--thread {0} --frame {1}".format(thread_id,
+                                                            frame.level)
+                for variable in frame.variables:
+                    self._collect_tracked_nodes(variable, options, nodes)
+
+            self._create_variable_objects(nodes)
+
+            try:
+                self.tracked_stack = self._get_stack_signature(
+                    thread_id, frames, self.debugger.communicator.send_many(
+                        self._get_scope_commands(
+                            thread_id, [frame.level for frame in frames])))
+            except:
+                Logger.debug(traceback.format_exc())
+
+    def _get_scope_commands(self, thread_id, levels):
+        """
+        Returns commands that list the variables visible in the frames with
+        the given levels, they change when a nested block is entered or
+        left.
+        @type thread_id: int
+        @type levels: list of int
+        @rtype: list of str
+        """
+        return ["-stack-list-variables --thread {0} --frame {1} "
+                "--no-values".format(thread_id, level) for level in levels]
+
+    def _get_stack_signature(self, thread_id, frames, scopes):
+        """
+        Returns the thread, levels, functions and visible variables of the
+        given frames, tracked variables are valid as long as it stays the
+        same.
+        @type thread_id: int
+        @type frames: list of debugee.Frame
+        @param scopes: results of _get_scope_commands for the frames
+        @type scopes: list of mi.communicator.CommandResult
+        @rtype: (int, list of (int, str, list of str)) | None
+        """
+        if len(frames) != len(scopes) or not all(scopes):
+            return None
+
+        return (thread_id,
+                [(frame.level, frame.func,
+                  [name_info["name"] for name_info in
+                   self.parser.parse_frame_variables(scope.data)])
+                 for frame, scope in zip(frames, scopes)])
+
+    def track_variable(self, variable):
+        """
+        Adds a variable that does not belong to any frame (for example
+        a heap object) to the tracked variables.
+        @type variable: debugee.Variable
+        """
+        with self.tracking_lock:
+            if self.tracked_stack is None:
+                return
+
+            nodes = []
+            self._collect_tracked_nodes(variable, "", nodes)
+            self._create_variable_objects(nodes)
+
+    def untrack_variables(self):
+        """
+        Deletes all variable objects created by track_variables.
+        """
+        with self.tracking_lock:
+            names = self.stale_tracked + list(self.tracked)
+            if names:
+                self.debugger.communicator.send_many(
+                    ["-var-delete {0}".format(name) for name in names])
+
+            self.stale_tracked = []
+            self.tracked = {}
+            self.tracked_containers = {}
+            self.tracked_stack = None
+
+    def reset_tracking(self, gdb_restarted=False):
+        """
+        Forgets the tracked variables without talking to GDB, so it can be
+        called when the debugged program exits.
+        Their variable objects are deleted by the next untrack_variables
+        unless GDB was restarted (and they do not exist anymore).
+        @type gdb_restarted: bool
+        """
+        with self.tracking_lock:
+            if gdb_restarted:
+                self.stale_tracked = []
+            else:
+                self.stale_tracked.extend(self.tracked)
+
+            self.tracked = {}
+            self.tracked_containers = {}
+            self.tracked_stack = None
+
+    def update_tracked_variables(self):
+        """
+        Updates the values of tracked variables that changed since the last
+        stop. Only the changed variables are loaded again and only they
+        notify on_value_changed.
+        Returns None if the stack, the variables visible in its frames or
+        the structure of the tracked variables changed and the frames have
+        to be loaded again.
+        @rtype: list of debugee.Variable | None
+        """
+        with self.tracking_lock:
+            if self.tracked_stack is None:
+                return None
+
+            thread_id, tracked_frames = self.tracked_stack
+            outputs = self.debugger.communicator.send_many(
+                ["-thread-info", "-stack-list-frames",
+                 "-var-update --all-values *"] +
+                self._get_scope_commands(
+                    thread_id, [level for level, func, names
+                                in tracked_frames]))
+            thread, stack, update = outputs[:3]
+
+            if not thread or not stack or not update:
+                return None
+
+            try:
+                thread_info = self.parser.parse_thread_info(thread.data)
+                if not thread_info.selected_thread:
+                    return None
+
+                frames = self.parser.parse_stack_frames(stack.data)
+                if self.tracked_stack != self._get_stack_signature(
+                        thread_info.selected_thread.id, frames, outputs[3:]):
+                    return None
+
+                changes = self.parser.parse(update.data)["changelist"]
+            except:
+                Logger.debug(traceback.format_exc())
+                return None
+
+            changed = []
+            for change in changes:
+                if change["name"] not in self.tracked:
+                    continue
+
+                variable, options = self.tracked[change["name"]]
+                if (variable is None or change.get("in_scope") != "true" or
+                        change.get("type_changed") == "true"):
+                    return None
+
+                changed.append((variable, options))
+
+            if not changed:
+                return []
+
+            outputs = self.debugger.communicator.send_many(
+                [self._get_serialize_command(tracked.path, 0, tracked_options)
+                 for tracked, tracked_options in changed])
+
+            variables = []
+            for (variable, options), output in zip(changed, outputs):
+                reloaded = self._load_serialized_variable(output)
+                if reloaded is None:
+                    return None
+
+                self._apply_value(variable, reloaded.value)
+                variables.append(variable)
+
+            return variables
+
+    def _collect_tracked_nodes(self, variable, options, nodes):
+        """
+        Collects (options, expression, variable) of every value in the
+        given variable tree.
+        Vectors are tracked by their bounds, a change of them requires
+        reloading of the vector (marked by variable None). Children that
+        were not loaded yet are tracked once they are loaded.
+        @type variable: debugee.Variable
+        @type options: str
+        @type nodes: list of (str, str, debugee.Variable | None)
+        """
+        if not variable.has_loaded_children():
+            self.tracked_containers[variable] = options
+
+        if isinstance(variable, VectorVariable):
+            self.tracked_containers[variable] = options
+            if variable.type.type_category == TypeCategory.Vector:
+                for bound in ("_M_start", "_M_finish"):
+                    nodes.append((options, "{0}._M_impl.{1}".format(
+                        variable.path, bound), None))
+        elif variable.value is not None:
+            nodes.append((options, variable.path, variable))
+
+        for child in variable.get_loaded_children():
+            self._collect_tracked_nodes(child, options, nodes)
+
+    def _untrack_children(self, variable):
+        """
+        Deletes variable objects of the children of the given variable.
+        @type variable: debugee.Variable
+        """
+        children = set()
+        stack = list(variable.get_loaded_children())
+        while stack:
+            child = stack.pop()
+            children.add(id(child))
+            self.tracked_containers.pop(child, None)
+            stack.extend(child.get_loaded_children())
+
+        names = [name for name, (tracked, options) in self.tracked.items()
+                 if id(tracked) in children]
+
+        if names:
+            self.debugger.communicator.send_many(
+                ["-var-delete {0}".format(name) for name in names])
+
+        for name in names:
+            del self.tracked[name]
+
+    def _create_variable_objects(self, nodes):
+        """
+        Variable objects without options are floating, they are evaluated
+        in the selected frame.
+        @type nodes: list of (str, str, debugee.Variable | None)
+        """
+        results = self.debugger.communicator.send_many(
+            ["-var-create {0} - {1} {2}".format(options,
+                                                "*" if options else "@",
+                                                self._quote(expression))
+             for options, expression, variable in nodes])
+
+        for (options, expression, variable), result in zip(nodes, results):
+            if not result:
+                continue
+
+            try:
+                name = self.parser.parse(result.data)["name"]
+                self.tracked[name] = (variable, options)
+            except:
+                Logger.debug(traceback.format_exc())
+
+    def _apply_value(self, variable, value):
+        """
+        Sets the value of the variable without writing it back to the
+        debugged process.
+        Only updates made by the calling thread are skipped, an edit made
+        in another thread at the same time is still written.
+        @type variable: debugee.Variable
+        @type value: str
+        """
+        self.applying_changes.active = True
+        try:
+            variable.value = value
+        finally:
+            self.applying_changes.active = False
+
     def get_memory(self, address, count):
         """
         Returns count bytes from the given address.
+        Memory at numeric addresses is cached in pages until the debugged
+        process runs again, missing adjacent pages are read together.
+        If a part of the range cannot be read, only the bytes before it are
+        returned.
         @type address: str
         @type count: int
-        @rtype: list of int
+        @rtype: memoryview
         """
-        command = "x/{0}xb {1}".format(count, address)
-        output = self.debugger.communicator.send(command)
+        page_size = VariableManager.MEMORY_PAGE_SIZE
 
-        bytes = []
         try:
-            for line in output.cli_data:
-                start = line.find(":")
-                line = line[start + 1:]
-                for num in line.split("\\t"):
-                    if num:
-                        bytes.append(int(num, 16))
-        except:
-            Logger.debug(traceback.format_exc())
+            start = int(str(address), 0)
+        except ValueError:
+            start = None
+
+        if (start is None or count < 1 or
+                count > page_size * (VariableManager.MEMORY_CACHE_PAGES - 1)):
+            return self._read_memory([(address, count)])[0]
+
+        first_page = start // page_size
+        last_page = (start + count - 1) // page_size
+
+        with self.memory_lock:
+            pages = self._get_cached_pages(first_page, last_page)
+
+            runs = []
+            for page in xrange(first_page, last_page + 1):
+                if page not in pages:
+                    if runs and runs[-1][1] == page:
+                        runs[-1][1] = page + 1
+                    else:
+                        runs.append([page, page + 1])
+
+            if runs:
+                contents = self._read_memory(
+                    [("0x{:x}".format(begin * page_size),
+                      (end - begin) * page_size) for begin, end in runs])
+
+                for (begin, end), data in zip(runs, contents):
+                    for page in xrange(begin, end):
+                        offset = (page - begin) * page_size
+                        pages[page] = data[offset:offset + page_size].tobytes()
+                        self._cache_page(page, pages[page])
+
+        memory = bytearray(count)
+        length = 0
+
+        for page in xrange(first_page, last_page + 1):
+            page_start = page * page_size
+            low = max(start, page_start) - page_start
+            high = min(start + count, page_start + page_size) - page_start
+            data = pages[page][low:high]
+
+            memory[length:length + len(data)] = data
+            length += len(data)
+
+            if len(data) < high - low:
+                break
+
+        return memoryview(memory)[:length]
+
+    def invalidate_memory_cache(self):
+        """
+        Drops all cached memory pages.
+        Called automatically when the debugged process runs, it has to be
+        called after any command that changes its memory.
+        """
+        self.memory_epoch = None
+
+    def _get_cached_pages(self, first_page, last_page):
+        """
+        Returns the cached pages in the given range (inclusive) that are
+        valid in the current stop.
+        @type first_page: int
+        @type last_page: int
+        @rtype: dict of (int, str)
+        """
+        epoch = self.debugger.communicator.run_epoch
+        if self.memory_epoch != epoch:
+            self.memory_cache = collections.OrderedDict()
+            self.memory_epoch = epoch
+
+        pages = {}
+        for page in xrange(first_page, last_page + 1):
+            data = self.memory_cache.pop(page, None)
+            if data is not None:
+                self.memory_cache[page] = data
+                pages[page] = data
+
+        return pages
+
+    def _cache_page(self, page, data):
+        """
+        @type page: int
+        @type data: str
+        """
+        self.memory_cache[page] = data
 
-        return bytes
+        while len(self.memory_cache) > VariableManager.MEMORY_CACHE_PAGES:
+            self.memory_cache.popitem(last=False)
+
+    def _read_memory(self, ranges):
+        """
+        Reads the given memory ranges, the reads of all ranges are sent to
+        GDB at once.
+        Ranges larger than MEMORY_CHUNK_SIZE are read in chunks. A range is
+        cut at its first byte that cannot be read.
+        @type ranges: list of (str, int)
+        @rtype: list of memoryview
+        """
+        chunk_size = VariableManager.MEMORY_CHUNK_SIZE
+        commands = []
+
+        for address, count in ranges:
+            address = self._quote(str(address))
+            commands += ["-data-read-memory-bytes -o {0} {1} {2}".format(
+                offset, address, min(chunk_size, count - offset))
+                for offset in xrange(0, count, chunk_size)]
+
+        outputs = iter(self.debugger.communicator.send_many(commands))
+        result = []
+
+        for address, count in ranges:
+            chunks = [next(outputs) for offset in xrange(0, count, chunk_size)]
+            memory = bytearray(count)
+            length = 0
+
+            try:
+                for output in chunks:
+                    if not output:
+                        break
+
+                    blocks = self.parser.parse(output.data)["memory"]
+                    start = length
+                    for block in blocks:
+                        offset = start + int(block["offset"], 16)
+                        if offset != length:
+                            break
+
+                        contents = binascii.unhexlify(block["contents"])
+                        memory[offset:offset + len(contents)] = contents
+                        length += len(contents)
+
+                    if length - start < chunk_size:
+                        break
+            except:
+                Logger.debug(traceback.format_exc())
+
+            result.append(memoryview(memory)[:min(length, count)])
+
+        return result
 
     def get_registers(self):
         """
         Returns the register values as a list of tuples with name and value of
         the given register.
+        Only values of registers that changed since the last call are
+        fetched from GDB, the other registers are returned from the cache.
         @rtype: list of register.Register
         """
-        try:
-            register_names = self.debugger.communicator.send(
-                "-data-list-register-names")
-            if not register_names:
-                return []
-
-            register_names = self.parser.parse(
-                register_names.data)["register-names"]
+        communicator = self.debugger.communicator
 
-            register_values = self.debugger.communicator.send(
-                "-data-list-register-values --skip-unavailable x")
-            if not register_values:
-                return []
-
-            registers = []
-            register_values = self.parser.parse(
-                register_values.data)["register-values"]
-            for reg in register_values:
-                number = int(reg["number"])
-                if (number < len(register_names) and
-                        len(register_names[number]) > 0):
-                    registers.append(Register(str(register_names[number]),
-                                              str(reg["value"])))
-            return registers
-        except:
-            Logger.debug(traceback.format_exc())
+        with self.register_lock:
+            try:
+                if self.register_names is None:
+                    register_names = communicator.send(
+                        "-data-list-register-names")
+                    if not register_names:
+                        return []
+
+                    self.register_names = self.parser.parse(
+                        register_names.data)["register-names"]
+
+                if self.registers is None:
+                    # the first call of -data-list-changed-registers sets
+                    # the values, to which the following calls compare
+                    changed, register_values = communicator.send_many(
+                        ["-data-list-changed-registers",
+                         "-data-list-register-values --skip-unavailable x"])
+                    self.registers = {}
+                else:
+                    changed = communicator.send(
+                        "-data-list-changed-registers")
+                    if not changed:
+                        return []
+
+                    numbers = self.parser.parse(
+                        changed.data)["changed-registers"]
+                    register_values = None
+                    if numbers:
+                        register_values = communicator.send(
+                            "-data-list-register-values --skip-unavailable "
+                            "x {}".format(" ".join(numbers)))
+
+                if register_values is not None:
+                    if not register_values:
+                        self.registers = None
+                        return []
+
+                    register_values = self.parser.parse(
+                        register_values.data)["register-values"]
+                    for reg in register_values:
+                        number = int(reg["number"])
+                        if (number < len(self.register_names) and
+                                len(self.register_names[number]) > 0):
+                            self.registers[number] = Register(
+                                str(self.register_names[number]),
+                                str(reg["value"]))
+
+                return [self.registers[register_number]
+                        for register_number in sorted(self.registers)]
+            except:
+                Logger.debug(traceback.format_exc())
+                self.registers = None
 
         return []
 
     def get_vector_items(self, vector):
         """
+        Loads count items of the vector from its start index.
+        Items of builtin, pointer and plain struct types are decoded from
+        a single memory read, other items are loaded one by one.
         @type vector: debugger.debugee.VectorVariable
         @rtype: list of debugger.debugee.Variable
         """
+        items = self._get_vector_items_from_memory(vector)
+
+        if items is None:
+            items = []
+            for i in xrange(vector.start, vector.start + vector.count):
+                var = self.get_variable(self._get_item_expression(vector, i))
+                if var:
+                    items.append(var)
+
+        with self.tracking_lock:
+            options = self.tracked_containers.get(vector)
+            if options:
+                self._untrack_children(vector)
+
+            vector.children = items
+
+            if options:
+                nodes = []
+                for item in items:
+                    self._collect_tracked_nodes(item, options, nodes)
+                self._create_variable_objects(nodes)
+
+        return items
+
+    def _get_item_expression(self, vector, index):
+        """
+        @type vector: debugger.debugee.VectorVariable
+        @type index: int
+        @rtype: str
+        """
+        expression = vector.path
+        if vector.type.type_category == TypeCategory.Array:
+            expression += "[{}]".format(index)
+        elif vector.type.type_category == TypeCategory.Vector:
+            expression = "*({}._M_impl._M_start + {})".format(
+                expression, index)
+
+        return expression
+
+    def _get_vector_items_from_memory(self, vector):
+        """
+        Loads the first requested item with its layout and decodes all the
+        requested items from one memory read.
+        Returns None if the items cannot be decoded locally.
+        @type vector: debugger.debugee.VectorVariable
+        @rtype: list of debugger.debugee.Variable | None
+        """
+        child_type = vector.type.child_type
+
+        if vector.count < 1 or not child_type or not child_type.size:
+            return None
+
+        template = self._load_serialized_variable(
+            self.debugger.communicator.send(self._get_serialize_command(
+                self._get_item_expression(vector, vector.start),
+                VariableManager.RECURSION_LIMIT)))
+
+        if not template or not self._is_decodable(template):
+            return None
+
+        size = child_type.size
+        base = int(template.address, 16)
+
+        memory = self.get_memory(template.address, size * vector.count)
+
+        if len(memory) < size * vector.count:
+            return None
+
         items = []
-        for i in xrange(vector.start, vector.start + vector.count):
-            expression = vector.path
-            if vector.type.type_category == TypeCategory.Array:
-                expression += "[{}]".format(i)
-            elif vector.type.type_category == TypeCategory.Vector:
-                expression = "*({}._M_impl._M_start + {})".format(
-                    expression, i)
-            var = self.get_variable(expression)
-            if var:
-                items.append(var)
-
-        vector.children = items
+        try:
+            for i in xrange(vector.count):
+                items.append(self._decode_variable(
+                    template,
+                    self._get_item_expression(vector, vector.start + i),
+                    memory, base, i * size))
+        except:
+            Logger.debug(traceback.format_exc())
+            return None
 
         return items
 
+    def _is_decodable(self, variable):
+        """
+        Returns True if the variable can be decoded from raw memory, i.e.
+        it is a builtin, a pointer or a struct made only of them.
+        Bitfields do not occupy whole bytes, so they are left to GDB.
+        @type variable: debugee.Variable
+        @rtype: bool
+        """
+        if not variable.address or variable.bitsize:
+            return False
+
+        type = variable.type
+
+        if type.type_category in (TypeCategory.Class, TypeCategory.Struct,
+                                  TypeCategory.Union):
+            prefix = "({})".format(variable.path)
+            return all(child.path.startswith(prefix) and
+                       self._is_decodable(child)
+                       for child in variable.children)
+        elif type.type_category == TypeCategory.Pointer:
+            return type.size in integer_formats
+        elif type.type_category == TypeCategory.Builtin:
+            category = type.basic_type_category
+            if category in float_formats:
+                return type.size == float_formats[category][1]
+
+            return (type.size in integer_formats and
+                    (category in signed_integer_types or
+                     category in unsigned_integer_types))
+
+        return False
+
+    def _decode_variable(self, template, path, memory, base, shift):
+        """
+        Creates a copy of the template variable located shift bytes after
+        it, with values decoded from the given memory.
+        @param template: decodable variable describing the layout
+        @type template: debugee.Variable
+        @param path: expression of the new variable
+        @type path: str
+        @param memory: memory that starts at the address base
+        @type memory: memoryview
+        @type base: int
+        @type shift: int
+        @rtype: debugee.Variable
+        """
+        type = template.type
+        address = int(template.address, 16) + shift
+        formatted_address = "0x{:x}".format(address)
+
+        if type.type_category == TypeCategory.Pointer:
+            value = struct.unpack_from(
+                "=" + integer_formats[type.size].upper(), memory,
+                address - base)[0]
+            variable = PointerVariable(template.target_type,
+                                       formatted_address, template.name,
+                                       "0x{:x}".format(value), type, path)
+        elif type.type_category == TypeCategory.Builtin:
+            value = self._decode_builtin(type, memory, address - base)
+            variable = Variable(formatted_address, template.name, value,
+                                type, path)
+        else:
+            variable = Variable(formatted_address, template.name, None,
+                                type, path)
+            for child in template.children:
+                child_path = "({0}){1}".format(
+                    path, child.path[len(template.path) + 2:])
+                variable.add_child(self._decode_variable(
+                    child, child_path, memory, base, shift))
+
+        variable.on_value_changed.subscribe(self.update_variable)
+
+        return variable
+
+    def _decode_builtin(self, type, memory, offset):
+        """
+        Decodes a value of the given builtin type and formats it the same
+        way as GDB prints it.
+        @type type: debugee.Type
+        @type memory: memoryview
+        @type offset: int
+        @rtype: str
+        """
+        category = type.basic_type_category
+
+        if category in float_formats:
+            format, size, output_format = float_formats[category]
+            value = struct.unpack_from("=" + format, memory, offset)[0]
+            return output_format.format(value)
+
+        format = integer_formats[type.size]
+        if category in unsigned_integer_types:
+            format = format.upper()
+        value = struct.unpack_from("=" + format, memory, offset)[0]
+
+        if category == BasicTypeCategory.Bool and value in (0, 1):
+            return "true" if value else "false"
+        elif BasicTypeCategory.is_char(category):
+            return "{0} '{1}'".format(value, self._escape_char(value & 0xFF))
+        else:
+            return str(value)
+
+    def _escape_char(self, value):
+        """
+        Escapes the given character the same way as GDB does.
+        @type value: int
+        @rtype: str
+        """
+        if value in char_escapes:
+            return char_escapes[value]
+        elif 32 <= value < 127:
+            return chr(value)
+        else:
+            return "\\{:03o}".format(value)
+
     def _get_name(self, expression):
         """
         Returns name from the given expression.
@@ -491,19 +1486,22 @@ class VariableManager(debugger_api.VariableManager):
         else:
             return expression
 
-    def _parse_address(self, expression):
+    def _quote(self, text):
         """
-        @type expression: str
-        @rtype: str | None
+        Quotes the given text as a C string.
+        @type text: str
+        @rtype: str
         """
-        try:
-            address = self.parser.parse_print_expression(expression)
+        escaped = text.replace("\\", "\\\\").replace("\"", "\\\"")
+        return "\"{}\"".format(escaped)
 
-            if len(address) > 0 and address[0] == "(":
-                return address[address.rfind(" ") + 1:]
-            elif address[:2] == "0x":
-                return address[:address.find(" ")]
-        except:
-            Logger.debug(traceback.format_exc())
+    def _to_str(self, text):
+        """
+        Converts text decoded from JSON to str.
+        @type text: unicode | str | None
+        @rtype: str | None
+        """
+        if isinstance(text, unicode):
+            return text.encode("utf-8")
 
-        return None
+        return text
@@ -57,26 +57,56 @@ class FileOpenDialog(object):
 
         return folder
 
-    def __init__(self, title, parent, directory=False, initial_path=None):
+    @staticmethod
+    @require_gui_thread
+    def select_save_file(title, parent, file_name=None):
+        """
+        @type title: str
+        @type parent: Gtk.Widget
+        @param file_name: suggested name of the file
+        @type file_name: str
+        @rtype: str
+        """
+        dialog = FileOpenDialog(title, parent, save=True)
+
+        if file_name:
+            dialog.dialog.set_current_name(file_name)
+
+        file = dialog.open()
+        dialog.destroy()
+
+        return file
+
+    def __init__(self, title, parent, directory=False, initial_path=None,
+                 save=False):
         """
         Opens a file or folder chooser dialog.
         @type title: str
         @type parent: Gtk.Widget
         @type directory: bool
         @type initial_path: str
+        @param save: choose a file to save to
+        @type save: bool
         """
         type = Gtk.FileChooserAction.OPEN
+        button = Gtk.STOCK_OPEN
 
         if directory:
             type = Gtk.FileChooserAction.SELECT_FOLDER
+        elif save:
+            type = Gtk.FileChooserAction.SAVE
+            button = Gtk.STOCK_SAVE
 
         self.dialog = Gtk.FileChooserDialog(title, parent,
                                             type,
                                             (Gtk.STOCK_CANCEL,
                                              Gtk.ResponseType.CANCEL,
-                                             Gtk.STOCK_OPEN,
+                                             button,
                                              Gtk.ResponseType.OK))
 
+        if save:
+            self.dialog.set_do_overwrite_confirmation(True)
+
         if initial_path:
             self.dialog.set_current_folder(initial_path)
 
@@ -406,26 +406,35 @@ class MemoryModel(object):
         self.heap_wrapper = None
         self.stack_wrapper = None
         self.wrapper = None
+        self.frames = []
 
     def get_drawable_by_pointer(self, pointer):
         """
         @type pointer: debugee.PointerVariable
         @rtype: drawing.drawable.Drawable | None
         """
+        # interior pointers point to the drawable of their heap block
+        block = self.canvas.debugger.heap_manager.find_block_containing(
+            pointer.value)
+        block_drawable = None
+
         for drawable in self.canvas.drawable_registry:
             if isinstance(drawable, VariableContainer):
                 var = drawable.variable
                 if isinstance(var, Variable):
                     if var.address == pointer.value:
                         return drawable
+                    elif block and var.address == block.address:
+                        block_drawable = drawable
+
+        if block_drawable:
+            return block_drawable
 
-        var = self.canvas.debugger.variable_manager.get_variable(
-            "{{{}}}({})".format(
-                pointer.target_type.name,
-                pointer.value
-            ))
+        var = self.canvas.debugger.variable_manager.get_variable_at(
+            pointer.value, pointer.target_type.name)
 
         if var and var.address == pointer.value:
+            self.canvas.debugger.variable_manager.track_variable(var)
             drawable = self.canvas.memtoview.transform_var(var)
             self.heap_wrapper.add_child(drawable)
             self.canvas.redraw()
@@ -467,6 +476,7 @@ class MemoryModel(object):
 
         if selected_frame:
             v = self.canvas.debugger.thread_manager.get_frames_with_variables()
+            self.frames = v
             for i, fr in enumerate(v):
                 fr = self.canvas.memtoview.transform_frame(fr)
                 fr.margin.bottom = 20
@@ -533,6 +543,12 @@ class MemoryCanvas(Canvas):
         if state == ProcessState.Stopped:
             location = self.debugger.file_manager.get_current_location()
             if location and len(location[0]) > 0 and location[1] > 0:
+                changed = self.debugger.variable_manager.\
+                    update_tracked_variables()
+                if changed is not None:
+                    run_on_gui(self.redraw)
+                    return
+
                 frame = self.debugger.thread_manager.get_current_frame(False)
                 self._rebuild(frame)
         elif state == ProcessState.Exited:
@@ -565,6 +581,8 @@ class MemoryCanvas(Canvas):
     def _rebuild_job(self, frame):
         self.memory_model = MemoryModel(self)
         self.memory_model.prepare_gui(frame)
+        self.debugger.variable_manager.track_variables(
+            self.memory_model.frames)
 
     def _rebuild_job_callback(self):
         self.on_load_end.notify()
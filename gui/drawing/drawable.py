@@ -996,8 +996,15 @@ class CompositeLabel(LinearLayout, VariableContainer):
                                margin=Margin(0, 0, 5, 0))
             self.add_child(self.label)
 
+        composite_children = self.get_composite_children()
+
+        # load the members of all displayed children in one batch instead
+        # of one by one when their drawables are created
+        self.canvas.debugger.variable_manager.load_children(
+            composite_children)
+
         children = []
-        for var in self.get_composite_children():
+        for var in composite_children:
             drawable = self.create_composite_value(var)
             if drawable:
                 children.append(drawable)
@@ -22,8 +22,12 @@
 from gi.repository import Gtk, GObject
 
 import time
+import traceback
 
+from debugger.debugee import HeapDelta, HeapStats
 from debugger.enums import ProcessState
+from debugger.util import Logger
+from dialog import FileOpenDialog, MessageBox
 from gui_util import require_gui_thread, run_on_gui
 
 import matplotlib
@@ -42,7 +46,7 @@ class HeapGraph(Gtk.ScrolledWindow):
         Gtk.ScrolledWindow.__init__(self)
         self.debugger = debugger
         self.debugger.heap_manager.on_heap_change.subscribe(
-            lambda heap: self._handle_heap_change(heap))
+            lambda delta: self._handle_heap_change(delta))
         self.debugger.on_process_state_changed.subscribe(
             lambda state, data: self._handle_process_change(state))
         self.sizes = []
@@ -92,15 +96,14 @@ class HeapGraph(Gtk.ScrolledWindow):
         GObject.timeout_add(1000,
                             self._timer_tick)
 
-    def _handle_heap_change(self, heap):
+    def _handle_heap_change(self, delta):
         """
-        @type heap: list of debugee.HeapBlock
+        @type delta: debugee.HeapDelta
         """
-        size = 0
-        for block in heap:
-            size += block.size
-
-        self.heap_size = size / 1024.0  # size in MiBs
+        live_bytes = delta.live_bytes
+        if delta.estimate:
+            live_bytes = delta.estimate.live_bytes
+        self.heap_size = live_bytes / 1024.0  # size in MiBs
 
 
 class HeapDetail(Gtk.Box):
@@ -113,7 +116,9 @@ class HeapDetail(Gtk.Box):
 
         self.debugger = debugger
         self.debugger.heap_manager.on_heap_change.subscribe(
-            lambda heap: self._handle_heap_change(heap))
+            lambda delta: self._handle_heap_change(delta))
+        self.debugger.on_process_state_changed.subscribe(
+            lambda state, data: self._handle_process_change(state))
 
         self.stats_wrapper = Gtk.Box.new(Gtk.Orientation.VERTICAL, 0)
         self.stats_wrapper.set_margin_bottom(5)
@@ -123,26 +128,132 @@ class HeapDetail(Gtk.Box):
         self.total_allocation_tracker = self._create_stat_label()
         self.total_deallocation_tracker = self._create_stat_label()
         self.total_memory_tracker = self._create_stat_label()
+        self.peak_memory_tracker = self._create_stat_label()
+        self.allocation_rate_tracker = self._create_stat_label()
+        self.span_tracker = self._create_stat_label()
+        self.size_class_tracker = self._create_stat_label()
+        self.overrun_tracker = self._create_stat_label()
+        self.sampling_tracker = self._create_stat_label()
+        self.leak_tracker = self._create_stat_label()
+
+        self.export_button = Gtk.Button()
+        self.export_button.set_label("Export leak report")
+        self.export_button.connect("clicked",
+                                   lambda *x: self._export_leak_report())
+        self.export_button.set_halign(Gtk.Align.START)
+        self.stats_wrapper.pack_start(self.export_button, False, False, 0)
 
         self.graph = HeapGraph(debugger)
         self.pack_start(self.graph, True, True, 0)
 
-        self.update_blocks([])
+        self.update_blocks(HeapDelta([], [], 0, 0, 0, 0))
+        self.update_leak_report()
 
     @require_gui_thread
-    def update_blocks(self, heap):
+    def update_blocks(self, delta):
         """
-        @type heap: list of debugee.HeapBlock
+        @type delta: debugee.HeapDelta
         """
-        self.block_tracker.set_label("Block count: {}".format(len(heap)))
+        estimate = delta.estimate
+
+        self.block_tracker.set_label("Block count: {}".format(
+            self._format_stat(delta.live_blocks,
+                              estimate and estimate.live_blocks)))
         self.total_allocation_tracker.set_label(
-            "Total allocations: {}".format(
-                self.debugger.heap_manager.get_total_allocations()))
+            "Total allocations: {}".format(self._format_stat(
+                delta.total_allocations,
+                estimate and estimate.total_allocations)))
         self.total_deallocation_tracker.set_label(
-            "Total deallocations: {}".format(
-                self.debugger.heap_manager.get_total_deallocations()))
+            "Total deallocations: {}".format(self._format_stat(
+                delta.total_deallocations,
+                estimate and estimate.total_deallocations)))
         self.total_memory_tracker.set_label("Heap size: {} b".format(
-            sum([block.size for block in heap])))
+            self._format_stat(delta.live_bytes,
+                              estimate and estimate.live_bytes)))
+        self.overrun_tracker.set_label("Lost events: {}".format(
+            self.debugger.heap_manager.get_overruns()))
+
+        stats = delta.stats
+        if stats is None:
+            stats = HeapStats([], 0, 0.0, 0, 0.0)
+
+        self.peak_memory_tracker.set_label("Peak heap size: {} b".format(
+            stats.peak_live_bytes))
+        self.allocation_rate_tracker.set_label(
+            "Allocation rate: {:.0f} /s".format(stats.allocation_rate))
+        self.span_tracker.set_label(
+            "Address span: {} b (fragmentation {:.1f} %)".format(
+                stats.address_span, stats.fragmentation * 100))
+        self.size_class_tracker.set_label("Size classes:\n{}".format(
+            "\n".join("  <= {} b: {} blocks, {} b".format(*size_class)
+                      for size_class in stats.size_classes)))
+
+        every, byte_interval = \
+            self.debugger.heap_manager.get_sampling_rate()
+        if every:
+            sampling = "every {}th allocation".format(every)
+        elif byte_interval:
+            sampling = "once per {} b".format(byte_interval)
+        else:
+            sampling = "off"
+        self.sampling_tracker.set_label("Sampling: {}".format(sampling))
+
+    @require_gui_thread
+    def update_leak_report(self):
+        report = self.debugger.heap_manager.get_leak_report()
+
+        if report is None:
+            self.leak_tracker.set_label("Leaked: -")
+        else:
+            self.leak_tracker.set_label("Leaked: {} b in {} blocks".format(
+                report.bytes, report.blocks))
+
+        self.export_button.set_sensitive(report is not None)
+
+    def _export_leak_report(self):
+        report = self.debugger.heap_manager.get_leak_report()
+        if report is None:
+            return
+
+        path = FileOpenDialog.select_save_file("Export leak report (.json or"
+                                               " .csv)", self.get_toplevel(),
+                                               "leaks.json")
+        if not path:
+            return
+
+        symbolize = self.debugger.heap_manager.symbolize_call_site
+
+        try:
+            if path.endswith(".csv"):
+                with open(path, "wb") as file:
+                    report.write_csv(file, symbolize)
+            else:
+                with open(path, "w") as file:
+                    report.write_json(file, symbolize)
+        except IOError as error:
+            Logger.debug(traceback.format_exc())
+            MessageBox.show(str(error), "Leak report export error",
+                            self.get_toplevel())
+
+    def _handle_process_change(self, state):
+        """
+        @type state: enums.ProcessState
+        """
+        if state in (ProcessState.Launching, ProcessState.Exited):
+            run_on_gui(self.update_leak_report)
+
+    def _format_stat(self, value, estimate):
+        """
+        Formats a statistic of the recorded blocks, with its estimate for
+        the whole heap if the allocations are sampled.
+        @type value: int
+        @type estimate: float | None
+        @rtype: str
+        """
+        if estimate is None:
+            return str(value)
+
+        return "~{:.0f} ({} sampled)".format(estimate, value)
 
     def _create_stat_label(self):
         """
@@ -157,8 +268,8 @@ class HeapDetail(Gtk.Box):
 
         return view
 
-    def _handle_heap_change(self, heap):
+    def _handle_heap_change(self, delta):
         """
-        @type heap: list of debugeee.HeapBlock
+        @type delta: debugee.HeapDelta
         """
-        run_on_gui(self.update_blocks, heap)
+        run_on_gui(self.update_blocks, delta)
@@ -41,6 +41,9 @@ class RegisterList(Gtk.ListBox):
             self._handle_process_change)
         self.debugger.on_frame_changed.subscribe(self._handle_frame_change)
 
+        self.rows = []
+        """@type rows: list of (str, str, Gtk.Label)"""
+
     def _handle_process_change(self, state, event_data):
         if state == ProcessState.Stopped:
             self.update_registers()
@@ -51,18 +54,32 @@ class RegisterList(Gtk.ListBox):
     @require_gui_thread
     def _update_register_gui(self, registers):
         """
+        Updates labels of the registers whose value changed, the rows are
+        created again only if the set of registers changed.
         @type registers: list of debugee.Register
         """
+        if [row[0] for row in self.rows] == [reg.name for reg in registers]:
+            for i, register in enumerate(registers):
+                name, text, label = self.rows[i]
+                value = "{} = {}".format(register.name, register.value)
+                if value != text:
+                    label.set_label(value)
+                    self.rows[i] = (name, value, label)
+            return
+
         for widget in self.get_children():
             self.remove(widget)
 
+        self.rows = []
+
         for register in registers:
-            label = Gtk.Label.new("{} = {}".format(register.name,
-                                                   register.value))
+            text = "{} = {}".format(register.name, register.value)
+            label = Gtk.Label.new(text)
             label.set_halign(Gtk.Align.START)
             row = Gtk.ListBoxRow.new()
             row.add(label)
             self.add(row)
+            self.rows.append((register.name, text, label))
 
         self.show_all()
 
@@ -116,9 +133,8 @@ class MemoryGrid(Gtk.Grid):
         if address_int is None:
             return
 
-        memory = self.debugger.variable_manager.get_memory(address,
-                                                           self.width *
-                                                           self.height)
+        memory = self.debugger.variable_manager.get_memory(
+            address, self.width * self.height).tolist()
 
         for i, row in enumerate(self.byte_rows):
             for j, block in enumerate(row):
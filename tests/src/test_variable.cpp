@@ -23,6 +23,12 @@ public:
     int b;
 };
 
+struct bitsA
+{
+    int lo : 3;
+    int hi : 5;
+};
+
 enum EnumA { A, B };
 enum class EnumB { A, B };
 
@@ -57,5 +63,15 @@ int main()
 
     int (*fn_pointer)(int, float) = test;
 
+    bitsA bits;
+    bits.lo = 1;
+    bits.hi = 2;
+    bitsA bitsArr[2] = { bits, bits };
+
+    {
+        int nested = a;
+        nested++;
+    }
+
     return 0;
 }
\ No newline at end of file
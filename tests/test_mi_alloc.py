@@ -7,7 +7,18 @@ so it may not work elsewhere.
 """
 
 import copy
+import json
+import shutil
+import tempfile
 
+from StringIO import StringIO
+
+from debugger.alloc_ring import AllocRing, AllocOp, AllocEvent
+from debugger.debugee import HeapBlock
+from debugger.heap_index import HeapIndex
+from debugger.heap_log import HeapLog, HeapLogWriter
+from debugger.heap_report import get_size_class
+from debugger.mi.heap_manager import HeapManager
 from tests.conftest import setup_debugger
 
 TEST_FILE = "test_alloc"
@@ -15,14 +26,417 @@ TEST_LINE = 8
 
 
 def test_alloc(debugger):
-    heap = []
-    debugger.heap_manager.on_heap_change.subscribe(lambda new_heap:
-                                                   heap.append(
-                                                       copy.copy(new_heap)))
+    deltas = []
+    debugger.heap_manager.on_heap_change.subscribe(lambda delta:
+                                                   deltas.append(delta))
 
     def test_alloc_cb():
-        assert len(heap[0]) == 1
-        assert heap[0][0].size == 1024
-        assert len(heap[1]) == 0
+        assert deltas[-1].live_blocks == 1
+        assert deltas[-1].live_bytes == 1024
+        assert deltas[-1].added[0].size == 1024
 
     setup_debugger(debugger, TEST_FILE, TEST_LINE, test_alloc_cb)
+
+    assert deltas[-1].live_blocks == 0
+    assert deltas[-1].total_allocations == 1
+    assert deltas[-1].total_deallocations == 1
+
+
+def test_heap_delta():
+    heap_manager = HeapManager(None)
+    deltas = []
+    heap_manager.on_heap_change.subscribe(lambda delta: deltas.append(delta))
+
+    heap_manager._handle_malloc(0x1000, 16)
+    heap_manager._handle_malloc(0x2000, 32)
+    heap_manager.flush()
+
+    assert len(deltas[0].added) == 2
+    assert deltas[0].live_bytes == 48
+
+    heap_manager._handle_free(0x1000)
+    heap_manager._handle_malloc(0x3000, 64)
+    heap_manager._handle_realloc(0x3000, 0x4000, 128)
+    heap_manager.flush()
+    heap_manager.flush()
+
+    assert len(deltas) == 2
+    assert [block.address for block in deltas[1].added] == ["0x4000"]
+    assert [block.address for block in deltas[1].removed] == ["0x1000"]
+    assert deltas[1].live_blocks == 2
+    assert deltas[1].live_bytes == 160
+    assert deltas[1].total_allocations == 4
+    assert deltas[1].total_deallocations == 2
+
+
+def write_ring_record(ring, ring_index, index, op, address, timestamp,
+                      size=16):
+    ring_info = ring.rings[ring_index]
+    AllocRing.record_struct.pack_into(
+        ring.memory, ring_info.offset + AllocRing.HEADER_SIZE +
+        (index % ring_info.capacity) * AllocRing.record_struct.size,
+        index + 1, op, ring_index, timestamp, address, size, 0, 0, 0)
+
+
+def set_ring_write_index(ring, ring_index, index, overruns=0):
+    AllocRing.write_struct.pack_into(
+        ring.memory, ring.rings[ring_index].offset + AllocRing.WRITE_OFFSET,
+        index, overruns)
+
+
+def test_alloc_ring():
+    ring = AllocRing.create(4, 1, 4)
+
+    try:
+        for index in xrange(3):
+            write_ring_record(ring, 0, index, AllocOp.Malloc,
+                              0x1000 + index * 16, index * 10)
+        # the fourth record is not published yet
+        set_ring_write_index(ring, 0, 4, 2)
+
+        write_ring_record(ring, 1, 0, AllocOp.Free, 0x1000, 15)
+        set_ring_write_index(ring, 1, 1, 1)
+
+        events = ring.read(16)
+
+        assert [event.address for event in events] == [0x1000, 0x1010,
+                                                       0x1000, 0x1020]
+        assert events[2].op == AllocOp.Free
+        assert events[0].size == 16
+        assert ring.get_overruns() == 3
+
+        write_ring_record(ring, 0, 3, AllocOp.Free, 0x1010, 30)
+        write_ring_record(ring, 0, 4, AllocOp.Free, 0x1020, 40)
+        set_ring_write_index(ring, 0, 5, 2)
+
+        # the channel was read before the new events, it may still get
+        # events older than them
+        assert ring.read(16) == []
+        assert [event.op for event in ring.read(16)] == [AllocOp.Free,
+                                                         AllocOp.Free]
+
+        # events newer than the last one read from a full ring are held back
+        write_ring_record(ring, 0, 5, AllocOp.Malloc, 0x1000, 50)
+        write_ring_record(ring, 0, 6, AllocOp.Malloc, 0x1010, 60)
+        set_ring_write_index(ring, 0, 7, 2)
+        write_ring_record(ring, 1, 1, AllocOp.Malloc, 0x1020, 45)
+        write_ring_record(ring, 1, 2, AllocOp.Malloc, 0x1030, 70)
+        set_ring_write_index(ring, 1, 3, 1)
+
+        assert [event.timestamp for event in ring.read(1)] == [45]
+        assert [event.timestamp
+                for event in ring.read(16, flush=True)] == [50, 60, 70]
+    finally:
+        ring.close()
+
+
+def test_alloc_ring_channels():
+    ring = AllocRing.create(4, 2, 4)
+    heap_manager = HeapManager(None)
+    errors = []
+    heap_manager.on_free_error.subscribe(lambda address:
+                                         errors.append(address))
+
+    def read():
+        events = ring.read(16)
+        heap_manager._handle_events(events)
+        return [(event.op, event.timestamp) for event in events]
+
+    try:
+        write_ring_record(ring, 1, 0, AllocOp.Malloc, 0x1000, 10)
+        set_ring_write_index(ring, 1, 1)
+        heap_manager._handle_events(ring.read(16, flush=True))
+
+        # the free is reserved in the first channel, but not published
+        # before the block is reused by the second channel
+        set_ring_write_index(ring, 1, 2)
+        write_ring_record(ring, 2, 0, AllocOp.Malloc, 0x1000, 30, 32)
+        set_ring_write_index(ring, 2, 1)
+
+        assert read() == []
+
+        write_ring_record(ring, 1, 1, AllocOp.Free, 0x1000, 20)
+
+        assert read() == [(AllocOp.Free, 20), (AllocOp.Malloc, 30)]
+
+        # the free is published to the first channel after it was read
+        write_ring_record(ring, 2, 1, AllocOp.Malloc, 0x1000, 50, 64)
+        set_ring_write_index(ring, 2, 2)
+
+        assert read() == []
+
+        write_ring_record(ring, 1, 2, AllocOp.Free, 0x1000, 40)
+        set_ring_write_index(ring, 1, 3)
+
+        assert read() == [(AllocOp.Free, 40), (AllocOp.Malloc, 50)]
+
+        assert [(block.address, block.size)
+                for block in heap_manager.heap] == [("0x1000", 64)]
+        assert heap_manager.get_total_deallocations() == 2
+        heap_manager.flush()
+        assert errors == []
+    finally:
+        ring.close()
+
+
+def test_heap_index():
+    index = HeapIndex()
+    for address, size in ((0x3000, 16), (0x1000, 32), (0x2000, 0)):
+        index.add(address, HeapBlock("0x{:x}".format(address), size))
+
+    assert len(index) == 3
+    assert [block.address for block in index] == \
+        ["0x1000", "0x2000", "0x3000"]
+    assert index.get(0x1000).size == 32
+
+    assert index.find_block_containing(0x101f).address == "0x1000"
+    assert index.find_block_containing(0x1020) is None
+    assert index.find_block_containing(0x2000).address == "0x2000"
+    assert index.find_block_containing(0xfff) is None
+
+    snapshot = copy.copy(index)
+    assert index.remove(0x1000).size == 32
+    assert index.remove(0x1000) is None
+    assert index.find_block_containing(0x1010) is None
+    assert len(index) == 2
+    assert len(snapshot) == 3
+
+
+def test_heap_index_chunks():
+    chunk_size = HeapIndex.CHUNK_SIZE
+    HeapIndex.CHUNK_SIZE = 2
+
+    try:
+        index = HeapIndex()
+        addresses = [(address * 7919) % 1000 * 16 for address in xrange(100)]
+        for address in addresses:
+            index.add(address, HeapBlock("0x{:x}".format(address), 8))
+
+        assert len(index.chunks) > 1
+        assert [block.address for block in index] == \
+            ["0x{:x}".format(address) for address in sorted(addresses)]
+
+        for address in addresses[::2]:
+            index.remove(address)
+
+        remaining = sorted(addresses[1::2])
+        assert index.maxes == [chunk[-1] for chunk in index.chunks]
+        assert index[-1].address == "0x{:x}".format(remaining[-1])
+        assert index.find_block_containing(remaining[3] + 7).address == \
+            "0x{:x}".format(remaining[3])
+        assert index.find_block_containing(remaining[3] + 8) is None
+        assert index.get_span() == remaining[-1] + 8 - remaining[0]
+    finally:
+        HeapIndex.CHUNK_SIZE = chunk_size
+
+
+def test_call_sites():
+    heap_manager = HeapManager(None)
+
+    heap_manager._handle_site_frame(7, 1, 0x400200)
+    heap_manager._handle_site_frame(7, 0, 0x400100)
+    heap_manager._handle_malloc(0x1000, 16, 7)
+    heap_manager._handle_malloc(0x2000, 32, 7)
+    heap_manager._handle_malloc(0x3000, 8, 9)
+    heap_manager._handle_free(0x1000)
+
+    sites = heap_manager.get_call_sites()
+
+    assert [site.id for site in sites] == [7, 9]
+    assert sites[0].frames == [0x400100, 0x400200]
+    assert sites[0].live_bytes == 32
+    assert sites[0].live_blocks == 1
+    assert sites[0].total_allocations == 2
+
+
+def test_heap_log():
+    path = tempfile.mkdtemp()
+
+    try:
+        writer = HeapLogWriter(path)
+        writer.append([AllocEvent(AllocOp.Malloc, 1, 10, 0x1000, 16, 0, 7, 0),
+                       AllocEvent(AllocOp.New, 1, 20, 0x2000, 32, 0, 7, 16)])
+        writer.append([AllocEvent(AllocOp.Realloc, 1, 30, 0x3000, 64, 0x1000,
+                                  7, 0),
+                       AllocEvent(AllocOp.Delete, 2, 25, 0x2000, 0, 0, 0, 0)])
+        writer.close()
+
+        log = HeapLog(path)
+        assert len(log) == 5  # realloc is stored as free + realloc
+        assert log.find_index(5) == 0
+        assert log.find_index(20) == 2
+        assert log.find_index(100) == 5
+        assert log.read(2, 4)[0].op == AllocOp.Free
+        log.close()
+
+        heap_manager = HeapManager(None)
+        blocks = {}
+
+        def apply_delta(delta):
+            for block in delta.removed:
+                assert blocks.pop(block.address) is block
+            for block in delta.added:
+                blocks[block.address] = block
+
+        heap_manager.on_heap_change.subscribe(apply_delta)
+
+        heap_manager.replay(path, 20)
+        assert len(heap_manager.heap) == 2
+        assert heap_manager.heap[1].alignment == 16
+        assert heap_manager.get_live_bytes() == 48
+
+        heap_manager.replay(path)
+        assert [block.address for block in heap_manager.heap] == ["0x3000"]
+        assert heap_manager.get_total_deallocations() == 2
+
+        heap_manager.replay(path, 10)
+        assert [block.address for block in heap_manager.heap] == ["0x1000"]
+        assert sorted(blocks) == ["0x1000"]
+    finally:
+        shutil.rmtree(path)
+
+
+def test_heap_log_unknown_free():
+    path = tempfile.mkdtemp()
+
+    try:
+        # the events of a log are ordered, a free of an unknown block must
+        # not swallow a later allocation with the same (clamped) timestamp
+        writer = HeapLogWriter(path)
+        writer.append([AllocEvent(AllocOp.Free, 1, 40, 0x1000, 0, 0, 0, 0),
+                       AllocEvent(AllocOp.Malloc, 2, 40, 0x1000, 16, 0, 0,
+                                  0)])
+        writer.close()
+
+        heap_manager = HeapManager(None)
+        errors = []
+        heap_manager.on_free_error.subscribe(lambda address:
+                                             errors.append(address))
+
+        heap_manager.replay(path)
+        assert [block.address for block in heap_manager.heap] == ["0x1000"]
+        assert heap_manager.get_total_deallocations() == 0
+        assert errors == ["0x1000"]
+    finally:
+        shutil.rmtree(path)
+
+
+def test_unordered_free():
+    heap_manager = HeapManager(None)
+    errors = []
+    heap_manager.on_free_error.subscribe(lambda address:
+                                         errors.append(address))
+
+    # the free from another thread was read before the allocation
+    heap_manager._handle_free(0x1000, 20)
+    heap_manager._handle_malloc(0x1000, 16, timestamp=10)
+
+    assert len(heap_manager.heap) == 0
+    assert heap_manager.get_total_allocations() == 1
+    assert heap_manager.get_total_deallocations() == 1
+
+    heap_manager._handle_free(0x2000, 30)
+    heap_manager.flush()
+
+    assert errors == ["0x2000"]
+
+
+def test_sampling():
+    heap_manager = HeapManager(None)
+    deltas = []
+    heap_manager.on_heap_change.subscribe(lambda delta: deltas.append(delta))
+
+    heap_manager.set_sampling(every=10)
+    assert ("DEVI_ALLOC_SAMPLE_EVERY", "10") in \
+        heap_manager.get_hook_environment()
+
+    heap_manager.watch()
+    try:
+        assert heap_manager.get_sampling_rate() == (10, 0)
+
+        heap_manager._handle_malloc(0x1000, 16)
+        heap_manager._handle_malloc(0x2000, 32)
+        heap_manager._handle_free(0x1000)
+        heap_manager.flush()
+
+        estimate = deltas[-1].estimate
+        assert deltas[-1].live_bytes == 32
+        assert estimate.live_blocks == 10
+        assert estimate.live_bytes == 320
+        assert estimate.total_allocations == 20
+        assert estimate.total_deallocations == 10
+    finally:
+        heap_manager.stop()
+
+    heap_manager.set_sampling(byte_interval=1024)
+    heap_manager.watch()
+    try:
+        assert heap_manager.get_sampling_rate() == (0, 1024)
+
+        # large blocks are always sampled, small ones stand for many
+        assert heap_manager._get_sample_weight(1024 * 1024) == 1.0
+        assert 63 < heap_manager._get_sample_weight(16) < 65
+    finally:
+        heap_manager.stop()
+
+
+def test_leak_report():
+    assert [get_size_class(size) for size in (0, 1, 16, 17, 100)] == \
+        [0, 1, 16, 32, 128]
+
+    heap_manager = HeapManager(None)
+    heap_manager.watch()
+
+    heap_manager._handle_site_frame(7, 0, 0x400100)
+    heap_manager._handle_malloc(0x1000, 16, 7)
+    heap_manager._handle_malloc(0x2000, 20, 7)
+    heap_manager._handle_malloc(0x3000, 30)
+    heap_manager._handle_malloc(0x4000, 8, 9)
+    heap_manager._handle_free(0x4000)
+
+    heap_manager.stop()
+
+    report = heap_manager.get_leak_report()
+    assert len(heap_manager.heap) == 0
+    assert report.blocks == 3
+    assert report.bytes == 66
+    assert [(group.key, group.blocks, group.bytes)
+            for group in report.get_size_classes()] == [(16, 1, 16),
+                                                        (32, 2, 50)]
+    assert [(group.key, group.blocks, group.bytes)
+            for group in report.get_sites()] == [(7, 2, 36)]
+
+    output = StringIO()
+    report.write_json(output)
+    data = json.loads(output.getvalue())
+    assert data["bytes"] == 66
+    assert data["call_sites"][0]["frames"] == ["0x400100"]
+
+    output = StringIO()
+    report.write_csv(output)
+    assert output.getvalue().splitlines()[-1] == \
+        "call_site,0x7,2,36,0x400100"
+
+
+def test_heap_stats():
+    heap_manager = HeapManager(None)
+    deltas = []
+    heap_manager.on_heap_change.subscribe(lambda delta: deltas.append(delta))
+
+    heap_manager._handle_events([
+        AllocEvent(AllocOp.Malloc, 1, 0, 0x1000, 16, 0, 0, 0),
+        AllocEvent(AllocOp.Malloc, 1, 500000000, 0x1100, 100, 0, 0, 0)])
+    heap_manager.flush()
+
+    heap_manager._handle_events([
+        AllocEvent(AllocOp.Free, 1, 750000000, 0x1100, 0, 0, 0, 0),
+        AllocEvent(AllocOp.Malloc, 1, 1000000000, 0x1200, 20, 0, 0, 0)])
+    heap_manager.flush()
+
+    stats = deltas[-1].stats
+    assert stats.size_classes == [(16, 1, 16), (32, 1, 20)]
+    assert stats.peak_live_bytes == 116
+    assert stats.allocation_rate == 2.0
+    assert stats.address_span == 0x214
+    assert 0.9 < stats.fragmentation < 1.0
+    assert heap_manager.get_stats().peak_live_bytes == 116
@@ -50,3 +50,23 @@ def test_frame_locals(debugger):
         assert set(var_names) == {"a", "b", "c", "d"}
 
     setup_debugger(debugger, TEST_FILE, TEST_LINE, test_frame_locals_cb)
+
+
+def test_frames_with_variables(debugger):
+    def test_frames_with_variables_cb():
+        frames = debugger.thread_manager.get_frames_with_variables()
+
+        assert [frame.level for frame in frames] == [0, 1]
+        assert [frame.func for frame in frames] == ["test", "main"]
+        assert frames[0].line == TEST_LINE
+
+        assert {var.name for var in frames[0].variables} == {"a", "b",
+                                                             "c", "d"}
+        assert {var.name for var in frames[1].variables} == {"argc", "argv",
+                                                             "b"}
+        assert frames[1].variables[0].value is not None
+
+        assert debugger.thread_manager.get_current_frame(False).level == 0
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE,
+                   test_frames_with_variables_cb)
@@ -1,17 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import pytest
+
 
 def test_remove_label(parser):
     data = "[aaa={b=\"c\"}]"
 
-    assert parser._remove_array_labels(data) == "[{b=\"c\"}]"
+    assert parser.parse(data) == [{"b": "c"}]
 
 
 def test_modify_label(parser):
     data = "asd      = {dsa = 5, c=\"c = 8, 6 98 {}\"  }"
 
-    assert parser._modify_labels(data) == "\"asd\": {\"dsa\":"\
-                                          " 5, \"c\":\"c = 8, 6 98 {}\"  }"
+    assert parser.parse(data) == {"asd": {"dsa": 5, "c": "c = 8, 6 98 {}"}}
 
 
 def test_parse(parser):
@@ -19,3 +20,125 @@ def test_parse(parser):
 
     assert "a" in dict and dict["a"] == 5
     assert "c" in dict and len(dict["c"]) == 2
+
+
+def test_parse_empty(parser):
+    assert parser.parse("") == ""
+    assert parser.parse("frame={args=[],vars={}}") == {
+        "frame": {"args": [], "vars": {}}
+    }
+
+
+def test_parse_escapes(parser):
+    data = "value=\"\\\"hi\\\"\\n\\t\\\\ \\000\""
+
+    assert parser.parse(data) == {"value": "\"hi\"\n\t\\ \x00"}
+
+
+def test_parse_error_reading_variable(parser):
+    data = "variables=[{name=\"a\",value=<error reading variable a>}]"
+
+    assert parser.parse(data) == {"variables": [{"name": "a", "value": ""}]}
+
+
+def test_parse_malformed(parser):
+    with pytest.raises(ValueError):
+        parser.parse("{\"a\"}")
+
+
+mi_corpus = [
+    ("bkpt={number=\"1\",type=\"breakpoint\",disp=\"keep\",enabled=\"y\","
+     "addr=\"0x08048564\",func=\"main\",file=\"myprog.c\","
+     "fullname=\"/home/myprog.c\",line=\"68\",thread-groups=[\"i1\"],"
+     "times=\"0\"}",
+     {"bkpt": {"number": "1", "type": "breakpoint", "disp": "keep",
+               "enabled": "y", "addr": "0x08048564", "func": "main",
+               "file": "myprog.c", "fullname": "/home/myprog.c",
+               "line": "68", "thread-groups": ["i1"], "times": "0"}}),
+    ("stack=[frame={level=\"0\",addr=\"0x00010734\",func=\"callee4\","
+     "file=\"basics.c\",fullname=\"/home/basics.c\",line=\"8\"},"
+     "frame={level=\"1\",addr=\"0x0001076c\",func=\"main\","
+     "file=\"basics.c\",line=\"17\"}]",
+     {"stack": [{"level": "0", "addr": "0x00010734", "func": "callee4",
+                 "file": "basics.c", "fullname": "/home/basics.c",
+                 "line": "8"},
+                {"level": "1", "addr": "0x0001076c", "func": "main",
+                 "file": "basics.c", "line": "17"}]}),
+    ("threads=[{id=\"1\",target-id=\"Thread 0xb7e156b0 (LWP 21254)\","
+     "name=\"test\",frame={level=\"0\",addr=\"0x0804891f\","
+     "func=\"foo\",args=[{name=\"i\",value=\"10\"}],line=\"158\"},"
+     "state=\"stopped\"}],"
+     "current-thread-id=\"1\"",
+     {"threads": [{"id": "1", "target-id": "Thread 0xb7e156b0 (LWP 21254)",
+                   "name": "test",
+                   "frame": {"level": "0", "addr": "0x0804891f",
+                             "func": "foo",
+                             "args": [{"name": "i", "value": "10"}],
+                             "line": "158"},
+                   "state": "stopped"}],
+      "current-thread-id": "1"}),
+    ("asm_insns=[src_and_asm_line={line=\"31\",file=\"basics.c\","
+     "line_asm_insn=[{address=\"0x000107bc\",func-name=\"main\","
+     "offset=\"0\",inst=\"save  %sp, -112, %sp\"}]}]",
+     {"asm_insns": [{"line": "31", "file": "basics.c",
+                     "line_asm_insn": [{"address": "0x000107bc",
+                                        "func-name": "main",
+                                        "offset": "0",
+                                        "inst": "save  %sp, -112, %sp"}]}]}),
+    ("register-names=[\"eax\",\"ecx\",\"\",\"eip\"]",
+     {"register-names": ["eax", "ecx", "", "eip"]}),
+    ("register-values=[{number=\"0\",value=\"0x5\"},"
+     "{number=\"8\",value=\"0x8048400\"}]",
+     {"register-values": [{"number": "0", "value": "0x5"},
+                          {"number": "8", "value": "0x8048400"}]})
+]
+
+
+@pytest.mark.parametrize("data,expected", mi_corpus)
+def test_parse_corpus(parser, data, expected):
+    assert parser.parse(data) == expected
+
+
+def test_parse_corpus_records(parser):
+    breakpoint = parser.parse_breakpoint(mi_corpus[0][0])
+    assert breakpoint.number == 1
+    assert breakpoint.line == 68
+
+    frames = parser.parse_stack_frames(mi_corpus[1][0])
+    assert [frame.level for frame in frames] == [0, 1]
+    assert frames[1].line == 17
+
+    thread_info = parser.parse_thread_info(mi_corpus[2][0])
+    assert thread_info.selected_thread.id == 1
+    assert thread_info.selected_thread.frame.func == "foo"
+
+    disassembly = parser.parse_disassembly(mi_corpus[3][0])
+    assert disassembly == [{"line": 31,
+                            "instructions": ["save  %sp, -112, %sp"]}]
+
+
+def test_iter_stack_frames(parser):
+    frames = parser.iter_stack_frames(mi_corpus[1][0])
+
+    assert next(frames).func == "callee4"
+    assert next(frames).func == "main"
+    assert next(frames, None) is None
+
+
+def test_iter_list_lazy(parser):
+    data = "before=\"x\",stack=[frame={level=\"0\"},frame={level=1"
+
+    frames = parser.iter_stack_frames(data)
+    assert next(frames).level == 0
+    assert next(frames).level == 1
+
+    assert list(parser.iter_disassembly("asm_insns=[]")) == []
+
+
+def test_parse_cli_json(parser):
+    cli_data = ["{\\\"root\\\":{\\\"path\\\":\\\"a\\\",",
+                "\\\"value\\\":\\\"\\\\\\\"x\\\\\\\"\\\"}}"]
+
+    assert parser.parse_cli_json(cli_data) == {
+        "root": {"path": "a", "value": "\"x\""}
+    }
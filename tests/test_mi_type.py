@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
+from debugger.debugee import Type
 from debugger.enums import TypeCategory, BasicTypeCategory
+from debugger.mi.variable_manager import VariableManager
 from tests.conftest import setup_debugger
 
 TEST_FILE = "test_type"
@@ -52,3 +54,32 @@ def test_types(debugger):
                    TypeCategory.Function)
 
     setup_debugger(debugger, TEST_FILE, TEST_LINE, test_types_cb)
+
+
+def test_type_cache(debugger):
+    def test_type_cache_cb():
+        type = debugger.variable_manager.get_type("varStructA")
+        assert "structA" in debugger.variable_manager.type_cache
+        assert debugger.variable_manager.get_type("varStructA") is type
+
+        array_type = debugger.variable_manager.get_type("varArray")
+        assert array_type.child_type is\
+            debugger.variable_manager.get_type("varInt")
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE, test_type_cache_cb)
+
+
+def test_type_cache_keys():
+    variable_manager = VariableManager(None)
+    local_a = Type("Node", TypeCategory.Struct, BasicTypeCategory.Invalid, 8)
+    local_b = Type("Node", TypeCategory.Struct, BasicTypeCategory.Invalid,
+                   16)
+
+    variable_manager._cache_type("Node", "sizeof 8", local_a)
+    variable_manager._cache_type("Node", "sizeof 16", local_b)
+    variable_manager._cache_type("struct {...}", "sizeof 8", local_a)
+
+    assert variable_manager._get_cached_type("Node", "sizeof 8") is local_a
+    assert variable_manager._get_cached_type("Node", "sizeof 16") is local_b
+    assert variable_manager._get_cached_type("struct {...}",
+                                             "sizeof 8") is None
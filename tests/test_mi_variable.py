@@ -3,11 +3,11 @@ import re
 from collections import Iterable
 
 from debugger.enums import TypeCategory
-from tests.conftest import setup_debugger
+from tests.conftest import AsyncState, setup_debugger
 
 int_size = (4, 8)
 TEST_FILE = "test_variable"
-TEST_LINE = 60
+TEST_LINE = 76
 
 
 def check_variable(debugger, expression, value=None, size=None):
@@ -139,8 +139,162 @@ def test_get_memory(debugger):
         var = debugger.variable_manager.get_variable("a")
 
         assert [5, 0, 0, 0] == debugger.variable_manager.get_memory(
-            var.address, var.type.size)
+            var.address, var.type.size).tolist()
         assert len(debugger.variable_manager.get_memory(
             var.address, 128)) == 128
 
     setup_debugger(debugger, TEST_FILE, TEST_LINE, test_get_memory_cb)
+
+
+def test_track_variables(debugger):
+    def test_track_variables_cb():
+        frame = debugger.thread_manager.get_current_frame(True)
+        debugger.variable_manager.track_variables([frame])
+
+        assert debugger.variable_manager.update_tracked_variables() == []
+
+        a = next(var for var in frame.variables if var.name == "a")
+        changes = []
+        a.on_value_changed.subscribe(changes.append)
+        debugger.communicator.send("set variable a = 7")
+
+        assert debugger.variable_manager.update_tracked_variables() == [a]
+        assert a.value == "7"
+        assert changes == [a]
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE, test_track_variables_cb)
+
+
+def test_track_nested_block(debugger):
+    state = AsyncState()
+
+    def test_track_nested_block_cb():
+        manager = debugger.variable_manager
+
+        if state.state == 0:
+            state.inc()
+            frame = debugger.thread_manager.get_current_frame(True)
+            manager.track_variables([frame])
+            assert manager.update_tracked_variables() == []
+            debugger.exec_step_over()
+        else:
+            # the frame is the same, but it has a new local variable
+            assert manager.update_tracked_variables() is None
+            debugger.quit_program()
+
+    setup_debugger(debugger, TEST_FILE, 69, test_track_nested_block_cb,
+                   cont=False)
+
+
+def test_reset_tracking(debugger):
+    def test_reset_tracking_cb():
+        manager = debugger.variable_manager
+        frame = debugger.thread_manager.get_current_frame(True)
+        manager.track_variables([frame])
+        names = list(manager.tracked)
+
+        manager.reset_tracking()
+        assert manager.update_tracked_variables() is None
+        assert manager.stale_tracked == names
+
+        manager.untrack_variables()
+        assert manager.stale_tracked == []
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE, test_reset_tracking_cb)
+
+
+def test_vector_items(debugger):
+    def test_vector_items_cb():
+        for expression in ("vec", "e"):
+            vector = debugger.variable_manager.get_variable(expression)
+            vector.count = vector.max_size
+            items = debugger.variable_manager.get_vector_items(vector)
+
+            for i, item in enumerate(items):
+                single = debugger.variable_manager.get_variable(item.path)
+                assert vector.get_index_by_address(item.address) == i
+                assert item.address == single.address
+                assert item.value == single.value
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE, test_vector_items_cb)
+
+
+def test_bitfields(debugger):
+    def test_bitfields_cb():
+        manager = debugger.variable_manager
+        bits = manager.get_variable("bits")
+
+        assert [child.bitsize for child in bits.children] == [3, 5]
+        assert [child.value for child in bits.children] == ["1", "2"]
+
+        vector = manager.get_variable("bitsArr")
+        vector.count = vector.max_size
+        items = manager.get_vector_items(vector)
+
+        for item in items:
+            assert [child.value for child in item.children] == ["1", "2"]
+
+        bits.children[1].value = "3"
+        assert manager.get_variable("bits.lo").value == "1"
+        assert manager.get_variable("bits.hi").value == "3"
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE, test_bitfields_cb)
+
+
+def test_memory_cache(debugger):
+    def test_memory_cache_cb():
+        manager = debugger.variable_manager
+        a = manager.get_variable("a")
+
+        assert manager.get_memory(a.address, 4).tolist() == [5, 0, 0, 0]
+        assert len(manager.memory_cache) == 1
+
+        a.value = "6"
+        assert manager.get_memory(a.address, 4).tolist() == [6, 0, 0, 0]
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE, test_memory_cache_cb)
+
+
+def test_registers(debugger):
+    def test_registers_cb():
+        registers = debugger.variable_manager.get_registers()
+        assert len(registers) > 0
+
+        cached = debugger.variable_manager.get_registers()
+        assert ([(reg.name, reg.value) for reg in registers] ==
+                [(reg.name, reg.value) for reg in cached])
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE, test_registers_cb)
+
+
+def test_lazy_children(debugger):
+    def test_lazy_children_cb():
+        clsA = debugger.variable_manager.get_variable("clsA")
+        member = clsA.children[0]
+        assert not member.has_loaded_children()
+
+        debugger.variable_manager.load_children([member])
+        assert member.has_loaded_children()
+        assert member.children[0].value == "5"
+        assert member.children[0].path.startswith(
+            "({})".format(member.path))
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE, test_lazy_children_cb)
+
+
+def test_identity_map(debugger):
+    def test_identity_map_cb():
+        manager = debugger.variable_manager
+        strA = manager.get_variable("strA")
+
+        target = manager.get_variable_at(strA.address, strA.type.name)
+
+        assert target is not strA
+        assert manager.get_variable_at(strA.address,
+                                       strA.type.name) is target
+
+        member = strA.children[0]
+        assert manager.get_variable_at(member.address,
+                                       member.type.name) is not member
+
+    setup_debugger(debugger, TEST_FILE, TEST_LINE, test_identity_map_cb)